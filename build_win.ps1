@@ -1,9 +1,11 @@
 Remove-Item __main__.dist -r -fo
+python -m hbtl.assetpack hbtl/assets assets.pack
 
 python -m nuitka `
     -o "Haunted by the Light.exe" `
     --standalone `
-    --include-data-dir=hbtl/assets=assets/ `
+    --include-data-files=assets.pack=assets.pack `
+    --include-data-dir=hbtl/assets/music=assets/music/ `
     --include-data-files=hbtl/licenses.txt=licenses.txt `
     --noinclude-data-files=*.aseprite `
     --noinclude-data-files=*.tiled-project `
@@ -1,17 +1,66 @@
+# First, to time the imports below
+try:
+    from . import startup
+except ImportError:
+    # Nuitka does not allow invoking via -m
+    import startup
+
+import argparse
+import functools
+import os
 import random
+import sys
+import threading
 import time
 from pathlib import Path
+from typing import Any, NamedTuple, Optional
 
 import arcade
-import arcade.experimental.lights
 import pyglet.graphics
-from pyglet.math import Vec2
 
 try:
-    from . import model
+    from . import (
+        assetpack, collision, gcpolicy, gpustats, hitboxes, inputqueue,
+        mapdata, memreport, model, preload, quality, simthread, spikes,
+        telemetry, tiles,
+    )
+    from .constants import (
+        BACKGROUND_GRADIENT_DURATION, CAMERA_SPEED, GRAVITY,
+        ICE_DRIPSTONE_FALL_HEIGHT, INITIAL_SPEED, INITIAL_SPEED_SPECTRE,
+        JUMP_PENDING_TIMEOUT, JUMP_VELOCITY, MAPS_PER_BIOME, MAP_WIDTH,
+        PLAYER_SCALING, SPECTRE_SPEED_CAP, SPEED_GAIN_PER_SECOND,
+        SPEED_GAIN_PER_SECOND_SPECTRE, SPEED_PENALTY_VERTICAL_PLUS,
+        TILE_SCALING, TILE_SIZE,
+    )
+    from .timeline import Call, Repeat, Timeline, Wait
+    from .triggers import TriggerQueue
 except ImportError:
     # Nuitka does not allow invoking via -m
+    import assetpack
+    import collision
+    import gcpolicy
+    import gpustats
+    import hitboxes
+    import inputqueue
+    import mapdata
+    import memreport
     import model
+    import preload
+    import quality
+    import simthread
+    import spikes
+    import telemetry
+    import tiles
+    from constants import (
+        BACKGROUND_GRADIENT_DURATION, CAMERA_SPEED, GRAVITY,
+        ICE_DRIPSTONE_FALL_HEIGHT, INITIAL_SPEED, INITIAL_SPEED_SPECTRE,
+        JUMP_PENDING_TIMEOUT, JUMP_VELOCITY, MAPS_PER_BIOME, MAP_WIDTH,
+        PLAYER_SCALING, SPECTRE_SPEED_CAP, SPEED_GAIN_PER_SECOND,
+        SPEED_GAIN_PER_SECOND_SPECTRE, SPEED_PENALTY_VERTICAL_PLUS,
+        TILE_SCALING, TILE_SIZE,
+    )
+    from timeline import Call, Repeat, Timeline, Wait
+    from triggers import TriggerQueue
 
 ASSETS_PATH = model.AssetsPath(Path(__file__).parent / "assets")
 TEXTURES_PATH = ASSETS_PATH / "textures"
@@ -19,34 +68,20 @@ MUSIC_PATH = ASSETS_PATH / "music"
 SOUNDS_PATH = ASSETS_PATH / "sounds"
 MAPS_PATH = ASSETS_PATH / "maps"
 
-TILE_SIZE = 16
-MAP_WIDTH = 30
-
-TILE_SCALING = 4
-PLAYER_SCALING = 3
-
-INITIAL_SPEED = 300
-INITIAL_SPEED_SPECTRE = 310
-SPEED_GAIN_PER_SECOND = 3.5
-SPEED_GAIN_PER_SECOND_SPECTRE = 1.7
-SPEED_PENALTY_VERTICAL_PLUS = -0.04
-SPECTRE_SPEED_CAP = 5
-GRAVITY = 1
-JUMP_VELOCITY = 23
-CAMERA_SPEED = 0.3
-JUMP_PENDING_TIMEOUT = 0.1
+MAP_PX = MAP_WIDTH * TILE_SIZE * TILE_SCALING
+# Endless mode: maps are placed this far ahead of the player and kept at
+# most this far behind the spectre
+COURSE_AHEAD = 2 * MAP_PX
+COURSE_BEHIND = 4 * MAP_PX
+# Endless mode: the course is moved back to 0 once the player passes this,
+# sprite positions are float32 on the GPU
+REBASE_X = 2.0 ** 20
 
-MAPS_PER_BIOME = 10
-BACKGROUND_GRADIENT_STEPS = 30
+# Loaded while the intro is shown, see `load_game_assets()`
+MUSIC = ("Horizon", "mysterious_sewer_main", "cut_overworld")
+# MUSIC += ("dungeon002",)
 
-# Dripstones above this height will fall down eventually
-ICE_DRIPSTONE_FALL_HEIGHT = 1050
-
-
-sound_horizon = arcade.load_sound(MUSIC_PATH.get("Horizon"))
-sound_sewer = arcade.load_sound(MUSIC_PATH.get("mysterious_sewer_main"))
-sound_overworld = arcade.load_sound(MUSIC_PATH.get("cut_overworld"))
-# sound_dungeon = arcade.load_sound(MUSIC_PATH.get("dungeon002"))
+startup.mark("imports")
 
 
 class Window(arcade.Window):
@@ -55,7 +90,33 @@ class Window(arcade.Window):
             self.set_fullscreen(not self.fullscreen)
 
 
-def main() -> None:
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m hbtl", description="Haunted by the Light"
+    )
+    parser.add_argument(
+        "--memory-report", type=Path, metavar="PATH",
+        help="Trace memory at setup and biome changes, write a JSON report",
+    )
+    parser.add_argument(
+        "--memory-budget", type=memreport.parse_budget, action="append",
+        default=[], metavar="CATEGORY=MB",
+        help="Fail the memory report if a category uses more",
+    )
+    parser.add_argument(
+        "--profile-startup", action="store_true",
+        help="Print the time spent per startup phase",
+    )
+    parser.add_argument(
+        "--endless", action="store_true",
+        help="Run through the biomes over and over, with no darkness",
+    )
+    args = parser.parse_args(argv)
+    startup.enabled = args.profile_startup
+    GameView.endless = args.endless
+    if args.memory_report:
+        memreport.start(dict(args.memory_budget))
+
     win = Window(
         title="Haunted by the Light",
         resizable=True,
@@ -63,10 +124,50 @@ def main() -> None:
         fullscreen=True
     )
     win.set_min_size(1200, 800)
+    gcpolicy.policy.install()
+    if gpustats.ENABLED:
+        gpustats.stats.install()
+    startup.mark("window")
     intro_view = IntroView1()
     intro_view.setup()
     win.show_view(intro_view)
+    startup.mark("intro setup")
     arcade.run()
+    if os.environ.get("HBTL_STATS"):
+        print("Jump input latency:", inputqueue.latency.summary())
+        print("Garbage collector:", gcpolicy.policy.summary())
+    if gpustats.stats.installed:
+        print("GPU work in game:")
+        print(gpustats.stats.summary())
+    if memreport.report is not None:
+        print(memreport.report.summary())
+        memreport.report.save(args.memory_report)
+        if memreport.report.violations:
+            sys.exit(1)
+
+
+def load_game_assets() -> None:
+    """
+    Start loading what only the game needs. Called once the intro is on
+    screen, the images and music are decoded in the background meanwhile.
+    """
+    startup.track("game textures", preload.decode(GameView.texture_paths()))
+    startup.track(
+        "music", preload.load_sounds(MUSIC_PATH.get(name) for name in MUSIC)
+    )
+    start = time.perf_counter()
+    import_lighting()
+    startup.record("lighting import", time.perf_counter() - start)
+
+
+def import_lighting() -> Any:
+    """The `lighting` module, imported on first use."""
+    try:
+        from . import lighting
+    except ImportError:
+        # Nuitka does not allow invoking via -m
+        import lighting
+    return lighting
 
 
 class IntroView1(model.FadingView):
@@ -74,15 +175,18 @@ class IntroView1(model.FadingView):
         self.window.background_color = arcade.color.WHITE
         self.sprites = arcade.SpriteList()
         self.text1 = model.Sprite(
-            path_or_texture=TEXTURES_PATH.get("there_were_times"),
+            path_or_texture=model.load_texture(
+                TEXTURES_PATH.get("there_were_times")
+            ),
             scale=5,
         )
         self.sprites.append(self.text1)
 
         self.next_view = IntroView2
-        arcade.schedule_once(lambda _: self.start_fade_out(), 3)
+        self.scheduler.schedule_once(lambda _: self.start_fade_out(), 3)
         self.start_fade_in()
         self.on_resize(self.window.width, self.window.height)
+        self.drawn = False
 
     def on_resize(self, width: int, height: int):
         self.text1.center = width / 2, height / 2
@@ -91,6 +195,11 @@ class IntroView1(model.FadingView):
         self.clear()
         self.sprites.draw(pixelated=True)
         self.draw_fading()
+        if not self.drawn:
+            self.drawn = True
+            startup.mark("first frame")
+            # After this frame is on screen
+            self.scheduler.schedule_once(lambda _: load_game_assets(), 0)
 
 
 class IntroView2(model.FadingView):
@@ -98,13 +207,15 @@ class IntroView2(model.FadingView):
         self.window.background_color = arcade.color.WHITE
         self.sprites = arcade.SpriteList()
         self.text2 = model.Sprite(
-            path_or_texture=TEXTURES_PATH.get("when_there_was_no_dark_mode"),
+            path_or_texture=model.load_texture(
+                TEXTURES_PATH.get("when_there_was_no_dark_mode")
+            ),
             scale=5,
         )
         self.sprites.append(self.text2)
 
         self.next_view = GameView
-        arcade.schedule_once(lambda _: self.start_fade_out(), 4)
+        self.scheduler.schedule_once(lambda _: self.start_fade_out(), 4)
         self.start_fade_in()
         self.on_resize(self.window.width, self.window.height)
 
@@ -122,13 +233,15 @@ class OutroView(model.FadingView):
         self.window.background_color = arcade.color.EERIE_BLACK
         self.sprites = arcade.SpriteList()
         self.text = model.Sprite(
-            path_or_texture=TEXTURES_PATH.get("dark_mode_unlocked"),
+            path_or_texture=model.load_texture(
+                TEXTURES_PATH.get("dark_mode_unlocked")
+            ),
             scale=5,
         )
         self.sprites.append(self.text)
 
         self.next_view = GameView
-        arcade.schedule_once(lambda _: self.start_fade_out(), 4)
+        self.scheduler.schedule_once(lambda _: self.start_fade_out(), 4)
         self.start_fade_in()
         self.on_resize(self.window.width, self.window.height)
 
@@ -208,137 +321,520 @@ class CreditsView(arcade.View):
         self.text_batch.draw()
 
 
+class MapChunk:
+    """
+    One placed map. Walls are only kept as arrays (see `tiles.StaticTiles`),
+    the other layers as sprites. Chunks are kept around between runs and
+    moved to their new place instead of loading the map file again.
+    """
+    # Layers that are merged into the scene sprite list of the same name
+    SCENE_LAYERS = (
+        "obstacles", "obsidian_obstacles", "ambient", "checkpoints"
+    )
+    # Sprite classes of layers that don't use plain sprites
+    LAYER_CLASSES = {"obstacles": model.Sprite}
+
+    def __init__(
+        self, name: str, textures: tiles.TileTextures, offset_x: float
+    ):
+        self.name = name
+        self.offset_x = offset_x
+        self.attached = False
+        data = mapdata.load_map(name)
+        self.walls = tiles.MapTiles(data, "walls", textures)
+        # Initial state of every sprite, relative to the chunk offset
+        self.layers: dict[
+            str, list[tuple[arcade.Sprite, float, float, arcade.Texture]]
+        ] = {}
+        for layer in data.layers:
+            if layer == "walls":
+                continue
+            sprite_class = self.LAYER_CLASSES.get(layer, arcade.Sprite)
+            sprites = []
+            for column, row, gid in data.tiles(layer):
+                sprite = textures.sprite(
+                    textures.index(data, gid, data.flip(layer, column, row)),
+                    sprite_class,
+                )
+                x, y = data.sprite_position(column, row, gid)
+                sprite.position = (x + offset_x, y)
+                sprites.append((sprite, x, y, sprite.texture))
+            self.layers[layer] = sprites
+        # Dripstones that fall once the player gets close
+        self.dripstones = [
+            sprite for sprite, _, y, _ in self.layers.get("obstacles", [])
+            if y > ICE_DRIPSTONE_FALL_HEIGHT
+        ]
+
+    def sprites(self, layer: str) -> list[arcade.Sprite]:
+        return [sprite for sprite, *_ in self.layers.get(layer, [])]
+
+    def move(self, offset_x: float) -> None:
+        """Move the chunk to `offset_x`, keeping the state of its sprites."""
+        dx = offset_x - self.offset_x
+        self.offset_x = offset_x
+        for sprites in self.layers.values():
+            for sprite, *_ in sprites:
+                sprite.center_x += dx
+
+    def place(self, offset_x: float) -> None:
+        """
+        Move the chunk to `offset_x` and restore all sprites to how they were
+        loaded.
+        """
+        self.offset_x = offset_x
+        for sprites in self.layers.values():
+            for sprite, x, y, texture in sprites:
+                sprite.position = (x + offset_x, y)
+                sprite.change_x = 0
+                sprite.change_y = 0
+                if sprite.texture is not texture:
+                    sprite.texture = texture
+                sprite.properties.pop("active", None)
+
+    def attach(self, scene: arcade.Scene) -> None:
+        """Add all sprites that aren't in the scene (anymore)."""
+        for layer in self.SCENE_LAYERS:
+            if layer not in self.layers:
+                continue
+            sprite_list = scene[layer]
+            for sprite, *_ in self.layers[layer]:
+                if sprite not in sprite_list:
+                    sprite_list.append(sprite)
+        self.attached = True
+
+    def detach(self, scene: arcade.Scene) -> None:
+        for layer in self.SCENE_LAYERS:
+            if layer not in self.layers:
+                continue
+            sprite_list = scene[layer]
+            for sprite, *_ in self.layers[layer]:
+                if sprite in sprite_list:
+                    sprite_list.remove(sprite)
+        self.attached = False
+
+
+def _sprite_state(sprite: model.AnimatedSprite) -> tuple[Any, ...]:
+    return (
+        sprite.center_x, sprite.center_y, sprite.change_x, sprite.change_y,
+        sprite.state,
+    )
+
+
+def _restore_sprite(
+    sprite: model.AnimatedSprite, state: tuple[Any, ...]
+) -> None:
+    center_x, center_y, sprite.change_x, sprite.change_y, sprite_state = state
+    sprite.position = (center_x, center_y)
+    if sprite_state is not None and sprite_state != sprite.state:
+        sprite.state = sprite_state
+
+
+class WorldSnapshot(NamedTuple):
+    """
+    What changes in a run while playing, see `GameView.snapshot()`. Sprites
+    and timeline actions are referenced, not copied.
+    """
+    # `GameView.origin_x` at the time, positions are relative to it
+    origin_x: float
+    # (center_x, center_y, change_x, change_y, state)
+    player: tuple[Any, ...]
+    spectre: tuple[Any, ...]
+    jumps_since_ground: int
+    # (position, radius)
+    spectre_light: tuple[Any, ...]
+    # (chunk, offset_x, dripstones) of each placed map, with
+    # (center_x, center_y, change_y, in the scene) per falling dripstone
+    course: tuple[tuple[MapChunk, float, tuple[Any, ...]], ...]
+    active_checkpoints: frozenset[arcade.Sprite]
+    # Positions of the last triggers that fired
+    player_triggers: float
+    spectre_triggers: float
+    timeline: Any
+    biome: str
+    background_color: Any
+    # Clouds, butterflies and stars shown, and the star spawner
+    ambient: tuple[arcade.Sprite, ...]
+    star_spawner: Optional[Repeat]
+    ambient_until_x: float
+    # (sound, volume) of the music playing
+    music: Optional[tuple[arcade.Sound, float]]
+    rng: Any
+
+
 class GameView(model.FadingView):
+    # Drawn with the game camera, in this order
+    WORLD_LAYERS = (
+        "walls", "obstacles", "obsidian_obstacles", "checkpoints", "spectre",
+        "player",
+    )
+    # Stream a course through the biomes over and over, see `--endless`
+    endless = False
+
     def __init__(self) -> None:
         super().__init__()
+        # Guards everything in the world, see `simthread`
+        self.world_lock = threading.RLock()
+        self.scheduler.lock = self.world_lock
+        self.simulation: Optional[simthread.SimulationThread] = None
+        # Audio, sprites for the walls and memory reports, see `simthread`
+        self.main_thread = simthread.MainThreadCalls()
+        self.inputs = inputqueue.InputQueue()
+        self.watchdog = spikes.watchdog()
+
+    @staticmethod
+    def texture_paths() -> list[Path]:
+        """Every image `setup()` loads, to decode them ahead of time."""
+        paths = [
+            TEXTURES_PATH.get(name)
+            for name in (
+                "star", "cloud1", "cloud2", "cloud3", "checkpoint",
+                "checkpoint_active", "haunted_by_the_light", "click_to_play",
+                "show_credits", "quit_game", "tip_speed", "heart",
+                "continue", "quit",
+            )
+        ]
+        for directory, pattern in (
+            ("obsidian", "blinking_star_*.png"),
+            ("grass", "butterfly_small?_[123].png"),
+            ("slime", "slime_*.png"),
+            ("spectre", "spectre_*.png"),
+        ):
+            paths += assetpack.glob(TEXTURES_PATH / directory, pattern)
+        return paths + mapdata.tileset_images()
 
-    def setup(self) -> None:
-        self.started = False
-        self.ended = False
+    def setup(self, seed: Optional[int] = None) -> None:
+        startup.mark("intro")
+        self.setup_state(seed)
 
         self.shapes = pyglet.shapes.Batch()
         self.camera = arcade.camera.Camera2D()
         self.ui_camera = arcade.camera.Camera2D()
         self.setup_map()
+        memreport.checkpoint("setup_map", self)
         self.setup_player()
         self.setup_spectre()
+        self.update_walls()
         self.engine = model.CustomPhysicsEnginePlatformer(
             player_sprite=self.player,
             gravity_constant=GRAVITY,
             walls=self.scene["walls"],
         )
         self.setup_ui()
-        self.light_layer = arcade.experimental.lights.LightLayer(
+        memreport.checkpoint("setup_ui", self)
+        lighting = import_lighting()
+        self.light_layer = lighting.ScaledLightLayer(
             self.window.width,
             self.window.height,
+            scale=quality.governor.tier.light_scale,
         )
-        self.spectre_light = arcade.experimental.lights.Light(
+        self.spectre_light = lighting.Light(
             self.spectre.center_x, self.spectre.center_y - 50,
             radius=300,
             mode="soft",
         )
         self.light_layer.add(self.spectre_light)
-        self.prepared_ice_stars = arcade.SpriteList()
-        self.prepared_obs_stars = arcade.SpriteList()
-        self.setup_background_gradient_switch()
-        self.paused = False
-        self.jump_pending_requested = 0.0
+        self.setup_stars()
+        self.setup_ambient()
+        self.timeline = Timeline()
 
         self.active_sound = None
         self.active_player = None
-        self.sound_horizon = sound_horizon
-        self.sound_sewer = sound_sewer
-        self.sound_overworld = sound_overworld
-        # self.sound_dungeon = sound_dungeon
+        self.sound_horizon = preload.sound(MUSIC_PATH.get("Horizon"))
+        self.sound_sewer = preload.sound(
+            MUSIC_PATH.get("mysterious_sewer_main")
+        )
+        self.sound_overworld = preload.sound(MUSIC_PATH.get("cut_overworld"))
+        # self.sound_dungeon = preload.sound(MUSIC_PATH.get("dungeon002"))
 
         self.window.background_color = arcade.color.FRESH_AIR
         self.on_resize(self.window.width, self.window.height)
         self.start_fade_in()
+        # Everything is loaded, upload it before the first frame and keep
+        # new hit boxes for the next launch
+        preload.upload()
+        hitboxes.save()
+        gcpolicy.policy.level_loaded()
+        startup.mark("game setup")
+        startup.finish()
+
+    def setup_state(self, seed: Optional[int] = None) -> None:
+        """
+        Reset the run state. `seed` decides the map order and checkpoints, a
+        random one is picked if omitted.
+        """
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.started = False
+        self.ended = False
+        self.paused = False
+        self.biome = "grass"
+        self.inputs.clear()
+        self.pending_jump: Optional[inputqueue.InputEvent] = None
+        self.fade_rate = 200
+        self.next_view = None
+        self.ambient_animation_time = 0.0
+        # Taken when a checkpoint is activated, to respawn from
+        self.snapshots: dict[arcade.Sprite, WorldSnapshot] = {}
+        # Filled by arrange_maps()
+        self.player_triggers = TriggerQueue()
+        self.spectre_triggers = TriggerQueue()
+        self.star_spawner: Optional[Repeat] = None
+        # Clouds and butterflies are spawned until the player gets here
+        self.ambient_until_x = MAPS_PER_BIOME * MAP_PX
+        # Endless mode: how far the course was moved back in total
+        self.origin_x = 0.0
+        # (sound, volume) of the music of the run, once it started
+        self.music: Optional[tuple[arcade.Sound, float]] = None
+        self.telemetry = telemetry.RunRecorder(seed, self.endless)
+
+    def reset(self, seed: Optional[int] = None) -> None:
+        """
+        Start a new run in place. Unlike creating a new `GameView` this keeps
+        all textures, sprites, sprite lists and GL resources of the previous
+        run and only reshuffles the maps and resets the state.
+        """
+        self.scheduler.clear()
+        self.scheduler.schedule(self.update_click_to_play_angle, 1)
+        self.timeline.clear()
+        self.setup_state(seed)
+
+        ambient = self.scene["ambient"]
+        while ambient:
+            ambient.pop()  # Map sprites are added back by arrange_maps()
+        self.arrange_maps()
+
+        self.place_player()
+        self.place_spectre()
+        # Like a new camera, instead of panning over the whole level
+        self.camera.position = (self.window.width / 2, self.window.height / 2)
+        self.update_walls()
+        self.spectre_light.radius = 300
+        self.spectre_light.position = (
+            self.spectre.center_x, self.spectre.center_y - 50
+        )
+        for heart in self.heart_sprites:
+            if heart not in self.hearts:
+                self.hearts.append(heart)
 
-    def on_show_view(self) -> None:
+        self.window.background_color = arcade.color.FRESH_AIR
+        self.on_resize(self.window.width, self.window.height)
+        self.stop_fade_out()
+        self.start_fade_in()
         self.active_player = arcade.play_sound(self.sound_sewer)
+        # The screen is still black, a good time to clean up the last run
+        gcpolicy.policy.level_loaded()
 
-    def setup_background_gradient_switch(self) -> None:
-        self.background_gradient_to_ice = model.get_gradient(
-            arcade.color.FRESH_AIR[:3], (0, 51, 96),
-            BACKGROUND_GRADIENT_STEPS,
-        )[::-1]
-        self.background_gradient_to_obs = model.get_gradient(
-            (0, 51, 96), (20, 20, 20), BACKGROUND_GRADIENT_STEPS,
-        )[::-1]
+    def show_next_view(self) -> None:
+        if self.next_view is GameView:
+            self.reset()
+        else:
+            super().show_next_view()
+
+    def on_show_view(self) -> None:
+        self.active_player = arcade.play_sound(self.sound_sewer)
+        if simthread.ENABLED:
+            self.simulation = simthread.SimulationThread(
+                self.simulate, self.world_lock
+            )
+            self.simulation.start()
+
+    def on_hide_view(self) -> None:
+        super().on_hide_view()
+        if self.simulation is not None:
+            self.simulation.stop()
+            self.simulation = None
+        # Like stopping the music when the run ended
+        self.main_thread.run()
+
+    def setup_stars(self) -> None:
+        self.ice_stars: list[arcade.Sprite] = []
+        self.obs_stars: list[arcade.Sprite] = []
+        star_texture = model.load_texture(TEXTURES_PATH.get("star"))
+        blinking = {
+            scale: model.load_texture_series(
+                TEXTURES_PATH / "obsidian", stem, range(1, 3)
+            )
+            for scale, stem in (
+                (1, "blinking_star_{i}.png"), (2, "blinking_star_big_{i}.png")
+            )
+        }
         for _ in range(100):
             star = arcade.Sprite(
-                path_or_texture=TEXTURES_PATH.get("star"),
+                path_or_texture=star_texture,
                 scale=random.randint(1, 3),
                 center_x=random.randint(10, self.window.width - 10),
                 center_y=random.randint(10, self.window.height - 10),
             )
-            self.prepared_ice_stars.append(star)
+            self.ice_stars.append(star)
         for _ in range(20):
             scale = random.randint(1, 2)
-            stem = (
-                "blinking_star_{i}.png"
-                if scale == 1
-                else "blinking_star_big_{i}.png"
-            )
             star = model.AnimatedSprite(
                 scale=scale,
                 center_x=random.randint(10, self.window.width - 10),
                 center_y=random.randint(10, self.window.height - 10),
             )
-            star.add_textures({
-                "blinking": model.load_texture_series(
-                    TEXTURES_PATH / "obsidian",
-                    stem,
-                    range(1, 3),
-                )
-            })
+            star.add_textures({"blinking": blinking[scale]})
             star.state = "blinking"
-            self.prepared_obs_stars.append(star)
+            self.obs_stars.append(star)
+
+    def setup_ambient(self) -> None:
+        """Textures of the clouds and butterflies spawned while playing."""
+        self.cloud_textures = [
+            model.load_texture(TEXTURES_PATH.get(f"cloud{i}"))
+            for i in range(1, 4)
+        ]
+        self.butterfly_textures = [
+            model.load_texture_series(
+                TEXTURES_PATH / "grass",
+                f"butterfly_small{i}_{{i}}.png",
+                range(1, 4),
+            )
+            for i in range(1, 4)
+        ]
+
+    def setup_triggers(self) -> None:
+        """
+        Set up everything that happens once the player or spectre passes a
+        certain point of the level. In endless mode `append_map()` adds the
+        biome changes instead.
+        """
+        ice_x = (MAPS_PER_BIOME + 1) * MAP_PX
+        obs_x = (2 * MAPS_PER_BIOME + 1) * MAP_PX
+        dark_x = (3 * MAPS_PER_BIOME + 1) * MAP_PX
+
+        for x, func in (
+            (ice_x, self.start_background_gradient_to_ice),
+            (ice_x, lambda: self.spawn_stars(
+                self.ice_stars, quality.governor.tier.ice_stars
+            )),
+            (obs_x, self.start_background_gradient_to_obs),
+            (obs_x, lambda: self.spawn_stars(
+                self.obs_stars, quality.governor.tier.obsidian_stars
+            )),
+            (dark_x + 800, lambda: self.end("victory")),
+        ):
+            self.player_triggers.add(x, func)
+        self.spectre_triggers.add(
+            dark_x - 500, lambda: setattr(self.spectre, "change_y", 0)
+        )
 
-    def start_background_gradient_to_ice(self) -> None:
+    def enter_biome(self, biome: str, x: float) -> None:
+        """Endless mode: the player reached the first map of `biome` at `x`."""
+        if biome == "ice":
+            self.start_background_gradient_to_ice()
+            self.spawn_stars(self.ice_stars, quality.governor.tier.ice_stars)
+        elif biome == "obsidian":
+            self.start_background_gradient_to_obs()
+            self.spawn_stars(
+                self.obs_stars, quality.governor.tier.obsidian_stars
+            )
+        else:
+            self.start_background_gradient_to_grass(x)
+
+    def spawn_stars(self, stars: list[arcade.Sprite], limit: int) -> None:
+        """Add up to `limit` of `stars` to the ambient layer, two a frame."""
+        # A copy, the pool stays whole for the next time the biome is entered
+        stars = stars[:limit]
+        ambient = self.scene["ambient"]
+
+        def add_two() -> None:
+            # By the calls so far, a restored spawner continues from there
+            start = 2 * spawner.calls
+            ambient.extend(stars[start:start + 2])
+
+        self.timeline.cancel(self.star_spawner)
+        spawner = Repeat(add_two, (len(stars) + 1) // 2)
+        self.star_spawner = spawner
+        self.timeline.add(spawner)
+
+    def play_music(self, sound: arcade.Sound, volume: float = 1.0) -> None:
+        """Switch the music to `sound`, on the main thread."""
+        self.music = (sound, volume)
+        self.main_thread(self.stop_music)
+        self.main_thread(self.start_music, sound, volume)
+
+    def start_music(self, sound: arcade.Sound, volume: float) -> None:
+        self.active_player = arcade.play_sound(sound, volume=volume)
+
+    def stop_music(self) -> None:
         arcade.stop_sound(self.active_player)
         self.active_player.delete()
-        self.active_player = arcade.play_sound(self.sound_horizon)
 
-        def change_color(dt: float) -> None:
-            if not self.background_gradient_to_ice:
-                arcade.unschedule(change_color)
-                return
-            color = self.background_gradient_to_ice.pop()
-            self.window.background_color = color
+    def clear_ambient(self) -> None:
+        """
+        Remove all ambient sprites. Unlike `SpriteList.clear()`, which makes
+        new GPU buffers, this works off the main thread.
+        """
+        ambient = self.scene["ambient"]
+        while ambient:
+            ambient.pop()
 
-        arcade.schedule(change_color, 1 / BACKGROUND_GRADIENT_STEPS)
+    def set_background_color(self, color: tuple[float, ...]) -> None:
+        self.window.background_color = tuple(round(c) for c in color)
 
-        self.scene["ambient"].clear()
+    def start_background_gradient_to_ice(self) -> None:
+        self.biome = "ice"
+        self.play_music(self.sound_horizon)
+
+        self.timeline.tween(
+            self.set_background_color,
+            (0.0, arcade.color.FRESH_AIR[:3]),
+            (BACKGROUND_GRADIENT_DURATION, (0, 51, 96)),
+        )
+
+        self.clear_ambient()
+        self.main_thread(memreport.checkpoint, "biome_ice", self)
 
     def start_background_gradient_to_obs(self) -> None:
+        self.biome = "obsidian"
         # arcade.stop_sound(self.active_player)
         # self.active_player.delete()
         # self.active_player = arcade.play_sound(self.sound_dungeon)
 
-        def change_color(dt: float) -> None:
-            if not self.background_gradient_to_obs:
-                arcade.unschedule(change_color)
-                return
-            color = self.background_gradient_to_obs.pop()
-            self.window.background_color = color
+        self.timeline.tween(
+            self.set_background_color,
+            (0.0, (0, 51, 96)),
+            (BACKGROUND_GRADIENT_DURATION, (20, 20, 20)),
+        )
+        self.timeline.tween(
+            lambda radius: setattr(self.spectre_light, "radius", radius),
+            (0.0, self.spectre_light.radius),
+            (BACKGROUND_GRADIENT_DURATION, 500.0),
+        )
+
+        self.clear_ambient()
+        self.main_thread(memreport.checkpoint, "biome_obsidian", self)
 
-        arcade.schedule(change_color, 1 / BACKGROUND_GRADIENT_STEPS)
+    def start_background_gradient_to_grass(self, x: float) -> None:
+        """Endless mode: from the obsidian back to the grass at `x`."""
+        self.biome = "grass"
+        self.play_music(self.sound_overworld, 0.6)
 
-        self.spectre_light.radius = 500.0
+        self.timeline.tween(
+            self.set_background_color,
+            (0.0, (20, 20, 20)),
+            (BACKGROUND_GRADIENT_DURATION, arcade.color.FRESH_AIR[:3]),
+        )
+        self.timeline.tween(
+            lambda radius: setattr(self.spectre_light, "radius", radius),
+            (0.0, self.spectre_light.radius),
+            (BACKGROUND_GRADIENT_DURATION, 300.0),
+        )
 
-        self.scene["ambient"].clear()
+        self.clear_ambient()
+        self.ambient_until_x = x + (MAPS_PER_BIOME - 1) * MAP_PX
+        self.schedule_ambient()
+        self.main_thread(memreport.checkpoint, "biome_grass", self)
 
     def place_cloud(self, dt: float) -> None:
-        if (
-            self.player.center_x
-            < MAP_WIDTH * TILE_SIZE * TILE_SCALING * MAPS_PER_BIOME
-        ):
+        if self.player.center_x < self.ambient_until_x:
+            if random.random() >= quality.governor.tier.ambient_spawns:
+                return
             cloud = model.Sprite(
-                path_or_texture=TEXTURES_PATH.get(
-                    f"cloud{random.randint(1, 3)}"
-                ),
+                path_or_texture=random.choice(self.cloud_textures),
                 scale=8,
                 center_y=self.window.height - 200,
             )
@@ -346,21 +842,15 @@ class GameView(model.FadingView):
             cloud.change_x = -20
             self.scene["ambient"].append(cloud)
         else:
-            arcade.unschedule(self.place_cloud)
+            self.scheduler.unschedule(self.place_cloud)
 
     def place_butterfly(self, dt: float) -> None:
-        if (
-            self.player.center_x
-            < MAP_WIDTH * TILE_SIZE * TILE_SCALING * MAPS_PER_BIOME
-        ):
+        if self.player.center_x < self.ambient_until_x:
+            if random.random() >= quality.governor.tier.ambient_spawns:
+                return
             butterfly = model.AnimatedSprite(scale=2)
-            i = random.randint(1, 3)
             butterfly.add_textures({
-                "moving": model.load_texture_series(
-                    TEXTURES_PATH / "grass",
-                    f"butterfly_small{i}_{{i}}.png",
-                    range(1, 4),
-                )
+                "moving": random.choice(self.butterfly_textures)
             })
             butterfly.state = "moving"
             butterfly.left = self.window.width
@@ -368,31 +858,42 @@ class GameView(model.FadingView):
             butterfly.center_y = self.window.height - random.randint(350, 500)
             self.scene["ambient"].append(butterfly)
         else:
-            arcade.unschedule(self.place_butterfly)
+            self.scheduler.unschedule(self.place_butterfly)
 
     def start(self) -> None:
 
-        def start_movement_slime(dt: float) -> None:
+        def start_movement_slime() -> None:
             self.player.state = "moving"
             self.player.change_x = INITIAL_SPEED
-            self.active_player = arcade.play_sound(
-                self.sound_overworld, volume=0.6
-            )
+            self.music = (self.sound_overworld, 0.6)
+            self.main_thread(self.start_music, self.sound_overworld, 0.6)
 
-        def start_movement_spectre(dt: float) -> None:
+        def start_movement_spectre() -> None:
             self.spectre.state = "moving"
             self.spectre.change_x = INITIAL_SPEED_SPECTRE
 
         self.started = True
+        gcpolicy.policy.enter_gameplay()
         self.spectre.state = "awake"
-        arcade.stop_sound(self.active_player)
-        self.active_player.delete()
-        arcade.schedule_once(lambda _: self.engine.jump(JUMP_VELOCITY), 0.8)
-        arcade.schedule_once(start_movement_spectre, 1.4)
-        arcade.schedule_once(start_movement_slime, 2.0)
+        self.main_thread(self.stop_music)
+        self.timeline.sequence(
+            Wait(0.8),
+            Call(lambda: self.engine.jump(JUMP_VELOCITY)),
+            Wait(0.6),
+            Call(start_movement_spectre),
+            Wait(0.6),
+            Call(start_movement_slime),
+        )
 
-        arcade.schedule(self.place_cloud, 20.0)
-        arcade.schedule(self.place_butterfly, 10.0)
+        self.schedule_ambient()
+
+    def schedule_ambient(self) -> None:
+        """Spawn clouds and butterflies until `ambient_until_x`."""
+        for func, interval in (
+            (self.place_cloud, 20.0), (self.place_butterfly, 10.0)
+        ):
+            self.scheduler.unschedule(func)
+            self.scheduler.schedule(func, interval)
         self.place_cloud(0)
 
     def on_resize(self, width: int, height: int):
@@ -417,6 +918,7 @@ class GameView(model.FadingView):
         self.pause_quit.top = self.pause_continue.bottom - 40
 
         self.light_layer.resize(width, height)
+        self.screen_rect = arcade.types.LBWH(0, 0, width, height)
 
         for i, heart in enumerate(self.hearts):
             heart.top = height - 30
@@ -451,13 +953,18 @@ class GameView(model.FadingView):
             "dead": [dead],
             "victory": [victory],
         })
+        self.place_player()
+        self.scene["spawn"].visible = False
+        self.scene.add_sprite("player", self.player)
+
+    def place_player(self) -> None:
         self.player.state = "idling"
+        self.player.change_x = 0
+        self.player.change_y = 0
         self.player.center = (
             self.scene["spawn"][0].center_x,
             self.scene["spawn"][0].center_y - 16,
         )
-        self.scene["spawn"].visible = False
-        self.scene.add_sprite("player", self.player)
         self.camera.position = (
             self.player.center_x,
             self.player.center_y + self.window.height / 8,
@@ -483,136 +990,282 @@ class GameView(model.FadingView):
             "moving": moving,
             "awake": [awake],
         })
+        self.place_spectre()
+        self.scene["spectre_spawn"].visible = False
+        self.scene.add_sprite("spectre", self.spectre)
+
+    def place_spectre(self) -> None:
         self.spectre.state = "idling"
+        self.spectre.change_x = 0
+        self.spectre.change_y = 0
         self.spectre.center = (
             self.scene["spectre_spawn"][0].center_x,
             self.scene["spectre_spawn"][0].center_y,
         )
-        self.scene["spectre_spawn"].visible = False
-        self.scene.add_sprite("spectre", self.spectre)
 
     def setup_map(self) -> None:
-        self.maps = []
-        layer_options = {
-            "obstacles": {
-                "custom_class": model.Sprite,
-            }
-        }
-        init_map = arcade.tilemap.load_tilemap(
-            map_file=MAPS_PATH.get("init_map.tmj"),
-            scaling=TILE_SCALING,
-            layer_options=layer_options,
-        )
-        self.maps.append(init_map)
-        self.scene = arcade.Scene.from_tilemap(init_map)
-        self.scene.add_sprite_list("obstacles", use_spatial_hash=True)
-        self.scene.add_sprite_list("obsidian_obstacles", use_spatial_hash=True)
+        # All chunks ever loaded, by map name. Reused by later runs.
+        self.map_chunks: dict[str, list[MapChunk]] = {}
+        self.placed_chunks: list[MapChunk] = []
+        self.tile_textures = tiles.TileTextures()
+        # Checkpoints put on walls, by chunk, and the unused ones
+        self.chunk_checkpoints: dict[MapChunk, list[model.Sprite]] = {}
+        self.free_checkpoints: list[model.Sprite] = []
+        self.checkpoint_texture = model.load_texture(
+            TEXTURES_PATH.get("checkpoint")
+        )
+        self.checkpoint_active_texture = model.load_texture(
+            TEXTURES_PATH.get("checkpoint_active")
+        )
+
+        self.scene = arcade.Scene()
+        self.scene.add_sprite_list("walls")
+        # Collisions are checked through `self.obstacles`, no spatial hash
+        self.scene.add_sprite_list("obstacles")
+        self.scene.add_sprite_list("obsidian_obstacles")
         self.scene.add_sprite_list("ambient")
+        self.scene.add_sprite_list("checkpoints")
+        self.obstacles = collision.CollisionWorld()
+        self.walls = tiles.StaticTiles(self.scene["walls"], self.tile_textures)
+        init_chunk = self.load_map_chunk("init_map", 0)
+        for layer in ("spawn", "spectre_spawn"):
+            self.scene.add_sprite_list(layer)
+            self.scene[layer].extend(init_chunk.sprites(layer))
+
+        self.arrange_maps()
+
+    def load_map_chunk(self, name: str, offset_x: float) -> MapChunk:
+        chunk = MapChunk(name, self.tile_textures, offset_x)
+        self.map_chunks.setdefault(name, []).append(chunk)
+        return chunk
+
+    def arrange_maps(self) -> None:
+        """
+        Place the maps of a new run. Chunks already loaded by a previous run
+        are moved instead of loading the map file again, preferring the ones
+        that are still part of the scene.
+        """
+        if self.endless:
+            for chunk in self.placed_chunks:
+                self.remove_checkpoints(chunk)
+                chunk.detach(self.scene)
+            self.placed_chunks = []
+            self.course = mapdata.endless_map_order(self.rng)
+            self.course_biome = "grass"
+            self.course_end_x = 0.0
+            added = [
+                self.append_map(*next(self.course))
+                for _ in range(round(COURSE_AHEAD / MAP_PX) + 1)
+            ]
+            self.layout_course()
+            for chunk in added:
+                self.add_checkpoints(chunk)
+            return
 
-        grass_maps = list(range(1, 11))
-        random.shuffle(grass_maps)
-        for i in range(1, MAPS_PER_BIOME + 1):
-            map_num = grass_maps.pop()
-            map = arcade.tilemap.load_tilemap(
-                map_file=MAPS_PATH.get(f"grass_{map_num}.tmj"),
-                scaling=TILE_SCALING,
-                layer_options=layer_options,
-                offset=Vec2(
-                    round((i * MAP_WIDTH) * TILE_SIZE * TILE_SCALING), 0
-                ),
-            )
-            scene = arcade.Scene.from_tilemap(map)
-            self.scene["walls"].extend(scene["walls"])
-            self.maps.append(map)
-
-        ice_maps = list(range(1, 9))
-        # Ice only has 8 maps, so we need 2 twice
-        ice_maps.append(random.randint(1, 8))
-        ice_maps.append(random.randint(1, 8))
-        random.shuffle(ice_maps)
-        for i in range(1, MAPS_PER_BIOME + 1):
-            map_num = ice_maps.pop()
-            map = arcade.tilemap.load_tilemap(
-                map_file=MAPS_PATH.get(f"ice_{map_num}.tmj"),
-                scaling=TILE_SCALING,
-                layer_options=layer_options,
-                offset=Vec2(
-                    round(
-                        ((MAPS_PER_BIOME + i) * MAP_WIDTH)
-                        * TILE_SIZE * TILE_SCALING
-                    ), 0
-                ),
-            )
-            scene = arcade.Scene.from_tilemap(map)
-            self.scene["walls"].extend(scene["walls"])
-            self.scene["obstacles"].extend(scene["obstacles"])
-            self.maps.append(map)
-
-        obs_maps = list(range(1, 9))
-        # Obsidian only has 8 maps, so we need 2 twice
-        obs_maps.append(random.randint(1, 8))
-        obs_maps.append(random.randint(1, 8))
-        random.shuffle(obs_maps)
-        for i in range(1, MAPS_PER_BIOME + 1):
-            map_num = obs_maps.pop()
-            map = arcade.tilemap.load_tilemap(
-                map_file=MAPS_PATH.get(f"obsidian_{map_num}.tmj"),
-                scaling=TILE_SCALING,
-                layer_options=layer_options,
-                offset=Vec2(
-                    round(
-                        ((2 * MAPS_PER_BIOME + i) * MAP_WIDTH)
-                        * TILE_SIZE * TILE_SCALING
-                    ), 0
+        unused = {
+            name: list(chunks) for name, chunks in self.map_chunks.items()
+        }
+        placed = []
+        self.telemetry.maps = mapdata.roll_map_order(self.rng)
+        for i, name in enumerate(self.telemetry.maps):
+            offset_x = i * MAP_PX
+            candidates = unused.get(name)
+            if candidates:
+                chunk = next(
+                    (c for c in candidates if c.attached), candidates[0]
                 )
+                candidates.remove(chunk)
+                chunk.place(offset_x)
+            else:
+                chunk = self.load_map_chunk(name, offset_x)
+            placed.append(chunk)
+
+        for chunks in unused.values():
+            for chunk in chunks:
+                if chunk.attached:
+                    chunk.detach(self.scene)
+        for chunk in placed:
+            chunk.attach(self.scene)
+        self.placed_chunks = placed
+        self.layout_course()
+        self.place_checkpoints()
+        self.setup_triggers()
+
+    def take_chunk(self, name: str, offset_x: float) -> MapChunk:
+        """A chunk of map `name` at `offset_x`, reusing a detached one."""
+        for chunk in self.map_chunks.get(name, ()):
+            if not chunk.attached:
+                chunk.place(offset_x)
+                return chunk
+        return self.load_map_chunk(name, offset_x)
+
+    def append_map(self, biome: str, name: str) -> MapChunk:
+        """Endless mode: place map `name` of `biome` at the end."""
+        chunk = self.take_chunk(name, self.course_end_x)
+        chunk.attach(self.scene)
+        self.placed_chunks.append(chunk)
+        self.telemetry.maps.append(name)
+        if biome != self.course_biome:
+            self.course_biome = biome
+            self.player_triggers.add(
+                self.course_end_x,
+                functools.partial(self.enter_biome, biome, self.course_end_x),
             )
-            scene = arcade.Scene.from_tilemap(map)
-            self.scene["walls"].extend(scene["walls"])
-            self.scene["obsidian_obstacles"].extend(
-                scene["obsidian_obstacles"]
-            )
-            self.maps.append(map)
-
-        dark_map = arcade.tilemap.load_tilemap(
-            map_file=MAPS_PATH.get("darkness.tmj"),
-            scaling=TILE_SCALING,
-            layer_options=layer_options,
-            offset=Vec2(
-                round(
-                    ((3 * MAPS_PER_BIOME + 1) * MAP_WIDTH)
-                    * TILE_SIZE * TILE_SCALING
-                ), 0
-            )
+        self.course_end_x += MAP_PX
+        return chunk
+
+    def stream_course(self) -> None:
+        """
+        Endless mode: place maps ahead of the player and recycle the ones
+        behind the spectre. Maps from the last active checkpoint on are kept
+        to respawn there, but at most `COURSE_BEHIND` behind the spectre.
+        """
+        added = []
+        while self.course_end_x < self.player.center_x + COURSE_AHEAD:
+            added.append(self.append_map(*next(self.course)))
+
+        keep_x = self.spectre.left - MAP_PX
+        for checkpoint in self.scene["checkpoints"]:
+            if checkpoint.properties.get("active"):
+                keep_x = min(keep_x, checkpoint.left - MAP_PX)
+        keep_x = max(keep_x, self.spectre.left - COURSE_BEHIND)
+        removed = False
+        while self.placed_chunks[0].offset_x + MAP_PX < keep_x:
+            chunk = self.placed_chunks.pop(0)
+            self.remove_checkpoints(chunk)
+            chunk.detach(self.scene)
+            removed = True
+        if removed:
+            x = self.placed_chunks[0].offset_x
+            self.player_triggers.forget(x)
+            self.spectre_triggers.forget(x)
+
+        if added or removed:
+            self.layout_course()
+            for chunk in added:
+                self.add_checkpoints(chunk)
+        if self.player.center_x > REBASE_X:
+            self.rebase()
+
+    def rebase(self) -> None:
+        """
+        Endless mode: move the whole course back to start at 0. Positions
+        grow without end otherwise and lose precision, sprites are drawn
+        with float32 positions.
+        """
+        shift = self.placed_chunks[0].offset_x
+        self.origin_x += shift
+        for chunk in self.placed_chunks:
+            chunk.move(chunk.offset_x - shift)
+            for checkpoint in self.chunk_checkpoints.get(chunk, ()):
+                checkpoint.center_x -= shift
+        self.course_end_x -= shift
+        for sprite in (self.player, self.spectre):
+            sprite.center_x -= shift
+        x, y = self.spectre_light.position
+        self.spectre_light.position = (x - shift, y)
+        x, y = self.camera.position
+        self.camera.position = (x - shift, y)
+        self.player_triggers.shift(-shift)
+        self.spectre_triggers.shift(-shift)
+        self.ambient_until_x -= shift
+        self.layout_course()
+
+    def layout_course(self) -> None:
+        """Lay out the walls and obstacles of the placed chunks."""
+        self.walls.layout(
+            [(chunk.walls, chunk.offset_x) for chunk in self.placed_chunks]
         )
-        dark_scene = arcade.Scene.from_tilemap(dark_map)
-        self.scene["walls"].extend(dark_scene["walls"])
-        self.scene["ambient"].extend(dark_scene["ambient"])
-        self.maps.append(map)
-
-        # Add checkpoints
-        for wall in self.scene["walls"]:
-            wall: model.Sprite
-            if wall.properties.get("checkable"):
-                if wall.center_x <= MAP_WIDTH * TILE_SCALING * TILE_SIZE:
-                    continue  # Not on init map
-                if random.random() < 0.02:
-                    checkpoint = model.Sprite(
-                        path_or_texture=TEXTURES_PATH.get("checkpoint"),
-                        scale=TILE_SCALING,
-                        center_x=wall.center_x,
-                        center_y=wall.center_y + TILE_SIZE * TILE_SCALING,
-                    )
-                    if not arcade.check_for_collision_with_lists(
-                        checkpoint,
-                        [self.scene["obstacles"],
-                         self.scene["obsidian_obstacles"]],
-                    ):
-                        self.scene["checkpoints"].append(checkpoint)
+        self.layout_obstacles()
+
+    def layout_obstacles(self) -> None:
+        obstacles = self.scene["obstacles"]
+        self.obstacles.layout(
+            [*obstacles, *self.scene["obsidian_obstacles"]],
+            [
+                dripstone
+                for chunk in self.placed_chunks
+                for dripstone in chunk.dripstones
+                if dripstone.change_y and obstacles in dripstone.sprite_lists
+            ],
+        )
+        self.queue_dripstones()
+
+    def queue_dripstones(self) -> None:
+        """Dripstones that fall once the player gets close, left to right."""
+        obstacles = self.scene["obstacles"]
+        self.dripstones = sorted(
+            (
+                dripstone
+                for chunk in self.placed_chunks
+                for dripstone in chunk.dripstones
+                if not dripstone.change_y
+                and obstacles in dripstone.sprite_lists
+            ),
+            key=lambda dripstone: dripstone.left,
+        )
+        self.next_dripstone = 0
+
+    def place_checkpoints(self) -> None:
+        """Put checkpoints on the placed maps, reusing old ones."""
+        for chunk in list(self.chunk_checkpoints):
+            self.remove_checkpoints(chunk)
+        for chunk in self.placed_chunks:
+            self.add_checkpoints(chunk)
+
+    def add_checkpoints(self, chunk: MapChunk) -> None:
+        """Put checkpoints on random checkable walls of `chunk`."""
+        if chunk.name == "init_map":
+            return  # Has its own
+        checkpoints = self.scene["checkpoints"]
+        placed = self.chunk_checkpoints.setdefault(chunk, [])
+        properties = self.tile_textures.properties
+        walls = chunk.walls
+        for x, y, texture in zip(walls.x, walls.y, walls.texture):
+            if not properties[texture].get("checkable"):
+                continue
+            if self.rng.random() >= 0.02:
+                continue
+            if self.free_checkpoints:
+                checkpoint = self.free_checkpoints.pop()
+            else:
+                checkpoint = model.Sprite(
+                    path_or_texture=self.checkpoint_texture,
+                    scale=TILE_SCALING,
+                )
+            checkpoint.center_x = x + chunk.offset_x
+            checkpoint.center_y = y + TILE_SIZE * TILE_SCALING
+            if self.obstacles.collisions(checkpoint):
+                self.free_checkpoints.append(checkpoint)
+                continue
+            checkpoints.append(checkpoint)
+            placed.append(checkpoint)
+
+    def remove_checkpoints(self, chunk: MapChunk) -> None:
+        """Take the checkpoints off `chunk`, with their snapshots."""
+        checkpoints = self.scene["checkpoints"]
+        for checkpoint in self.chunk_checkpoints.pop(chunk, ()):
+            checkpoints.remove(checkpoint)
+            self.snapshots.pop(checkpoint, None)
+            self.set_checkpoint_active(checkpoint, False)
+            self.free_checkpoints.append(checkpoint)
+
+    def set_checkpoint_active(
+        self, checkpoint: arcade.Sprite, active: bool
+    ) -> None:
+        if active:
+            checkpoint.properties["active"] = True
+            checkpoint.texture = self.checkpoint_active_texture
+        else:
+            checkpoint.properties.pop("active", None)
+            checkpoint.texture = self.checkpoint_texture
 
     def setup_ui(self) -> None:
         self.ui_sprites = arcade.SpriteList()
         self.title = model.Sprite(
-            path_or_texture=TEXTURES_PATH.get("haunted_by_the_light"),
+            path_or_texture=model.load_texture(
+                TEXTURES_PATH.get("haunted_by_the_light")
+            ),
             scale=8,
             angle=-10,
         )
@@ -620,73 +1273,92 @@ class GameView(model.FadingView):
 
         self.click_to_play_angle = 0
         self.click_to_play = model.Sprite(
-            path_or_texture=TEXTURES_PATH.get("click_to_play"),
+            path_or_texture=model.load_texture(
+                TEXTURES_PATH.get("click_to_play")
+            ),
             scale=3,
             angle=25,
         )
 
-        def update_click_to_play_angle(dt: float) -> None:
-            self.click_to_play.angle = self.click_to_play_angle * 5 + 20
-            self.click_to_play_angle = not self.click_to_play_angle
-
-        arcade.schedule(update_click_to_play_angle, 1)
+        self.scheduler.schedule(self.update_click_to_play_angle, 1)
         self.ui_sprites.append(self.click_to_play)
 
         self.show_credits = model.Sprite(
-            path_or_texture=TEXTURES_PATH.get("show_credits"),
+            path_or_texture=model.load_texture(
+                TEXTURES_PATH.get("show_credits")
+            ),
             scale=3,
         )
         self.ui_sprites.append(self.show_credits)
 
         self.quit_game = model.Sprite(
-            path_or_texture=TEXTURES_PATH.get("quit_game"),
+            path_or_texture=model.load_texture(
+                TEXTURES_PATH.get("quit_game")
+            ),
             scale=3,
         )
         self.ui_sprites.append(self.quit_game)
 
         self.tip_speed = model.Sprite(
-            path_or_texture=TEXTURES_PATH.get("tip_speed"),
+            path_or_texture=model.load_texture(
+                TEXTURES_PATH.get("tip_speed")
+            ),
             scale=1,
             angle=0,
         )
         self.ui_sprites.append(self.tip_speed)
 
         self.hearts = arcade.SpriteList()
+        heart_texture = model.load_texture(TEXTURES_PATH.get("heart"))
         for _ in range(3):
             self.hearts.append(model.Sprite(
-                path_or_texture=TEXTURES_PATH.get("heart"),
+                path_or_texture=heart_texture,
                 scale=4,)
             )
+        self.heart_sprites = list(self.hearts)
 
         self.pause_sprites = arcade.SpriteList()
         self.pause_continue = model.Sprite(
-            path_or_texture=TEXTURES_PATH.get("continue"),
+            path_or_texture=model.load_texture(
+                TEXTURES_PATH.get("continue")
+            ),
             scale=3,
         )
         self.pause_quit = model.Sprite(
-            path_or_texture=TEXTURES_PATH.get("quit"),
+            path_or_texture=model.load_texture(
+                TEXTURES_PATH.get("quit")
+            ),
             scale=3,
         )
         self.pause_sprites.extend([self.pause_continue, self.pause_quit])
 
+    def update_click_to_play_angle(self, dt: float) -> None:
+        self.click_to_play.angle = self.click_to_play_angle * 5 + 20
+        self.click_to_play_angle = not self.click_to_play_angle
+
+    @spikes.watched("update")
+    @simthread.locked
     def on_update(self, delta_time: float) -> None:
-        super().on_update(delta_time)
+        if not self.paused:
+            super().on_update(delta_time)  # Fading, may switch views
+        if self.simulation is None:
+            self.simulate(delta_time)
+
+    def simulate(self, delta_time: float) -> None:
+        """
+        One step of the game logic. Called every frame, or at a fixed rate
+        on the simulation thread if there is one.
+        """
+        if not self.paused:
+            self.timeline.update(delta_time)
+        if self.started:
+            self.handle_inputs()
 
         if self.started and not self.ended and not self.paused:
-            # Jump input buffering
-            if (
-                time.time() - self.jump_pending_requested
-                < JUMP_PENDING_TIMEOUT
-            ):
-                if self.engine.can_jump():
-                    self.engine.jump(JUMP_VELOCITY)
-            else:
-                self.jump_pending_requested = 0.0
-
             if not self.player.change_y > 0 and self.player.state == "moving":
                 # Only gain if not jumping or going up
                 self.player.change_x += SPEED_GAIN_PER_SECOND * delta_time
-            elif self.player.center_x > MAP_WIDTH * TILE_SIZE * TILE_SCALING:
+            elif self.player.center_x > MAP_PX:
                 # Even reduce speed to spice things up (not on init_map)
                 self.player.change_x += SPEED_PENALTY_VERTICAL_PLUS
             self.spectre.change_x += SPEED_GAIN_PER_SECOND_SPECTRE * delta_time
@@ -696,10 +1368,11 @@ class GameView(model.FadingView):
             self.spectre.change_x = max(
                 self.spectre.change_x, self.player.change_x - SPECTRE_SPEED_CAP
             )
+            start_x, start_y = self.player.position
             self.engine.on_update(delta_time)
-            self.scene.on_update(
-                delta_time, ["ambient", "spectre", "obstacles"]
-            )
+            self.scene.on_update(delta_time, ["ambient", "spectre"])
+            for dripstone in self.obstacles.moving:
+                dripstone.on_update(delta_time)
             if self.spectre.state == "moving":
                 self.spectre.center_y = self.player.center_y
                 light_pos = (
@@ -707,14 +1380,19 @@ class GameView(model.FadingView):
                 )
                 self.spectre_light.position = light_pos
 
-            for dripstone in self.scene["obstacles"]:
-                dripstone: arcade.Sprite
+            for dripstone in list(self.obstacles.moving):
                 if dripstone.top < -500:
                     dripstone.remove_from_sprite_lists()
-                elif not dripstone.change_y:
-                    if dripstone.center_y > ICE_DRIPSTONE_FALL_HEIGHT:
-                        if self.player.right + 140 > dripstone.left:
-                            dripstone.change_y = -1000
+                    self.obstacles.remove(dripstone)
+            while (
+                self.next_dripstone < len(self.dripstones)
+                and self.player.right + 140
+                > self.dripstones[self.next_dripstone].left
+            ):
+                dripstone = self.dripstones[self.next_dripstone]
+                dripstone.change_y = -1000
+                self.obstacles.release(dripstone)
+                self.next_dripstone += 1
 
             for checkpoint in self.scene["checkpoints"]:
                 checkpoint: model.Sprite
@@ -724,69 +1402,41 @@ class GameView(model.FadingView):
                         and checkpoint.left <= self.player.center_x
                         <= checkpoint.right
                     ):
-                        checkpoint.properties["active"] = True
-                        checkpoint.texture = arcade.load_texture(
-                            file_path=TEXTURES_PATH.get("checkpoint_active"),
-                        )
+                        self.set_checkpoint_active(checkpoint, True)
+                        self.snapshots[checkpoint] = self.snapshot()
+                        self.telemetry.checkpoints += 1
 
-            if len(
-                self.background_gradient_to_ice
-            ) == BACKGROUND_GRADIENT_STEPS:
-                if self.player.center_x >= (
-                    MAPS_PER_BIOME + 1
-                ) * MAP_WIDTH * TILE_SIZE * TILE_SCALING:
-                    self.start_background_gradient_to_ice()
-                    self.background_gradient_to_ice.pop()
-            elif len(
-                self.background_gradient_to_obs
-            ) == BACKGROUND_GRADIENT_STEPS:
-                if self.player.center_x >= (
-                    2 * MAPS_PER_BIOME + 1
-                ) * MAP_WIDTH * TILE_SIZE * TILE_SCALING:
-                    self.start_background_gradient_to_obs()
-                    self.background_gradient_to_obs.pop()
-
-            if self.spectre.center_x + 500 > (
-                3 * MAPS_PER_BIOME + 1
-            ) * MAP_WIDTH * TILE_SIZE * TILE_SCALING:
-                self.spectre.change_y = 0
-            if self.player.center_x - 800 > (
-                3 * MAPS_PER_BIOME + 1
-            ) * MAP_WIDTH * TILE_SIZE * TILE_SCALING:
-                self.end("victory")
-
-            # Add stars
-            if (
-                (MAPS_PER_BIOME + 1) * MAP_WIDTH * TILE_SIZE * TILE_SCALING
-            ) <= self.player.center_x <= (
-                (2 * MAPS_PER_BIOME + 1) * MAP_WIDTH * TILE_SIZE * TILE_SCALING
-            ):
-                try:
-                    self.scene["ambient"].append(self.prepared_ice_stars.pop())
-                    self.scene["ambient"].append(self.prepared_ice_stars.pop())
-                except (IndexError, ValueError):
-                    pass
-            elif self.player.center_x >= (
-                2 * MAPS_PER_BIOME + 1
-            ) * MAP_WIDTH * TILE_SIZE * TILE_SCALING:
-                try:
-                    self.scene["ambient"].append(self.prepared_obs_stars.pop())
-                    self.scene["ambient"].append(self.prepared_obs_stars.pop())
-                except (IndexError, ValueError):
-                    pass
+            self.telemetry.update(
+                delta_time, self.origin_x + self.player.center_x,
+                self.player.change_x,
+            )
+            # Biome transitions, stars, victory, ...
+            self.spectre_triggers.advance(self.spectre.center_x)
+            self.player_triggers.advance(self.player.center_x)
 
             if not self.ended and self.player.center_y <= -200:
-                self.try_res()
+                self.try_res("fell")
             elif not self.ended and self.spectre.right - 30 > self.player.left:
-                self.try_res()
-            elif arcade.check_for_collision_with_lists(
-                self.player, [
-                    self.scene["obstacles"], self.scene["obsidian_obstacles"]
-                ],
+                self.try_res("caught")
+            elif self.obstacles.collisions(
+                self.player,
+                self.player.center_x - start_x,
+                self.player.center_y - start_y,
+                delta_time,
             ):
-                self.try_res()
-
-        self.scene.update_animation(delta_time)
+                self.try_res("obstacle")
+            if self.endless:
+                self.stream_course()
+
+        self.scene.update_animation(delta_time, self.WORLD_LAYERS)
+        # Cosmetic only, updated less often on lower quality
+        self.ambient_animation_time += delta_time
+        interval = quality.governor.tier.ambient_animation_interval
+        if self.ambient_animation_time >= interval:
+            self.scene.update_animation(
+                self.ambient_animation_time, ["ambient"]
+            )
+            self.ambient_animation_time = 0.0
 
         self.camera.match_screen()
         self.camera.position = arcade.math.lerp_2d(
@@ -797,8 +1447,53 @@ class GameView(model.FadingView):
             ),
             CAMERA_SPEED,
         )
+        if self.simulation is None:
+            self.update_walls()
+
+    def handle_inputs(self) -> None:
+        """
+        Apply the queued jump input right before the physics update. Presses
+        are buffered until the player can jump, for `JUMP_PENDING_TIMEOUT`
+        seconds at most.
+        """
+        now = time.perf_counter()
+        for event in self.inputs.take():
+            if event.action == inputqueue.JUMP:
+                self.pending_jump = event
+                self.try_pending_jump(now)
+            elif self.player.change_y > self.stop_jump_value:
+                self.player.change_y = self.stop_jump_value
+                inputqueue.latency.record(now - event.time)
+        self.try_pending_jump(now)
 
-    def try_res(self) -> None:
+    def try_pending_jump(self, now: float) -> None:
+        event = self.pending_jump
+        if event is None:
+            return
+        if (
+            self.ended or self.paused
+            or now - event.time >= JUMP_PENDING_TIMEOUT
+        ):
+            self.pending_jump = None
+        elif self.engine.can_jump():
+            self.engine.jump(JUMP_VELOCITY)
+            inputqueue.latency.record(now - event.time)
+            self.pending_jump = None
+
+    def update_walls(self) -> None:
+        """
+        Give the walls in view sprites. The player is always in view when it
+        moves, after respawning it waits until the camera caught up.
+        """
+        half_width = self.window.width / 2 / self.camera.zoom
+        self.walls.update(
+            self.camera.position[0] - half_width,
+            self.camera.position[0] + half_width,
+        )
+
+    def try_res(self, cause: str) -> None:
+        """Respawn at the last active checkpoint, if any, after `cause`."""
+        x = self.origin_x + self.player.center_x
         right_most_checkpoint = None
         for checkpoint in self.scene["checkpoints"]:
             checkpoint: model.Sprite
@@ -809,29 +1504,39 @@ class GameView(model.FadingView):
                 ):
                     right_most_checkpoint = checkpoint
         if right_most_checkpoint is None:
+            self.telemetry.death(x, cause, respawned=False)
             self.end()
             return
 
         try:
             self.hearts.pop()
         except (IndexError, ValueError):  # BUG SpriteList raises ValueError for some reason  # noqa
+            self.telemetry.death(x, cause, respawned=False)
             self.end()
             return
+        self.telemetry.death(x, cause, respawned=True)
 
         self.ended = True
 
         self.fade_rate = 200
         self.start_fade_out()
+        snapshot = self.snapshots[right_most_checkpoint]
 
-        def fade_back_in(dt: float) -> None:
+        def fade_back_in() -> None:
             self.fade_rate = 100
             self.stop_fade_out()
             self.start_fade_in()
 
-        arcade.schedule_once(fade_back_in, 1.0)
-        arcade.schedule_once(lambda _: setattr(self, "fade_rate", 200), 1.5)
+        def start_from_checkpoint() -> None:
+            self.ended = False
+            self.player.state = "moving"
 
-        def set_to_checkpoint(dt: float) -> None:
+        def set_to_checkpoint() -> None:
+            # Keeps the speed the player died with, not the checkpoint's
+            speed = self.player.change_x
+            # Also drops this sequence from the timeline
+            self.restore(snapshot)
+            self.player.change_x = speed
             self.player.state = "idling"
             self.player.update_animation(0)
             self.player.center_x = right_most_checkpoint.center_x
@@ -840,88 +1545,294 @@ class GameView(model.FadingView):
             self.spectre.center_y = self.player.center_y
             self.spectre_light.position = self.spectre.center
             self.spectre.change_x = self.player.change_x + 2
-            for obstacle in self.scene["obstacles"]:
-                if obstacle.change_y < 0:
-                    obstacle.remove_from_sprite_lists()
-
-        arcade.schedule_once(set_to_checkpoint, 1.0)
+            gcpolicy.policy.collect()  # Screen is black
+            self.timeline.sequence(
+                Wait(0.5),
+                Call(lambda: setattr(self, "fade_rate", 200)),
+                Wait(3.5),
+                Call(start_from_checkpoint),
+            )
 
-        def start_from_checkpoint(dt: float) -> None:
-            self.ended = False
-            self.player.state = "moving"
+        self.timeline.sequence(
+            Wait(1.0),
+            Call(fade_back_in),
+            Call(set_to_checkpoint),
+        )
 
-        arcade.schedule_once(start_from_checkpoint, 5.0)
+    @simthread.locked
+    def snapshot(self) -> WorldSnapshot:
+        """
+        Take a snapshot of the world, to `restore()` it later. Covers the
+        player, the spectre, obstacles, checkpoints, triggers, the timeline,
+        the biome with its ambient layer and music and the random state of
+        the run, but not the hearts. Only references what changes, so it's
+        cheap to take.
+        """
+        obstacles = self.scene["obstacles"]
+        return WorldSnapshot(
+            origin_x=self.origin_x,
+            player=_sprite_state(self.player),
+            spectre=_sprite_state(self.spectre),
+            jumps_since_ground=self.engine.jumps_since_ground,
+            spectre_light=(
+                self.spectre_light.position, self.spectre_light.radius
+            ),
+            course=tuple(
+                (
+                    chunk, chunk.offset_x,
+                    tuple(
+                        (
+                            dripstone.center_x, dripstone.center_y,
+                            dripstone.change_y,
+                            obstacles in dripstone.sprite_lists,
+                        )
+                        for dripstone in chunk.dripstones
+                    ),
+                )
+                for chunk in self.placed_chunks
+            ),
+            active_checkpoints=frozenset(
+                checkpoint for checkpoint in self.scene["checkpoints"]
+                if checkpoint.properties.get("active")
+            ),
+            player_triggers=self.player_triggers.fired_x,
+            spectre_triggers=self.spectre_triggers.fired_x,
+            timeline=self.timeline.snapshot(),
+            biome=self.biome,
+            background_color=self.window.background_color,
+            ambient=tuple(self.scene["ambient"]),
+            star_spawner=self.star_spawner,
+            ambient_until_x=self.ambient_until_x,
+            music=self.music,
+            rng=self.rng.getstate(),
+        )
 
-    def end(self, state: str = "dead") -> None:
-        arcade.stop_sound(self.active_player)
-        self.active_player.delete()
+    @simthread.locked
+    def restore(self, snapshot: WorldSnapshot) -> None:
+        """
+        Put the world back to how it was at `snapshot`, taken in the same
+        run. Only touches what changed and the dripstones, the grid of the
+        obstacles at rest is kept. Maps placed since are reset, the ones
+        recycled since aren't brought back.
+        """
+        # The course may have been moved back since, see `rebase()`
+        dx = snapshot.origin_x - self.origin_x
+        _restore_sprite(self.player, snapshot.player)
+        _restore_sprite(self.spectre, snapshot.spectre)
+        self.player.center_x += dx
+        self.spectre.center_x += dx
+        self.engine.jumps_since_ground = snapshot.jumps_since_ground
+        (x, y), self.spectre_light.radius = snapshot.spectre_light
+        self.spectre_light.position = (x + dx, y)
+        obstacles = self.scene["obstacles"]
+        course = {
+            chunk: (offset_x + dx, dripstones)
+            for chunk, offset_x, dripstones in snapshot.course
+        }
+        for chunk in self.placed_chunks:
+            offset_x, dripstones = course.get(chunk, (None, ()))
+            if offset_x != chunk.offset_x:
+                chunk.place(chunk.offset_x)
+                chunk.attach(self.scene)
+                self.settle_dripstones(chunk)
+                continue
+            for dripstone, (center_x, center_y, change_y, attached) in zip(
+                chunk.dripstones, dripstones
+            ):
+                if dripstone.position != (center_x + dx, center_y):
+                    dripstone.position = (center_x + dx, center_y)
+                dripstone.change_y = change_y
+                if attached != (obstacles in dripstone.sprite_lists):
+                    if attached:
+                        obstacles.append(dripstone)
+                    else:
+                        obstacles.remove(dripstone)
+            self.settle_dripstones(chunk)
+        self.queue_dripstones()
+        for checkpoint in self.scene["checkpoints"]:
+            # Not if it was recycled and put elsewhere since
+            active = (
+                checkpoint in snapshot.active_checkpoints
+                and checkpoint in self.snapshots
+            )
+            if active != bool(checkpoint.properties.get("active")):
+                self.set_checkpoint_active(checkpoint, active)
+        self.player_triggers.rewind(snapshot.player_triggers + dx)
+        self.spectre_triggers.rewind(snapshot.spectre_triggers + dx)
+        self.timeline.restore(snapshot.timeline)
+        self.biome = snapshot.biome
+        self.window.background_color = snapshot.background_color
+        ambient = self.scene["ambient"]
+        if tuple(ambient) != snapshot.ambient:
+            self.clear_ambient()
+            ambient.extend(snapshot.ambient)
+        self.star_spawner = snapshot.star_spawner
+        if snapshot.music is not None and snapshot.music != self.music:
+            self.play_music(*snapshot.music)
+        ended = self.ambient_until_x < self.player.center_x
+        self.ambient_until_x = snapshot.ambient_until_x + dx
+        if ended and self.player.center_x <= self.ambient_until_x:
+            self.schedule_ambient()
+        self.rng.setstate(snapshot.rng)
+
+    def settle_dripstones(self, chunk: MapChunk) -> None:
+        """Put the dripstones of `chunk` where they belong in `obstacles`."""
+        obstacles = self.scene["obstacles"]
+        for dripstone in chunk.dripstones:
+            if obstacles not in dripstone.sprite_lists:
+                self.obstacles.remove(dripstone)
+            elif dripstone.change_y:
+                self.obstacles.release(dripstone)
+            else:
+                self.obstacles.settle(dripstone)
+
+    def end(self, state: str = "dead", outcome: Optional[str] = None) -> None:
+        """
+        End the run with the player in `state`. `outcome` is recorded in
+        the telemetry log, `state` unless given.
+        """
+        self.main_thread(self.stop_music)
+        if telemetry.ENABLED and not self.telemetry.finished:
+            record = self.telemetry.finish(
+                outcome or state, quality.governor.tier.name
+            )
+            try:
+                telemetry.append(record)
+            except OSError:
+                pass  # Not worth ending the game over
 
         self.ended = True
+        gcpolicy.policy.leave_gameplay()
         self.player.state = state
         self.player.update_animation(0)
         self.next_view = OutroView if state == "victory" else GameView
         time = 3.0 if state == "victory" else 1.0
-        arcade.schedule_once(lambda _: self.start_fade_out(), time)
+        self.timeline.after(time, self.start_fade_out)
 
+    @spikes.watched("draw", end_frame=True)
     def on_draw(self) -> None:
-        self.clear()
-
-        with self.light_layer:
-            arcade.draw_rect_filled(
-                arcade.types.LBWH(0, 0, self.window.width, self.window.height),
-                self.window.background_color,
-            )
-            self.ui_camera.use()
-            self.scene.draw(["ambient"], pixelated=True)
-            self.camera.use()
-            self.scene.draw(
-                ["walls", "obstacles", "obsidian_obstacles",
-                 "checkpoints", "spectre", "player"],
-                pixelated=True,
-            )
-
-        self.light_layer.draw(ambient_color=arcade.color.WHITE)
-
-        if not self.started:
+        stats = gpustats.stats
+        # Only what reads the world holds the lock, the light pass and the
+        # UI on top overlap with the simulation
+        with self.world_lock:
+            self.main_thread.run()
+            if self.simulation is not None:
+                # New sprites may upload textures, so only here. The player
+                # is in view, the walls it collides with are too.
+                self.update_walls()
+            now = time.perf_counter()
+            if self.started and not self.ended and not self.paused:
+                self.telemetry.frame(now)
+            if quality.governor.frame(now):
+                self.apply_quality()
+            self.clear()
+
+            # Switching into and out of the light layer counts towards
+            # "lights"
+            with stats.stage("lights"), self.light_layer:
+                with stats.stage("background"):
+                    arcade.draw_rect_filled(
+                        self.screen_rect, self.window.background_color
+                    )
+                with stats.stage("ambient"):
+                    self.ui_camera.use()
+                    self.scene.draw(["ambient"], pixelated=True)
+                with stats.stage("world"):
+                    self.camera.use()
+                    self.scene.draw(self.WORLD_LAYERS, pixelated=True)
+            with stats.stage("lights"):
+                self.light_layer.sync()
+
+        with stats.stage("lights"):
+            self.light_layer.draw(ambient_color=arcade.color.WHITE)
+
+        with stats.stage("ui"):
+            if not self.started:
+                self.ui_camera.use()
+                self.ui_sprites.draw(pixelated=True)
             self.ui_camera.use()
-            self.ui_sprites.draw(pixelated=True)
-        self.ui_camera.use()
-        self.hearts.draw(pixelated=True)
+            with self.world_lock:  # Respawns take hearts
+                self.hearts.draw(pixelated=True)
 
         if self.paused:
-            arcade.draw_rect_filled(
-                arcade.types.LBWH(0, 0, self.window.width, self.window.height),
-                arcade.types.Color(0, 0, 0, 100),
-            )
-            self.pause_sprites.draw(pixelated=True)
-
-        self.draw_fading()
+            with stats.stage("pause"):
+                arcade.draw_rect_filled(
+                    self.screen_rect, arcade.types.Color(0, 0, 0, 100)
+                )
+                self.pause_sprites.draw(pixelated=True)
+
+        with stats.stage("fade"):
+            self.draw_fading()
+        if stats.installed:
+            stats.end_frame()
+
+    def apply_quality(self) -> None:
+        """
+        Apply a new quality tier. Stars already spawned beyond the limits of
+        a lower tier are removed, raised limits apply from the next spawn.
+        """
+        tier = quality.governor.tier
+        self.light_layer.set_scale(tier.light_scale)
+        for stars, limit in (
+            (self.ice_stars, tier.ice_stars),
+            (self.obs_stars, tier.obsidian_stars),
+        ):
+            for star in stars[limit:]:
+                star.remove_from_sprite_lists()
+
+    def sprite_counts(self) -> dict[str, int]:
+        """Sprites per drawn list, and the walls not in a sprite list."""
+        counts = {}
+        for name in ("ambient",) + self.WORLD_LAYERS:
+            try:
+                counts[name] = len(self.scene[name])
+            except KeyError:
+                pass  # Not set up yet
+        counts["static_walls"] = len(self.walls.x)
+        for name in ("ui_sprites", "hearts", "pause_sprites"):
+            if hasattr(self, name):
+                counts[name] = len(getattr(self, name))
+        return counts
+
+    @simthread.locked
+    def spike_state(self) -> dict[str, Any]:
+        """What's going on in the world, saved with slow frames."""
+        return {
+            "seed": self.seed,
+            "biome": self.biome,
+            "player_x": round(self.player.center_x, 1),
+            "player_y": round(self.player.center_y, 1),
+            "spectre_x": round(self.spectre.center_x, 1),
+            "started": self.started,
+            "ended": self.ended,
+            "paused": self.paused,
+            "sprites": self.sprite_counts(),
+            "simulation_thread": self.simulation is not None,
+        }
 
     @property
     def stop_jump_value(self) -> float:
         return -0.8 * self.player.change_y + JUMP_VELOCITY
 
+    @simthread.locked
     def on_key_press(self, symbol: int, modifiers: int):
         if self.started:
             if symbol == arcade.key.SPACE:
-                if self.engine.can_jump():
-                    self.engine.jump(JUMP_VELOCITY)
-                else:
-                    self.jump_pending_requested = time.time()
+                self.inputs.push(inputqueue.JUMP)
             elif symbol == arcade.key.ESCAPE:
                 self.paused = not self.paused
+                if self.paused:
+                    gcpolicy.policy.collect()
         else:
             if symbol == arcade.key.SPACE:
                 self.start()
 
+    @simthread.locked
     def on_key_release(self, symbol: int, modifiers: int):
-        if self.started:
-            if (
-                symbol == arcade.key.SPACE
-                and self.player.change_y > self.stop_jump_value
-            ):
-                self.player.change_y = self.stop_jump_value
+        if self.started and symbol == arcade.key.SPACE:
+            self.inputs.push(inputqueue.RELEASE)
 
+    @simthread.locked
     def on_mouse_press(self, x: int, y: int, button: int, modifiers: int):
         if self.started:
             if self.paused:
@@ -930,17 +1841,13 @@ class GameView(model.FadingView):
                         self.paused = False
                     elif self.pause_quit.rect.point_in_rect((x, y)):
                         self.paused = False
-                        self.end()
+                        self.end(outcome="quit")
             elif button == arcade.MOUSE_BUTTON_LEFT:
-                if self.engine.can_jump():
-                    self.engine.jump(JUMP_VELOCITY)
-                else:
-                    self.jump_pending_requested = time.time()
+                self.inputs.push(inputqueue.JUMP)
         else:
             if button == arcade.MOUSE_BUTTON_LEFT:
                 if self.show_credits.rect.point_in_rect((x, y)):
-                    arcade.stop_sound(self.active_player)
-                    self.active_player.delete()
+                    self.stop_music()
                     self.next_view = CreditsView
                     self.fade_rate = 500
                     self.start_fade_out()
@@ -949,13 +1856,10 @@ class GameView(model.FadingView):
                 else:
                     self.start()
 
+    @simthread.locked
     def on_mouse_release(self, x: int, y: int, button: int, modifiers: int):
-        if self.started:
-            if (
-                button == arcade.MOUSE_BUTTON_LEFT
-                and self.player.change_y > self.stop_jump_value
-            ):
-                self.player.change_y = self.stop_jump_value
+        if self.started and button == arcade.MOUSE_BUTTON_LEFT:
+            self.inputs.push(inputqueue.RELEASE)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,644 @@
+"""
+Monte Carlo balance analysis over random map orders.
+
+Plays many seeded runs with an autopilot that looks ahead with the env's
+physics, spread over a process pool, and reports how long runs last until
+the spectre catches up, where players die, per map out of how many runs got
+there, and how well checkpoints cover the level. Every run is written to a
+JSON lines file as soon as its batch finishes, only counters are kept in
+memory.
+
+    python -m hbtl.analyze --runs 5000 --output runs.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import (
+    FIRST_COMPLETED, Future, ProcessPoolExecutor, wait,
+)
+from pathlib import Path
+from typing import Any, Iterator, Optional, TextIO
+
+import numpy as np
+
+try:
+    from . import env as hbtl_env
+    from . import mapdata, reach
+    from .constants import (
+        INITIAL_SPEED, JUMP_VELOCITY, MAP_WIDTH, SPECTRE_SPEED_CAP,
+        SPEED_GAIN_PER_SECOND, SPEED_GAIN_PER_SECOND_SPECTRE,
+        SPEED_PENALTY_VERTICAL_PLUS,
+    )
+except ImportError:
+    # Nuitka does not allow invoking via -m
+    import env as hbtl_env
+    import mapdata
+    import reach
+    from constants import (
+        INITIAL_SPEED, JUMP_VELOCITY, MAP_WIDTH, SPECTRE_SPEED_CAP,
+        SPEED_GAIN_PER_SECOND, SPEED_GAIN_PER_SECOND_SPECTRE,
+        SPEED_PENALTY_VERTICAL_PLUS,
+    )
+
+MAP_PX = MAP_WIDTH * hbtl_env.TILE_PX
+CAUSES = {
+    hbtl_env.FELL: "fell",
+    hbtl_env.CAUGHT: "caught",
+    hbtl_env.OBSTACLE: "obstacle",
+}
+# Bins of the time to catch histogram, in seconds
+CATCH_BINS = list(range(0, 301, 10))
+# Batches in flight per worker, more are submitted as they finish
+IN_FLIGHT = 2
+# Steps between the autopilot's plans
+PLAN_EVERY = 20
+# Frames the autopilot looks past its next plan, enough to jump a gap and
+# fall below the walls
+LOOKAHEAD = 50
+# Most frames a jump is looked ahead
+PLAN_FRAMES = 90
+# Frames past the next plan a failure is already jumped for, later ones
+# are left to it
+JUMP_WITHIN = 30
+# Frames a jump runs on after landing, it must not die in them
+RUN_ON = 10
+# Frames the autopilot holds jump for, in the order of `reach.RELEASES`,
+# holding it until landing is a full jump
+HOLDS = tuple(
+    JUMP_VELOCITY if release == reach.HOLD else release
+    for release in reach.RELEASES
+)
+# Running speeds of the autopilot's `reach` tables
+TABLE_SPEEDS = tuple(range(INITIAL_SPEED, 701, 50))
+
+
+class Autopilot:
+    """
+    A scripted player that looks ahead with the env's physics. Every
+    `PLAN_EVERY` steps it runs on in all worlds at once for `LOOKAHEAD`
+    more frames, following the jumps it already made. Where that dies, is
+    caught by the spectre or is held up by a wall, it tries jumping in each
+    of the next `PLAN_EVERY` frames, holding jump for each of `HOLDS`
+    frames, and running on for `RUN_ON` frames after landing. Jumps the
+    `reach` tables of the map know to fall or to come back down where they
+    started are left out. It takes the earliest jump that gets past that
+    place without dying, of those the one getting farthest. Obstacles start
+    falling like in the env, only the ones the player can get to in a plan
+    are tested.
+    """
+    def __init__(self, env: hbtl_env.BatchedEnv) -> None:
+        self.env = env
+        # Steps jump is pressed at and released at, per world
+        self.press = np.full(env.num_worlds, -1, dtype=np.int64)
+        self.release = np.full(env.num_worlds, -1, dtype=np.int64)
+        # Worlds to plan for in the next step, out of turn
+        self.replan = np.zeros(env.num_worlds, dtype=bool)
+
+        # The jump tables of all maps in one, (map, speed, release, row,
+        # x step), and the index in it of each map of each world
+        names = sorted({name for order in env.map_orders for name in order})
+        tables = [reach.jump_table(name, TABLE_SPEEDS) for name in names]
+        shape = np.max([table.outcome.shape for table in tables], axis=0)
+        self.outcome = np.full(
+            (len(names), *shape), reach.UNKNOWN, dtype=np.int8
+        )
+        for i, table in enumerate(tables):
+            speeds, releases, rows, steps = table.outcome.shape
+            self.outcome[i, :speeds, :releases, :rows, :steps] = table.outcome
+        self.map_ids = np.array([
+            [names.index(name) for name in order] for order in env.map_orders
+        ])
+
+    def act(self) -> np.ndarray:
+        """Whether to hold jump in the next step, per world."""
+        env = self.env
+        due = self.replan | (env.steps % PLAN_EVERY == 0)
+        worlds = np.flatnonzero(due & ~env.done & env.moving)
+        if len(worlds):
+            self._plan(worlds)
+        self.replan[:] = False
+        return (self.press <= env.steps) & (env.steps < self.release)
+
+    def respawned(self, respawned: np.ndarray) -> None:
+        """Drop the jumps planned where the player respawned, plan anew."""
+        self.press[respawned] = -1
+        self.release[respawned] = -1
+        self.replan |= respawned
+
+    def _plan(self, worlds: np.ndarray) -> None:
+        env = self.env
+        # Frame the jump being held is released at, -1 for none
+        release = np.where(
+            self.release[worlds] >= env.steps,
+            self.release[worlds] - env.steps, -1,
+        )
+        frames = PLAN_EVERY + LOOKAHEAD
+        # x, y, vx, vy, spectre x and spectre vx per frame and world
+        states = np.zeros((frames + 1, 6, len(worlds)))
+        states[0] = (
+            env.x[worlds], env.y[worlds], env.vx[worlds], env.vy[worlds],
+            env.spectre_x[worlds], env.spectre_vx[worlds],
+        )
+        grounded = np.zeros((frames + 1, len(worlds)), dtype=bool)
+        grounded[0] = env.walls.can_jump(worlds, *states[0, :2])
+        course, fall_start = self._course(worlds)
+        failed = np.full(len(worlds), frames)
+        failed_x = np.full(len(worlds), np.inf)
+        # Only the players that didn't fail yet, compressed every frame
+        live = np.arange(len(worlds))
+        state = states[0]
+        for frame in range(frames):
+            if not len(live):
+                break
+            players = worlds[live]
+            previous = state
+            state = self._step(players, state, release[live] == frame)
+            fall_start[live], dead = self._obstacles(
+                tuple(part[live] for part in course), state,
+                np.full(len(live), frame), fall_start[live],
+            )
+            x = state[0]
+            states[frame + 1, :, live] = state.T
+            # Only the frames jumps are tried from
+            if frame + 1 < PLAN_EVERY:
+                grounded[frame + 1, live] = env.walls.can_jump(
+                    players, x, state[1]
+                )
+            # Held up by a wall, on the ground or not
+            blocked = x - previous[0] < state[2] * hbtl_env.DELTA_TIME / 2
+            fails = dead | blocked
+            failed[live[fails]] = frame
+            failed_x[live[fails]] = x[fails]
+            live, state = live[~fails], state[:, ~fails]
+
+        # Where running on fails, jumps at each of the next frames the
+        # player is on the ground and not holding jump
+        frame, index = np.nonzero(
+            grounded[:PLAN_EVERY]
+            & (np.arange(PLAN_EVERY)[:, None] > release)
+            & (np.arange(PLAN_EVERY)[:, None] <= failed)
+            & (failed < PLAN_EVERY + JUMP_WITHIN)
+        )
+        holds = np.repeat(np.arange(len(HOLDS)), len(index))
+        frame, index = np.tile(frame, len(HOLDS)), np.tile(index, len(HOLDS))
+        start = states[frame, :, index].T
+        tried = ~self._known_to_fail(worlds[index], start, holds)
+        frame, index, holds = frame[tried], index[tried], holds[tried]
+        if not len(index):
+            return
+        reached = self._jump(
+            worlds[index], start[:, tried], frame,
+            np.array(HOLDS)[holds],
+            tuple(part[index] for part in course),
+            np.where(
+                fall_start[index] < frame[:, None], fall_start[index], np.inf
+            ),
+        )
+        # Half a tile on, not just into a pit in front of the same wall
+        good = reached > failed_x[index] + hbtl_env.TILE_PX / 2
+        # Earliest first, then the one getting farthest
+        order = np.lexsort((-reached, frame, ~good))
+        index, frame, holds, good = (
+            index[order], frame[order], holds[order], good[order]
+        )
+        chosen = np.flatnonzero(good)[
+            np.unique(index[good], return_index=True)[1]
+        ]
+        jumpers = worlds[index[chosen]]
+        self.press[jumpers] = env.steps + frame[chosen]
+        self.release[jumpers] = (
+            env.steps + frame[chosen] + np.array(HOLDS)[holds[chosen]]
+        )
+
+    def _known_to_fail(
+        self, players: np.ndarray, state: np.ndarray, holds: np.ndarray
+    ) -> np.ndarray:
+        """
+        Whether the `reach` tables know jumps from the ground at `state`
+        (see `_step()`), holding jump for `HOLDS[holds]` frames, to fall or
+        to come back down where they started. Only where they do at both
+        speeds and both places of the tables around the player's.
+        """
+        x, y, vx = state[:3]
+        maps, speeds, releases, rows, steps = self.outcome.shape
+        position = np.clip(
+            np.floor(x / MAP_PX).astype(np.int64), 0,
+            self.map_ids.shape[1] - 1,
+        )
+        map_id = self.map_ids[players, position]
+        row = np.floor(
+            (y + self.env.player_box[1] + 0.01) / hbtl_env.TILE_PX
+        ).astype(np.int64)
+        step = np.floor(
+            (x - position * MAP_PX) / reach.START_STEP
+        ).astype(np.int64)
+        speed = np.searchsorted(TABLE_SPEEDS, vx, side="right") - 1
+        fails = np.ones(len(players), dtype=bool)
+        for speed_index in (speed, speed + 1):
+            for step_index in (step, step + 1):
+                inside = (
+                    (speed_index >= 0) & (speed_index < speeds)
+                    & (row >= 0) & (row < rows)
+                    & (step_index >= 0) & (step_index < steps)
+                )
+                outcome = np.where(inside, self.outcome[
+                    map_id, np.clip(speed_index, 0, speeds - 1), holds,
+                    np.clip(row, 0, rows - 1),
+                    np.clip(step_index, 0, steps - 1),
+                ], reach.UNKNOWN)
+                fails &= (outcome == reach.FELL) | (outcome == reach.BLOCKED)
+        return fails
+
+    def _jump(
+        self,
+        players: np.ndarray,
+        state: np.ndarray,
+        start: np.ndarray,
+        holds: np.ndarray,
+        course: tuple[np.ndarray, ...],
+        fall_start: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Jump from `state` (see `_step()`), `start` frames into the plan, and
+        run on after landing, among the obstacles of `course` (see
+        `_course()`).
+
+        :return: How far each player gets, the x `RUN_ON` frames after
+        landing or where it's held up by a wall before that. -inf where it
+        doesn't land, or dies before
+        :rtype: np.ndarray
+        """
+        state = state.copy()
+        state[3] = JUMP_VELOCITY
+        reached = np.full(len(players), -np.inf)
+        # Frame each player landed at, -1 while in the air
+        landed_at = np.full(len(players), -1)
+        # Only the players still simulated, compressed every frame
+        live = np.arange(len(players))
+        for frame in range(PLAN_FRAMES):
+            if not len(live):
+                break
+            previous = state
+            state = self._step(players, state, holds == frame)
+            fall_start, dead = self._obstacles(
+                course, state, start + frame, fall_start
+            )
+            x, y, vx, vy = state[:4]
+            down = (landed_at[live] < 0) & (frame > 0) & (vy <= 0)
+            down &= self.env.walls.can_jump(players, x, y)
+            landed_at[live[down]] = frame
+            on_ground = landed_at[live] >= 0
+            blocked = x - previous[0] < vx * hbtl_env.DELTA_TIME / 2
+            ran = landed_at[live] + RUN_ON <= frame
+            stopped = on_ground & (blocked | ran) & ~dead
+            reached[live[stopped]] = x[stopped]
+            keep = ~(dead | stopped)
+            live, players, holds, start = (
+                live[keep], players[keep], holds[keep], start[keep]
+            )
+            course = tuple(part[keep] for part in course)
+            state, fall_start = state[:, keep], fall_start[keep]
+        ran = landed_at[live] >= 0
+        reached[live[ran]] = state[0, ran]
+        return reached
+
+    def _step(
+        self, players: np.ndarray, state: np.ndarray, released: np.ndarray
+    ) -> np.ndarray:
+        """
+        The player's and the spectre's part of `BatchedEnv.step()`, for a
+        `state` of x, y, vx, vy, spectre x and spectre vx per player.
+        """
+        x, y, vx, vy, spectre_x, spectre_vx = state
+        dt = hbtl_env.DELTA_TIME
+        stop_jump_value = -0.8 * vy + JUMP_VELOCITY
+        vy = np.where(released & (vy > stop_jump_value), stop_jump_value, vy)
+        vx = vx + np.where(
+            vy > 0,
+            np.where(x > MAP_PX, SPEED_PENALTY_VERTICAL_PLUS, 0),
+            SPEED_GAIN_PER_SECOND * dt,
+        )
+        spectre_vx = np.maximum.reduce([
+            spectre_vx + SPEED_GAIN_PER_SECOND_SPECTRE * dt,
+            vx - 10, vx - SPECTRE_SPEED_CAP,
+        ])
+        x, y, vy = self.env.walls.move(players, x, y, vx, vy)
+        spectre_x = spectre_x + spectre_vx * dt
+        return np.stack((x, y, vx, vy, spectre_x, spectre_vx))
+
+    def _course(
+        self, worlds: np.ndarray
+    ) -> tuple[tuple[np.ndarray, ...], np.ndarray]:
+        """
+        The obstacles of `worlds` the player can get to within a plan, as
+        their boxes (world, obstacle, left/bottom/right/top), whether they
+        are alive and whether they fall, padded with dead ones.
+
+        :return: The course, and the frame each obstacle starts falling at,
+        already falling ones at -1
+        :rtype: tuple[tuple[np.ndarray, ...], np.ndarray]
+        """
+        env = self.env
+        left, _, right, _ = env.player_box
+        x = env.x[worlds]
+        frames = PLAN_EVERY + max(LOOKAHEAD, PLAN_FRAMES)
+        # Falling ones start 140px ahead, see `BatchedEnv.step()`
+        ahead = x + right + 140 + hbtl_env.TILE_PX
+        ahead += env.vx[worlds] * hbtl_env.DELTA_TIME * frames
+        obstacles = env.obstacles[worlds]
+        near = env.obstacle_alive[worlds] & (
+            (obstacles[:, :, 2] > (x + left)[:, None])
+            & (obstacles[:, :, 0] < ahead[:, None])
+        )
+        count = max(1, int(near.sum(axis=1).max()))
+        index = np.argsort(~near, axis=1, kind="stable")[:, :count]
+        course = (
+            np.take_along_axis(obstacles, index[:, :, None], axis=1),
+            np.take_along_axis(near, index, axis=1),
+            np.take_along_axis(env.obstacle_falls[worlds], index, axis=1),
+        )
+        falling = np.take_along_axis(env.obstacle_vy[worlds], index, axis=1)
+        return course, np.where(falling < 0, -1.0, np.inf)
+
+    def _obstacles(
+        self,
+        course: tuple[np.ndarray, ...],
+        state: np.ndarray,
+        frame: np.ndarray,
+        fall_start: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Start the obstacles of `course` (see `_course()`) falling like
+        `BatchedEnv.step()` and test the players in `state` against them
+        and the spectre, `frame` frames into the plan. Players below all
+        walls can't land anymore and count as dead.
+
+        :return: The new `fall_start` and whether each player died
+        :rtype: tuple[np.ndarray, np.ndarray]
+        """
+        env = self.env
+        obstacles, alive, falls = course
+        x, y = state[:2]
+        left, bottom, right, top = env.player_box
+        left, bottom, right, top = x + left, y + bottom, x + right, y + top
+        fallen = hbtl_env.FALL_SPEED * hbtl_env.DELTA_TIME * np.maximum(
+            frame[:, None] - fall_start, 0
+        )
+        fall_start = np.where(
+            alive & falls & np.isinf(fall_start)
+            & (right[:, None] + 140 > obstacles[:, :, 0]),
+            frame[:, None], fall_start,
+        )
+        hit = (
+            alive
+            & (obstacles[:, :, 0] < right[:, None])
+            & (obstacles[:, :, 2] > left[:, None])
+            & (obstacles[:, :, 1] + fallen < top[:, None])
+            & (obstacles[:, :, 3] + fallen > bottom[:, None])
+        ).any(axis=1)
+        caught = state[4] + env.spectre_box[2] - 30 > left
+        return fall_start, hit | caught | (top < 0)
+
+
+def play(seeds: list[int], max_time: float) -> list[dict[str, Any]]:
+    """
+    Play `seeds` in one batched environment, one record per run. Each run
+    is stopped on its own once it lasted `max_time` game seconds.
+    """
+    env = hbtl_env.BatchedEnv(len(seeds))
+    env.reset(seeds)
+    pilot = Autopilot(env)
+    deaths: list[list[dict[str, Any]]] = [[] for _ in seeds]
+    first_catch: list[Optional[float]] = [None] * len(seeds)
+    # Respawns go back, the record is of the farthest a run got
+    farthest = env.x.copy()
+
+    while not env.done.all():
+        died_x = env.x.copy()
+        _, _, _, info = env.step(pilot.act())
+        env.done |= env.time >= max_time
+        pilot.respawned(info["respawned"])
+        farthest = np.maximum(farthest, env.x)
+        for i in np.nonzero(info["died"])[0]:
+            cause = int(info["cause"][i])
+            x = float(died_x[i])
+            map_index = min(int(x // MAP_PX), len(env.map_orders[i]) - 1)
+            deaths[i].append({
+                "cause": CAUSES[cause],
+                "map": env.map_orders[i][map_index],
+                "x": round(x % MAP_PX, 1),
+                "time": round(float(env.time[i]), 2),
+            })
+            if cause == hbtl_env.CAUGHT and first_catch[i] is None:
+                first_catch[i] = float(env.time[i])
+
+    records = []
+    for i, seed in enumerate(seeds):
+        order = env.map_orders[i]
+        checkpoint_maps = sorted({
+            int(x // MAP_PX)
+            for x in env.checkpoints[i, env.checkpoint_valid[i], 0]
+        })
+        records.append({
+            "seed": seed,
+            "maps": order,
+            "won": bool(env.won[i]),
+            "stopped": bool(env.time[i] >= max_time and not env.won[i]),
+            "time": round(float(env.time[i]), 2),
+            "distance": round(float(farthest[i]) / MAP_PX, 3),
+            "time_to_catch": first_catch[i],
+            "deaths": deaths[i],
+            "checkpoints": int(env.checkpoint_valid[i].sum()),
+            "checkpoint_maps": [order[index] for index in checkpoint_maps],
+            "longest_uncovered": _longest_gap(checkpoint_maps, len(order)),
+        })
+    return records
+
+
+def _longest_gap(covered: list[int], num_maps: int) -> int:
+    """Most maps in a row without a checkpoint."""
+    longest = 0
+    previous = -1
+    for index in covered + [num_maps]:
+        longest = max(longest, index - previous - 1)
+        previous = index
+    return longest
+
+
+def _batches(
+    first_seed: int, runs: int, batch_size: int
+) -> Iterator[list[int]]:
+    for start in range(first_seed, first_seed + runs, batch_size):
+        yield list(range(start, min(start + batch_size, first_seed + runs)))
+
+
+class Report:
+    """Counters updated run by run, so memory stays bounded."""
+    def __init__(self) -> None:
+        self.runs = 0
+        self.won = 0
+        self.stopped = 0
+        self.catch_histogram = [0] * len(CATCH_BINS)
+        self.never_caught = 0
+        self.deaths_by_map: Counter[str] = Counter()
+        self.deaths_by_cause: Counter[str] = Counter()
+        # Runs the map was in the order of, and runs that got to it
+        self.runs_by_map: Counter[str] = Counter()
+        self.reached_by_map: Counter[str] = Counter()
+        self.checkpoints_by_map: Counter[str] = Counter()
+        self.checkpoint_counts: Counter[int] = Counter()
+        self.uncovered: Counter[int] = Counter()
+
+    def add(self, record: dict[str, Any]) -> None:
+        self.runs += 1
+        self.won += record["won"]
+        self.stopped += record["stopped"]
+        catch = record["time_to_catch"]
+        if catch is None:
+            self.never_caught += 1
+        else:
+            index = min(int(catch // 10), len(CATCH_BINS) - 1)
+            self.catch_histogram[index] += 1
+        for death in record["deaths"]:
+            self.deaths_by_map[death["map"]] += 1
+            self.deaths_by_cause[death["cause"]] += 1
+        self.runs_by_map.update(set(record["maps"]))
+        reached = record["maps"][:int(record["distance"]) + 1]
+        self.reached_by_map.update(set(reached))
+        self.checkpoints_by_map.update(set(record["checkpoint_maps"]))
+        self.checkpoint_counts[record["checkpoints"]] += 1
+        self.uncovered[record["longest_uncovered"]] += 1
+
+    def format(self) -> str:
+        lines = [
+            f"{self.runs} runs, {self.won} won, {self.stopped} stopped at "
+            "the time limit"
+        ]
+
+        lines.append("\nTime until caught by the spectre:")
+        most = max(self.catch_histogram) or 1
+        for start, count in zip(CATCH_BINS, self.catch_histogram):
+            if count:
+                bar = "#" * round(count / most * 40)
+                lines.append(f"  {start:>3}s+ {count:>6} {bar}")
+        lines.append(f"  never  {self.never_caught:>6}")
+
+        lines.append("\nDeaths by cause:")
+        for cause, count in self.deaths_by_cause.most_common():
+            lines.append(f"  {cause:<10} {count:>6}")
+
+        lines.append(
+            "\nDeaths per run that got to the map (most deadly first), of "
+            "how many runs:"
+        )
+        rates = {
+            name: self.deaths_by_map[name] / reached
+            for name, reached in self.reached_by_map.items()
+        }
+        for name, rate in sorted(rates.items(), key=lambda item: -item[1]):
+            covered = self.checkpoints_by_map[name] / self.runs_by_map[name]
+            lines.append(
+                f"  {name:<12} {rate:6.3f} of {self.reached_by_map[name]:>6}"
+                f"   checkpoint in {covered:6.1%} of runs"
+            )
+        never = sorted(set(self.runs_by_map) - set(self.reached_by_map))
+        if never:
+            lines.append(f"  Never got to: {', '.join(never)}")
+
+        lines.append("\nCheckpoints per run:")
+        for count in sorted(self.checkpoint_counts):
+            lines.append(f"  {count:>3} {self.checkpoint_counts[count]:>6}")
+        lines.append("\nMost maps in a row without a checkpoint:")
+        for count in sorted(self.uncovered):
+            lines.append(f"  {count:>3} {self.uncovered[count]:>6}")
+        return "\n".join(lines)
+
+
+def _collect(
+    pending: set[Future[list[dict[str, Any]]]],
+    file: TextIO,
+    report: Report,
+    runs: int,
+    start: float,
+) -> set[Future[list[dict[str, Any]]]]:
+    """
+    Wait for at least one of the `pending` batches, write its runs, add
+    them to `report` and print the progress, `start` being when the
+    analysis started (`time.perf_counter()`).
+
+    :return: The batches still pending
+    :rtype: set[Future]
+    """
+    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        for record in future.result():
+            file.write(json.dumps(record) + "\n")
+            report.add(record)
+        file.flush()
+        print(
+            f"{report.runs}/{runs} runs, {report.won} won, "
+            f"{time.perf_counter() - start:.1f}s",
+            file=sys.stderr, flush=True,
+        )
+    return pending
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m hbtl.analyze",
+        description="Play many random map orders with an autopilot.",
+    )
+    parser.add_argument("--runs", type=int, default=1000)
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument(
+        "--batch-size", type=int, default=64,
+        help="Runs per batched environment",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1,
+        help="Processes to play on",
+    )
+    parser.add_argument(
+        "--max-time", type=float, default=600,
+        help="Game seconds after which a run is stopped",
+    )
+    parser.add_argument(
+        "--output", type=Path, default=Path("runs.jsonl"),
+        help="JSON lines file every run is written to",
+    )
+    args = parser.parse_args(argv)
+
+    # Before the workers, so they don't all build them at once
+    print("Loading the jump tables of the maps", file=sys.stderr)
+    for name in sorted(mapdata.map_files()):
+        reach.jump_table(name, TABLE_SPEEDS)
+
+    report = Report()
+    start = time.perf_counter()
+    batches = _batches(args.first_seed, args.runs, args.batch_size)
+    with ProcessPoolExecutor(args.workers) as executor, \
+            args.output.open("w") as file:
+        # Submitted a few at a time, finished batches don't pile up
+        pending: set[Future[list[dict[str, Any]]]] = set()
+        for batch in batches:
+            if len(pending) >= IN_FLIGHT * args.workers:
+                pending = _collect(
+                    pending, file, report, args.runs, start
+                )
+            pending.add(executor.submit(play, batch, args.max_time))
+        while pending:
+            pending = _collect(pending, file, report, args.runs, start)
+    print(
+        f"Done in {time.perf_counter() - start:.1f}s, "
+        f"runs written to {args.output}",
+        file=sys.stderr,
+    )
+    print(report.format())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+All assets in a single file.
+
+A pack starts with a header: the magic bytes, the length of the index and
+the index itself, a JSON list of `[name, offset, length]` entries in the
+order `Path.rglob()` found the files at build time. The file contents
+follow. At runtime the pack is memory mapped once. Entries are slices of
+the mapping, so `read_asset()` needs no open, stat or copy of the file.
+Pillow and the XML parser need a file object instead, `open_asset()` gives
+them one over a single copy of the entry.
+
+When `assets.pack` exists next to the code (like in the release builds)
+every path below the assets directory is looked up in the pack, everything
+else (and everything when there is no pack) comes from the file system.
+
+    python -m hbtl.assetpack hbtl/assets assets.pack
+"""
+
+import argparse
+import fnmatch
+import functools
+import io
+import json
+import mmap
+import os
+import struct
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Iterable, Iterator, Optional, Union
+
+MAGIC = b"HBTLPACK\x01"
+HEADER = struct.Struct("<I")
+ASSETS_DIR = Path(__file__).parent / "assets"
+PACK_PATH = Path(__file__).parent / "assets.pack"
+# Left out of packs, like the builds leave them out of the data files
+EXCLUDE = (
+    "*.aseprite", "*.tiled-project", "*.tiled-session", "*.tmx", "*.unused",
+)
+# Streamed by the audio backend, which needs real files
+LOOSE = ("music/*", "sounds/*")
+
+
+class AssetPack:
+    """A pack file, memory mapped."""
+    def __init__(self, path: Path) -> None:
+        with path.open("rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an asset pack")
+        start = len(MAGIC) + HEADER.size
+        (index_size,) = HEADER.unpack_from(self._map, len(MAGIC))
+        index = json.loads(bytes(self._map[start:start + index_size]))
+        self._view = memoryview(self._map)
+        # Dicts keep the order of the index, which is rglob() order
+        self.entries: dict[str, tuple[int, int]] = {
+            name: (offset, length) for name, offset, length in index
+        }
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entries
+
+    def read(self, name: str) -> memoryview:
+        """The contents of an entry, without copying."""
+        offset, length = self.entries[name]
+        return self._view[offset:offset + length]
+
+    def open(self, name: str) -> BinaryIO:
+        """A file object over a copy of the entry, made in one go."""
+        return io.BytesIO(self.read(name))
+
+
+def build(
+    source: Path,
+    output: Path,
+    exclude: Iterable[str] = EXCLUDE + LOOSE,
+) -> int:
+    """Pack all files below `source` into `output`. Returns their number."""
+    exclude = tuple(exclude)
+    files = [
+        path for path in source.rglob("*")
+        if path.is_file() and not any(
+            PurePosixPath(path.relative_to(source).as_posix()).match(pattern)
+            for pattern in exclude
+        )
+    ]
+    names = [path.relative_to(source).as_posix() for path in files]
+    sizes = [path.stat().st_size for path in files]
+
+    # The offsets depend on the size of the index, which contains them
+    offset = 0
+    while True:
+        index = []
+        position = offset
+        for name, size in zip(names, sizes):
+            index.append([name, position, size])
+            position += size
+        encoded = json.dumps(index).encode()
+        data_start = len(MAGIC) + HEADER.size + len(encoded)
+        if data_start == offset:
+            break
+        offset = data_start
+
+    temp = output.with_name(output.name + ".tmp")
+    with temp.open("wb") as file:
+        file.write(MAGIC)
+        file.write(HEADER.pack(len(encoded)))
+        file.write(encoded)
+        for path in files:
+            file.write(path.read_bytes())
+    temp.replace(output)
+    return len(files)
+
+
+_pack: Optional[AssetPack] = None
+_pack_checked = False
+
+
+def pack() -> Optional[AssetPack]:
+    """The pack next to the code, if there is one."""
+    global _pack, _pack_checked
+    if not _pack_checked:
+        _pack_checked = True
+        if PACK_PATH.is_file():
+            _pack = AssetPack(PACK_PATH)
+    return _pack
+
+
+def _name(path: Path) -> Optional[str]:
+    """Name of `path` in the pack, if it is below the assets directory."""
+    if pack() is None:
+        return None
+    # Without touching the file system, paths in the pack don't exist
+    path = os.path.abspath(path)
+    for base in _bases():
+        if path.startswith(base):
+            return path[len(base):].replace(os.sep, "/") or "."
+        if path == base[:-1]:
+            return "."
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def _bases() -> tuple[str, ...]:
+    """The assets directory as given and with symlinks resolved."""
+    return tuple({
+        os.path.join(os.path.abspath(ASSETS_DIR), ""),
+        os.path.join(ASSETS_DIR.resolve(), ""),
+    })
+
+
+def open_asset(path: Path) -> BinaryIO:
+    """Open a file for reading, from the pack if it is in there."""
+    name = _name(path)
+    current = pack()
+    if name is not None and current is not None and name in current:
+        return current.open(name)
+    return Path(path).open("rb")
+
+
+def read_asset(path: Path) -> Union[bytes, memoryview]:
+    """
+    The contents of a file. Entries of the pack are slices of the mapping,
+    without a copy.
+    """
+    name = _name(path)
+    current = pack()
+    if name is not None and current is not None and name in current:
+        return current.read(name)
+    return Path(path).read_bytes()
+
+
+def read_text(path: Path) -> str:
+    return str(read_asset(path), "utf-8")
+
+
+def _matches(directory: Path, pattern: str, recursive: bool) -> list[Path]:
+    prefix = _name(directory)
+    current = pack()
+    if prefix is None or current is None:
+        return []
+    prefix = "" if prefix == "." else prefix + "/"
+    found = []
+    for name in current.entries:
+        if not name.startswith(prefix):
+            continue
+        relative = name[len(prefix):]
+        if recursive:
+            match = PurePosixPath(relative).match(pattern)
+        else:
+            match = "/" not in relative and fnmatch.fnmatchcase(
+                relative, pattern
+            )
+        if match:
+            found.append(ASSETS_DIR / name)
+    return found
+
+
+def glob(directory: Path, pattern: str) -> Iterator[Path]:
+    """
+    Like `directory.glob(pattern)` for a pattern without slashes. Looks at
+    the file system if nothing in the pack matches, like for the music.
+    """
+    found = _matches(directory, pattern, recursive=False)
+    return iter(found) if found else directory.glob(pattern)
+
+
+def rglob(directory: Path, pattern: str) -> Iterator[Path]:
+    """Like `directory.rglob(pattern)`, otherwise the same as `glob()`."""
+    found = _matches(directory, pattern, recursive=True)
+    return iter(found) if found else directory.rglob(pattern)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m hbtl.assetpack",
+        description="Pack the assets into a single file.",
+    )
+    parser.add_argument("source", type=Path, nargs="?", default=ASSETS_DIR)
+    # Not next to the code by default, it would be used instead of the
+    # assets while developing
+    parser.add_argument(
+        "output", type=Path, nargs="?", default=Path(PACK_PATH.name)
+    )
+    args = parser.parse_args(argv)
+    count = build(args.source, args.output)
+    print(f"Packed {count} files into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Render benchmark without a monitor.
+
+Sets up a run in a hidden window, or headless (EGL, e.g. Mesa llvmpipe) with
+`--headless`, and sweeps the camera through the grass, ice and obsidian
+biomes. It draws every frame with `GameView.on_draw()`, light layer
+included. Nothing is simulated: the player is placed along the path and only
+animations, biome triggers and the background timeline advance. The window's
+framebuffer is offscreen in both modes. It has to be the window's, because
+`on_draw()` clears the screen framebuffer.
+
+Per frame, the time to issue the draw calls and the time until the GPU
+finished them are reported per biome, along with the GPU work per frame and
+draw stage from `gpustats`. `--dump` writes frames as PNGs for visual
+regression checks, `--memory-report` the memory report of `memreport` for
+the whole sweep.
+
+    python -m hbtl.bench --headless --frames 300 --dump frames/
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+
+try:
+    from .constants import MAPS_PER_BIOME, MAP_WIDTH, TILE_SCALING, TILE_SIZE
+except ImportError:
+    # Nuitka does not allow invoking via -m
+    from constants import MAPS_PER_BIOME, MAP_WIDTH, TILE_SCALING, TILE_SIZE
+
+DELTA_TIME = 1 / 60
+MAP_PX = MAP_WIDTH * TILE_SIZE * TILE_SCALING
+# Camera paths as (name, first x, last x), same borders as the triggers
+BIOMES = (
+    ("grass", 0, (MAPS_PER_BIOME + 1) * MAP_PX),
+    ("ice", (MAPS_PER_BIOME + 1) * MAP_PX, (2 * MAPS_PER_BIOME + 1) * MAP_PX),
+    (
+        "obsidian",
+        (2 * MAPS_PER_BIOME + 1) * MAP_PX,
+        (3 * MAPS_PER_BIOME + 1) * MAP_PX,
+    ),
+)
+
+
+def _load_game() -> Any:
+    # Late, arcade reads ARCADE_HEADLESS when it is imported
+    from . import __main__ as game
+    return game
+
+
+def _ground_y(walls: Any, x: float, half_width: float) -> float:
+    """Median height of the walls around `x`, to keep the camera on them."""
+    start, stop = np.searchsorted(walls.x, (x - half_width, x + half_width))
+    if start == stop:
+        return 0.0
+    return float(np.median(walls.y[start:stop]))
+
+
+def _stats(times: list[float]) -> dict[str, float]:
+    values = np.array(times) * 1000
+    return {
+        "mean": round(float(values.mean()), 3),
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+def run(
+    frames: int,
+    width: int,
+    height: int,
+    seed: int,
+    dump: Optional[Path] = None,
+    dump_every: int = 30,
+    quality: str = "high",
+) -> dict[str, dict[str, Any]]:
+    """
+    Render `frames` frames per biome at the `quality` tier. Returns the stats
+    per biome.
+    """
+    game = _load_game()
+    import arcade
+
+    # Fixed, frame times of a benchmark say nothing about the quality needed
+    game.quality.governor = game.quality.QualityGovernor(fixed=quality)
+
+    window = game.Window(width, height, visible=False)
+    view = game.GameView()
+    view.setup(seed=seed)
+    window.show_view(view)
+    # Biome changes switch the music, keep it quiet
+    view.active_player.volume = 0
+    view.started = True  # No title screen
+    view.update_fade(1000)
+    stats = game.gpustats.stats
+    stats.install()
+    if dump is not None:
+        dump.mkdir(parents=True, exist_ok=True)
+
+    results = {}
+    for biome, first_x, last_x in BIOMES:
+        issue_times = []
+        gpu_times = []
+        stats.reset()
+        for frame, x in enumerate(np.linspace(first_x, last_x, frames)):
+            y = _ground_y(view.walls, x, width / 2) + height / 8
+            view.player.center = (x, y)
+            view.spectre.center = (x - 400, y)
+            view.spectre_light.position = view.spectre.center
+            view.camera.position = (x, y + height / 8)
+            view.player_triggers.advance(x)
+            view.timeline.update(DELTA_TIME)
+            view.scene.update_animation(DELTA_TIME)
+            view.update_walls()
+
+            start = time.perf_counter()
+            view.on_draw()
+            issued = time.perf_counter()
+            window.ctx.finish()
+            done = time.perf_counter()
+            issue_times.append(issued - start)
+            gpu_times.append(done - start)
+
+            if dump is not None and frame % dump_every == 0:
+                image = arcade.get_image(0, 0, width, height)
+                image.save(dump / f"{biome}_{frame:05}.png")
+        results[biome] = {
+            "frames": frames,
+            "issue_ms": _stats(issue_times),
+            "total_ms": _stats(gpu_times),
+            "gpu_work": stats.per_frame(),
+        }
+    stats.uninstall()
+    window.close()
+    return results
+
+
+def summary(gpu_work: dict[str, Any]) -> str:
+    game = _load_game()
+    return game.gpustats.stats.summary(gpu_work)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m hbtl.bench",
+        description="Measure the draw cost of the biomes offscreen.",
+    )
+    parser.add_argument(
+        "--headless", action="store_true",
+        help="Render through EGL instead of a hidden window",
+    )
+    parser.add_argument(
+        "--frames", type=int, default=300, help="Frames per biome"
+    )
+    parser.add_argument("--size", type=int, nargs=2, default=(1280, 800))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--dump", type=Path, help="Directory to write frames to"
+    )
+    parser.add_argument(
+        "--dump-every", type=int, default=30,
+        help="Write every n-th frame",
+    )
+    parser.add_argument(
+        "--quality", choices=("low", "medium", "high"), default="high",
+        help="Quality tier to render at",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print the results as JSON"
+    )
+    parser.add_argument(
+        "--memory-report", type=Path, metavar="PATH",
+        help="Trace memory at setup and biome changes, write a JSON report",
+    )
+    parser.add_argument(
+        "--memory-budget", type=str, action="append", default=[],
+        metavar="CATEGORY=MB",
+        help="Fail the memory report if a category uses more",
+    )
+    args = parser.parse_args(argv)
+    if args.headless:
+        os.environ["ARCADE_HEADLESS"] = "1"
+    if args.memory_report:
+        memreport = _load_game().memreport
+        memory = memreport.start(dict(
+            memreport.parse_budget(budget) for budget in args.memory_budget
+        ))
+
+    results = run(
+        args.frames, *args.size, args.seed, args.dump, args.dump_every,
+        args.quality,
+    )
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        print_results(results)
+    if args.memory_report:
+        memory.save(args.memory_report)
+        if not args.json:
+            print()
+            print(memory.summary())
+        if memory.violations:
+            sys.exit(
+                "\n".join(["Over the memory budget:"] + memory.violations)
+            )
+
+
+def print_results(results: dict[str, dict[str, Any]]) -> None:
+    print(f"{'biome':<10} {'':>6} {'mean':>8} {'p50':>8} {'p95':>8} "
+          f"{'max':>8}   (ms per frame)")
+    for biome, result in results.items():
+        for kind in ("issue", "total"):
+            stats = result[f"{kind}_ms"]
+            print(
+                f"{biome:<10} {kind:>6} {stats['mean']:>8.2f} "
+                f"{stats['p50']:>8.2f} {stats['p95']:>8.2f} "
+                f"{stats['max']:>8.2f}"
+            )
+    for biome, result in results.items():
+        print()
+        print(f"GPU work in {biome}:")
+        print(summary(result["gpu_work"]))
+
+
+if __name__ == "__main__":
+    main()
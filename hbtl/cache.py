@@ -0,0 +1,76 @@
+"""
+Files derived from the assets, kept between runs.
+
+Everything in here can be deleted at any time, it is rebuilt when missing or
+when the files it was derived from changed.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Optional
+
+try:
+    from . import assetpack
+except ImportError:
+    # Nuitka does not allow invoking via -m
+    import assetpack
+
+
+def cache_dir(*parts: str) -> Path:
+    """
+    The cache directory (or a subdirectory of it), created if missing. Can
+    be moved with the `HBTL_CACHE_DIR` environment variable.
+    """
+    if env_dir := os.environ.get("HBTL_CACHE_DIR"):
+        base = Path(env_dir)
+    elif sys.platform == "win32":
+        base = Path(
+            os.environ.get("LOCALAPPDATA", Path.home() / "AppData" / "Local")
+        ) / "hbtl" / "cache"
+    elif sys.platform == "darwin":
+        base = Path.home() / "Library" / "Caches" / "hbtl"
+    else:
+        base = Path(
+            os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")
+        ) / "hbtl"
+    path = base.joinpath(*parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def digest(*paths: Path, extra: Any = None) -> str:
+    """Hash of the contents of files, plus anything else that's JSON."""
+    sha = hashlib.sha1()
+    for path in paths:
+        sha.update(assetpack.read_asset(path))
+    sha.update(json.dumps(extra, sort_keys=True).encode())
+    return sha.hexdigest()
+
+
+def load_json(path: Path, key: str) -> Optional[Any]:
+    """The data stored with `save_json()`, if it was stored with `key`."""
+    try:
+        stored = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(stored, dict) or stored.get("key") != key:
+        return None
+    return stored.get("data")
+
+
+def save_json(path: Path, key: str, data: Any) -> None:
+    # Write next to it first, so a crash never leaves half a file behind.
+    # A file of its own, processes saving the same path don't collide.
+    with tempfile.NamedTemporaryFile(
+        "w", dir=path.parent, prefix=path.name, suffix=".tmp", delete=False
+    ) as temp:
+        temp.write(json.dumps({"key": key, "data": data}))
+    try:
+        os.replace(temp.name, path)
+    except OSError:
+        os.unlink(temp.name)
+        raise
@@ -0,0 +1,232 @@
+"""
+Broadphase for the obstacles the player can run into.
+
+A sprite list with a spatial hash rehashes a sprite every time it moves,
+and checking the player against two of them queries both hashes every step.
+Most obstacles never move though. `CollisionWorld` puts the obstacles of a
+run into a grid once, when the maps are laid out, and never changes it.
+Obstacles that start moving, like falling dripstones, are released from the
+grid into a short list of moving obstacles, of which only the ones whose
+bounding box overlaps the tested sprite are checked further. Candidates from
+both are then checked against their hit boxes.
+
+Everything moves in discrete steps, so a step long enough (a slow frame, a
+low tick rate or a fast falling dripstone) could carry a sprite through an
+obstacle or wall without ever overlapping it. `sweep()` finds when two
+bounding boxes overlap during a step. `CollisionWorld.collisions()` uses it
+to also catch obstacles passed through, `limit_motion()` to stop a move
+inside the first box it would pass through.
+"""
+
+import math
+from typing import Iterable, Iterator, Optional
+
+import arcade
+
+try:
+    from .mapdata import TILE_PX
+except ImportError:
+    # Nuitka does not allow invoking via -m
+    from mapdata import TILE_PX
+
+CELL_SIZE = 4 * TILE_PX
+
+# (left, bottom, right, top)
+Box = tuple[float, float, float, float]
+
+
+def box(sprite: arcade.Sprite) -> Box:
+    """Bounding box of the hit box of `sprite`."""
+    return sprite.left, sprite.bottom, sprite.right, sprite.top
+
+
+def sweep(
+    moving: Box, dx: float, dy: float, other: Box
+) -> Optional[tuple[float, float]]:
+    """
+    When `moving`, moved by `dx`, `dy`, starts and stops overlapping `other`,
+    as fractions of the move. None if it doesn't within the move.
+    """
+    enter, leave = 0.0, 1.0
+    for low, high, other_low, other_high, distance in (
+        (moving[0], moving[2], other[0], other[2], dx),
+        (moving[1], moving[3], other[1], other[3], dy),
+    ):
+        if not distance:
+            if high < other_low or low > other_high:
+                return None
+            continue
+        first = (other_low - high) / distance
+        last = (other_high - low) / distance
+        if first > last:
+            first, last = last, first
+        enter, leave = max(enter, first), min(leave, last)
+        if enter > leave:
+            return None
+    return enter, leave
+
+
+def limit_motion(
+    moving: Box, dx: float, dy: float, boxes: Iterable[Box]
+) -> float:
+    """
+    Share of the move by `dx`, `dy` that `moving` can make without passing
+    through any of `boxes`. A move passing through a box ends a pixel
+    inside of it instead, so the usual collision handling resolves it. Moves
+    that end overlapping a box or start in one are left to that as well.
+    """
+    limit = 1.0
+    # A pixel into the box
+    inside = 1 / math.hypot(dx, dy) if dx or dy else 0.0
+    for other in boxes:
+        times = sweep(moving, dx, dy, other)
+        if times is not None and 0 < times[0] and times[1] < 1:
+            limit = min(limit, times[0] + inside)
+    return limit
+
+
+def _cells(
+    left: float, bottom: float, right: float, top: float
+) -> Iterator[tuple[int, int]]:
+    for column in range(int(left // CELL_SIZE), int(right // CELL_SIZE) + 1):
+        for row in range(int(bottom // CELL_SIZE), int(top // CELL_SIZE) + 1):
+            yield column, row
+
+
+class CollisionWorld:
+    def __init__(self) -> None:
+        self._grid: dict[tuple[int, int], tuple[arcade.Sprite, ...]] = {}
+        # All obstacles in the grid, and the ones of them that moved or were
+        # removed
+        self._in_grid: set[arcade.Sprite] = set()
+        self._released: set[arcade.Sprite] = set()
+        self.moving: list[arcade.Sprite] = []
+
+    def layout(
+        self,
+        obstacles: Iterable[arcade.Sprite],
+        moving: Iterable[arcade.Sprite] = (),
+    ) -> None:
+        """
+        Replace all obstacles by `obstacles`. Those also in `moving` are
+        moving already, the others are at rest.
+        """
+        moving = list(moving)
+        skip = set(moving)
+        grid: dict[tuple[int, int], list[arcade.Sprite]] = {}
+        self._in_grid = set()
+        for sprite in obstacles:
+            if sprite in skip:
+                continue
+            self._in_grid.add(sprite)
+            for cell in _cells(
+                sprite.left, sprite.bottom, sprite.right, sprite.top
+            ):
+                grid.setdefault(cell, []).append(sprite)
+        self._grid = {cell: tuple(sprites) for cell, sprites in grid.items()}
+        self._released = skip
+        self.moving[:] = moving
+
+    def release(self, sprite: arcade.Sprite) -> None:
+        """Move `sprite` to the moving obstacles, before it moves."""
+        if sprite not in self._released:
+            self._released.add(sprite)
+            self.moving.append(sprite)
+
+    def settle(self, sprite: arcade.Sprite) -> None:
+        """
+        Make `sprite` an obstacle at rest again, like after restoring a
+        snapshot. Obstacles that weren't in the grid at the last `layout()`
+        are kept with the moving ones instead, the grid never changes.
+        """
+        if sprite in self._in_grid:
+            self._released.discard(sprite)
+            if sprite in self.moving:
+                self.moving.remove(sprite)
+        else:
+            self.release(sprite)
+
+    def remove(self, sprite: arcade.Sprite) -> None:
+        """Remove `sprite` until the next `layout()`."""
+        self._released.add(sprite)
+        if sprite in self.moving:
+            self.moving.remove(sprite)
+
+    def collisions(
+        self,
+        sprite: arcade.Sprite,
+        dx: float = 0.0,
+        dy: float = 0.0,
+        delta_time: float = 0.0,
+    ) -> list[arcade.Sprite]:
+        """
+        Obstacles whose hit boxes overlap the one of `sprite`. If `sprite`
+        just moved by `dx`, `dy` in a step of `delta_time` seconds, also the
+        ones it passed through on the way, taking into account that moving
+        obstacles moved by their `change_x`, `change_y` (per second) as well.
+        """
+        left, bottom, right, top = box(sprite)
+        # Everything the sprite covered during the step
+        reach = (
+            left - max(dx, 0), bottom - max(dy, 0),
+            right - min(dx, 0), top - min(dy, 0),
+        )
+        # Dict as an ordered set, obstacles can be in several cells
+        candidates: dict[arcade.Sprite, None] = {}
+        for cell in _cells(*reach):
+            for obstacle in self._grid.get(cell, ()):
+                if obstacle not in self._released:
+                    candidates[obstacle] = None
+        for obstacle in self.moving:
+            # The obstacle's move, extending the reach the other way
+            odx = obstacle.change_x * delta_time
+            ody = obstacle.change_y * delta_time
+            if (
+                obstacle.left - max(odx, 0) <= reach[2]
+                and obstacle.right - min(odx, 0) >= reach[0]
+                and obstacle.bottom - max(ody, 0) <= reach[3]
+                and obstacle.top - min(ody, 0) >= reach[1]
+            ):
+                candidates[obstacle] = None
+        return [
+            obstacle for obstacle in candidates
+            if arcade.check_for_collision(sprite, obstacle)
+            or self._passed(sprite, dx, dy, delta_time, obstacle)
+        ]
+
+    def _passed(
+        self,
+        sprite: arcade.Sprite,
+        dx: float,
+        dy: float,
+        delta_time: float,
+        obstacle: arcade.Sprite,
+    ) -> bool:
+        """Whether `sprite` passed through `obstacle` during the step."""
+        odx = obstacle.change_x * delta_time
+        ody = obstacle.change_y * delta_time
+        if not (dx - odx or dy - ody):
+            return False
+        # Relative to the obstacle, as if only the sprite moved
+        start = box(sprite)
+        start = (
+            start[0] - dx, start[1] - dy, start[2] - dx, start[3] - dy
+        )
+        other = box(obstacle)
+        other = (
+            other[0] - odx, other[1] - ody, other[2] - odx, other[3] - ody
+        )
+        times = sweep(start, dx - odx, dy - ody, other)
+        if times is None:
+            return False
+        # Check the hit boxes where the bounding boxes overlap the most
+        t = sum(times) / 2
+        position = sprite.position
+        sprite.position = (
+            position[0] - dx + (dx - odx) * t + odx,
+            position[1] - dy + (dy - ody) * t + ody,
+        )
+        try:
+            return arcade.check_for_collision(sprite, obstacle)
+        finally:
+            sprite.position = position
@@ -0,0 +1,24 @@
+"""Game rules shared by the game and the headless tools."""
+
+TILE_SIZE = 16
+MAP_WIDTH = 30
+
+TILE_SCALING = 4
+PLAYER_SCALING = 3
+
+INITIAL_SPEED = 300
+INITIAL_SPEED_SPECTRE = 310
+SPEED_GAIN_PER_SECOND = 3.5
+SPEED_GAIN_PER_SECOND_SPECTRE = 1.7
+SPEED_PENALTY_VERTICAL_PLUS = -0.04
+SPECTRE_SPEED_CAP = 5
+GRAVITY = 1
+JUMP_VELOCITY = 23
+CAMERA_SPEED = 0.3
+JUMP_PENDING_TIMEOUT = 0.1
+
+MAPS_PER_BIOME = 10
+BACKGROUND_GRADIENT_DURATION = 1.0
+
+# Dripstones above this height will fall down eventually
+ICE_DRIPSTONE_FALL_HEIGHT = 1050
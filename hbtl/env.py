@@ -0,0 +1,753 @@
+"""
+Batched headless environment for bots.
+
+Steps many independent runs ("worlds") at once with NumPy, using the map data
+and the rules of `GameView.on_update` at a fixed 60 updates per second (the
+vertical physics of the game work per update, not per second). Meant for
+balancing: tuning speeds and jump velocity without a window.
+
+Walls collide like in the game: with the polygons of arcade's simple hit box
+algorithm, so the player slides up ramps and sits on slopes the same way.
+Differences to the game: the player's hit box is the hull of the ones of its
+moving animation instead of the current frame's, obstacles, the spectre and
+checkpoints are boxes, moves aren't limited to not pass through walls at
+high speeds and respawning skips the fade sequence. `python -m hbtl.envcheck`
+compares the env to the game.
+
+    env = BatchedEnv(256)
+    obs = env.reset(range(256))
+    while not env.done.all():
+        obs, reward, done, info = env.step(actions)
+"""
+
+import random
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+try:
+    from . import mapdata
+    from .constants import (
+        GRAVITY, ICE_DRIPSTONE_FALL_HEIGHT, INITIAL_SPEED,
+        INITIAL_SPEED_SPECTRE, JUMP_PENDING_TIMEOUT, JUMP_VELOCITY,
+        MAP_WIDTH, MAPS_PER_BIOME, PLAYER_SCALING, SPECTRE_SPEED_CAP,
+        SPEED_GAIN_PER_SECOND, SPEED_GAIN_PER_SECOND_SPECTRE,
+        SPEED_PENALTY_VERTICAL_PLUS, TILE_SCALING,
+    )
+except ImportError:
+    # Nuitka does not allow invoking via -m
+    import mapdata
+    from constants import (
+        GRAVITY, ICE_DRIPSTONE_FALL_HEIGHT, INITIAL_SPEED,
+        INITIAL_SPEED_SPECTRE, JUMP_PENDING_TIMEOUT, JUMP_VELOCITY,
+        MAP_WIDTH, MAPS_PER_BIOME, PLAYER_SCALING, SPECTRE_SPEED_CAP,
+        SPEED_GAIN_PER_SECOND, SPEED_GAIN_PER_SECOND_SPECTRE,
+        SPEED_PENALTY_VERTICAL_PLUS, TILE_SCALING,
+    )
+
+TILE_PX = mapdata.TILE_PX
+MAP_PX = MAP_WIDTH * TILE_PX
+DARK_X = (3 * MAPS_PER_BIOME + 1) * MAP_PX
+DELTA_TIME = 1 / 60
+FALL_SPEED = -1000
+# Where arcade tries to move a player out of a wall it starts a move in, in
+# order, at 1, 2, 4... px
+WIGGLES = (
+    (0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (1, -1), (-1, 1), (-1, -1),
+)
+# Farthest it's tried, arcade tries on forever
+MAX_WIGGLE = 4096
+# Textures of the animation the player runs with
+PLAYER_TEXTURES = tuple(f"slime/slime_moving_{i}.png" for i in range(1, 5))
+
+# Causes of death, as reported in `info["cause"]`
+ALIVE = 0
+FELL = 1
+CAUGHT = 2
+OBSTACLE = 3
+
+
+def hull(
+    points: Iterable[tuple[float, float]]
+) -> tuple[list[tuple[float, float]], list[tuple[float, float]]]:
+    """Lower and upper edge of the convex hull of `points`, left to right."""
+    points = sorted(set(points))
+
+    def edge(points: list[tuple[float, float]]) -> list[tuple[float, float]]:
+        chain: list[tuple[float, float]] = []
+        for x, y in points:
+            while len(chain) >= 2:
+                (x1, y1), (x2, y2) = chain[-2], chain[-1]
+                if (x2 - x1) * (y - y1) - (y2 - y1) * (x - x1) > 0:
+                    break
+                chain.pop()
+            chain.append((x, y))
+        return chain
+
+    lower = edge(points)
+    upper = edge(points[::-1])[::-1]
+    return lower, upper
+
+
+class WallShapes:
+    """
+    Where the player's center collides with each kind of wall tile, as the
+    lower and upper edge of the area relative to the tile's bottom left
+    corner, per pixel along x. For convex hit boxes that area is the tile's
+    hit box grown by the player's (their Minkowski difference). Kind 0 is
+    air.
+    """
+    def __init__(self, player: Sequence[tuple[float, float]]) -> None:
+        self.player = tuple(player)
+        xs = [x for x, _ in self.player]
+        ys = [y for _, y in self.player]
+        # (left, bottom, right, top) of the player relative to its center
+        self.player_box = (min(xs), min(ys), max(xs), max(ys))
+        # x of all places relative to a tile where the player can touch it
+        self.x = np.arange(
+            np.floor(-max(xs)), np.ceil(TILE_PX - min(xs)) + 1
+        )
+        self.kinds: dict[tuple[tuple[float, float], ...], int] = {(): 0}
+        # Per kind, the x range and the edges at `x`
+        self.left = np.array([np.inf])
+        self.right = np.array([-np.inf])
+        self.bottom = np.zeros((1, len(self.x)))
+        self.top = np.zeros((1, len(self.x)))
+
+    def kind(self, points: tuple[tuple[float, float], ...]) -> int:
+        """The kind of a tile with the hit box `points`, added if new."""
+        if points in self.kinds:
+            return self.kinds[points]
+        lower, upper = hull(
+            (x - player_x, y - player_y)
+            for x, y in points for player_x, player_y in self.player
+        )
+        self.left = np.append(self.left, lower[0][0])
+        self.right = np.append(self.right, lower[-1][0])
+        self.bottom = np.vstack((self.bottom, np.interp(self.x, *zip(*lower))))
+        self.top = np.vstack((self.top, np.interp(self.x, *zip(*upper))))
+        self.kinds[points] = len(self.kinds)
+        return self.kinds[points]
+
+    def edges(
+        self, kinds: np.ndarray, x: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Whether `x` (relative to the tiles) is within tiles of `kinds`, and
+        the lower and upper edge of where the player collides with them.
+        """
+        position = np.clip(x - self.x[0], 0, len(self.x) - 1)
+        index = np.minimum(position.astype(np.int64), len(self.x) - 2)
+        share = position - index
+        bottom = self.bottom[kinds, index] * (1 - share)
+        bottom += self.bottom[kinds, index + 1] * share
+        top = self.top[kinds, index] * (1 - share)
+        top += self.top[kinds, index + 1] * share
+        within = (self.left[kinds] < x) & (x < self.right[kinds])
+        return within, bottom, top
+
+
+def player_shapes(textures: Sequence[str] = PLAYER_TEXTURES) -> WallShapes:
+    """Shapes for a player with the hull of the hit boxes of `textures`."""
+    lower, upper = hull(
+        point
+        for texture in textures
+        for point in mapdata.center_hit_box(texture, PLAYER_SCALING)
+    )
+    return WallShapes(lower + upper)
+
+
+class Walls:
+    """
+    The walls of many worlds, as grids (world, row, column) of the kinds of
+    `shapes`, and players moving through them. Each player is passed with
+    the index of its world.
+    """
+    def __init__(self, grid: np.ndarray, shapes: WallShapes) -> None:
+        self.grid = grid
+        self.shapes = shapes
+        left, bottom, right, top = shapes.player_box
+        # Most tiles a hit box can touch per axis
+        self._span_x = np.arange(int(np.ceil((right - left) / TILE_PX)) + 1)
+        self._span_y = np.arange(int(np.ceil((top - bottom) / TILE_PX)) + 1)
+
+    def collides(
+        self, worlds: np.ndarray, x: np.ndarray, y: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Test players at `x`, `y` in `worlds` against the walls.
+
+        :return: Hit mask per player, and per player and cell around the
+        player whether it's hit and the lower and upper edge of where the
+        player collides with it
+        :rtype: tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+        """
+        _, rows, columns = self.grid.shape
+        left, bottom, right, top = self.shapes.player_box
+        left, bottom, right, top = x + left, y + bottom, x + right, y + top
+        first_column = np.floor(left / TILE_PX).astype(np.int64)
+        last_column = np.floor((right - 1e-6) / TILE_PX).astype(np.int64)
+        first_row = np.floor(bottom / TILE_PX).astype(np.int64)
+        last_row = np.floor((top - 1e-6) / TILE_PX).astype(np.int64)
+        cell_columns = first_column[:, None] + self._span_x  # (n, sx)
+        cell_rows = first_row[:, None] + self._span_y  # (n, sy)
+        valid = (
+            (cell_columns <= last_column[:, None])[:, None, :]
+            & (cell_rows <= last_row[:, None])[:, :, None]
+            & ((cell_columns >= 0) & (cell_columns < columns))[:, None, :]
+            & ((cell_rows >= 0) & (cell_rows < rows))[:, :, None]
+        )
+        kinds = np.where(valid, self.grid[
+            worlds[:, None, None],
+            np.clip(cell_rows, 0, rows - 1)[:, :, None],
+            np.clip(cell_columns, 0, columns - 1)[:, None, :],
+        ], 0)
+        within, lower, upper = self.shapes.edges(
+            kinds, (x[:, None] - cell_columns * TILE_PX)[:, None, :]
+        )
+        cells_y = (cell_rows * TILE_PX)[:, :, None]
+        lower = lower + cells_y
+        upper = upper + cells_y
+        hits = within & (lower < y[:, None, None]) & (y[:, None, None] < upper)
+        return hits.any(axis=(1, 2)), hits, lower, upper
+
+    def can_jump(
+        self, worlds: np.ndarray, x: np.ndarray, y: np.ndarray
+    ) -> np.ndarray:
+        """Like `PhysicsEnginePlatformer.can_jump()`, ground within 5px."""
+        return self.collides(worlds, x, y - 5)[0]
+
+    def move(
+        self,
+        worlds: np.ndarray,
+        x: np.ndarray,
+        y: np.ndarray,
+        vx: np.ndarray,
+        vy: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        The player part of `CustomPhysicsEnginePlatformer.on_update` for
+        players in `worlds`, moving like arcade's `_move_sprite()` does:
+        out of a wall it starts in, along y, then along x, ramping up where a
+        wall is in the way.
+
+        :return: The new `x`, `y` and `vy`
+        :rtype: tuple[np.ndarray, np.ndarray, np.ndarray]
+        """
+        stuck = self.collides(worlds, x, y)[0]
+        if stuck.any():
+            x, y = self.wiggle(worlds, x, y, stuck)
+        start_y = y
+        vy = vy - GRAVITY
+        new_y = y + vy
+        hit, hits, lower, upper = self.collides(worlds, x, new_y)
+        # Moving down: up in steps of 0.25px until on top of the walls hit
+        floor = np.where(hits, upper, -np.inf).max(axis=(1, 2))
+        landed = new_y + np.ceil((floor - new_y) / 0.25) * 0.25
+        # Moving up: down in steps of 1px until below them
+        ceiling = np.where(hits, lower, np.inf).min(axis=(1, 2))
+        bumped = new_y - np.ceil(new_y - ceiling)
+        new_y = np.where(hit & (vy < 0), landed, new_y)
+        new_y = np.where(hit & (vy > 0), bumped, new_y)
+        vy = np.where(hit, 0.0, vy)
+        y = np.round(new_y, 2)
+
+        # Moving along x: the whole way, or as far as it's free in whole
+        # pixels by bisection. Where a wall is in the way, but the player
+        # fits that far higher (than before moving along y), it's lifted
+        # by the least of that distance less whole pixels that is free.
+        dx = vx * DELTA_TIME
+        direction = np.sign(dx)
+        distance = np.abs(dx)
+        upper_bound = distance.copy()
+        lower_bound = np.zeros(len(x))
+        lift = np.zeros(len(x))
+        # arcade checks at the height of the last try to ramp up
+        check_y = y.copy()
+        # Only the players still moving, fewer every try
+        pending = np.flatnonzero(distance > 0)
+        while len(pending):
+            tried = distance[pending]
+            pending_worlds = worlds[pending]
+            to_x = x[pending] + tried * direction[pending]
+            hit = self.collides(pending_worlds, to_x, check_y[pending])[0]
+            check_y[pending] = np.where(
+                hit, start_y[pending] + tried, check_y[pending]
+            )
+            ramp = hit
+            if hit.any():
+                ramp = hit & ~self.collides(
+                    pending_worlds, to_x, check_y[pending]
+                )[0]
+            if ramp.any():
+                pending_y = y[pending]
+                _, hits, _, upper = self.collides(
+                    pending_worlds, to_x, pending_y
+                )
+                need = np.where(hits, upper, -np.inf).max(axis=(1, 2))
+                # At least one, arcade doesn't check the height it ends at
+                steps = np.clip(
+                    np.floor(tried - (need - pending_y)) + 1,
+                    1, np.ceil(tried),
+                )
+                lift[pending] = np.where(
+                    ramp, tried - steps + 1, lift[pending]
+                )
+            blocked = hit & ~ramp
+            free = ~hit
+            upper_bound[pending] = np.where(
+                blocked, tried - 1, upper_bound[pending]
+            )
+            lower_bound[pending] = np.where(
+                free, tried, lower_bound[pending]
+            )
+            settled = upper_bound[pending] - lower_bound[pending] <= 0
+            middle = upper_bound[pending] + lower_bound[pending]
+            distance[pending] = np.where(
+                blocked,
+                np.where(settled, lower_bound[pending], middle // 2),
+                np.where(free & ~settled, middle // 2 + middle % 2, tried),
+            )
+            pending = pending[~(ramp | ((blocked | free) & settled))]
+        return x + distance * direction, y + lift, vy
+
+    def wiggle(
+        self,
+        worlds: np.ndarray,
+        x: np.ndarray,
+        y: np.ndarray,
+        stuck: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Move the `stuck` players out of the walls like arcade's
+        `_wiggle_until_free()`: to the first free place of `WIGGLES`.
+
+        :return: The new `x` and `y`
+        :rtype: tuple[np.ndarray, np.ndarray]
+        """
+        x, y, stuck = x.copy(), y.copy(), stuck.copy()
+        distance = 1
+        while stuck.any() and distance <= MAX_WIGGLE:
+            for offset_x, offset_y in WIGGLES:
+                index = np.flatnonzero(stuck)
+                to_x = x[index] + offset_x * distance
+                to_y = y[index] + offset_y * distance
+                free = ~self.collides(worlds[index], to_x, to_y)[0]
+                x[index[free]] = to_x[free]
+                y[index[free]] = to_y[free]
+                stuck[index[free]] = False
+            distance *= 2
+        return x, y
+
+
+def wall_kinds(data: mapdata.MapData, shapes: WallShapes) -> np.ndarray:
+    """Kinds of a map's wall tiles, see `WallShapes`, rows from the bottom."""
+    kinds = np.zeros((data.height, data.width), dtype=np.int16)
+    for column, row, gid in data.tiles("walls"):
+        tileset, tile_id = data.tile(gid)
+        kinds[row, column] = shapes.kind(tileset.tile_hit_box(tile_id))
+    return kinds
+
+
+class WorldTemplate:
+    """The per map data a world is assembled from, in map coordinates."""
+    def __init__(self, name: str, shapes: WallShapes) -> None:
+        data = mapdata.load_map(name)
+        self.name = name
+        self.width = data.width
+        self.walls = wall_kinds(data, shapes)
+
+        # (left, bottom, right, top, can fall) of all obstacles
+        obstacles = []
+        for layer in ("obstacles", "obsidian_obstacles"):
+            for column, row, gid in data.tiles(layer):
+                tileset, tile_id = data.tile(gid)
+                left, bottom, right, top = tileset.tile_bounds(tile_id)
+                x = column * TILE_PX
+                y = row * TILE_PX
+                _, center_y = data.sprite_position(column, row, gid)
+                obstacles.append((
+                    x + left, y + bottom, x + right, y + top,
+                    layer == "obstacles"
+                    and center_y > ICE_DRIPSTONE_FALL_HEIGHT,
+                ))
+        self.obstacles = np.array(obstacles, dtype=np.float64).reshape(-1, 5)
+        self.obstacle_cells = {
+            (int(box[0] // TILE_PX), int(box[1] // TILE_PX))
+            for box in self.obstacles
+        }
+
+        # Sprite centers of checkable walls, in arcade's sprite order
+        self.checkable = [
+            data.sprite_position(column, row, gid)
+            for column, row, gid in data.tiles("walls")
+            if data.tile_properties(gid).get("checkable")
+        ]
+
+        self.spawns = {
+            layer: data.sprite_position(*data.tiles(layer)[0])
+            for layer in ("spawn", "spectre_spawn")
+            if data.tiles(layer)
+        }
+
+
+class BatchedEnv:
+    """
+    `num_worlds` independent runs stepped together. Actions are whether the
+    jump button is held; pressing and releasing work like in the game
+    (buffered jumps, releasing early cuts the jump short).
+
+    Observations are a dict with `tiles`, the tile grid around each player
+    (0 = air, 1 = wall, 2 = obstacle), and `state`, the player's speeds, the
+    distance of the spectre in tiles and how far the player is into its
+    tile column. The player's hit box is the hull of the ones of
+    `player_textures`.
+    """
+    def __init__(
+        self,
+        num_worlds: int,
+        view_columns: tuple[int, int] = (-4, 12),
+        view_rows: tuple[int, int] = (-6, 7),
+        player_textures: Sequence[str] = PLAYER_TEXTURES,
+    ) -> None:
+        self.num_worlds = num_worlds
+        self.view_columns = np.arange(*view_columns)
+        self.view_rows = np.arange(*view_rows)
+        self._templates: dict[str, WorldTemplate] = {}
+
+        self.shapes = player_shapes(player_textures)
+        self.player_box = self.shapes.player_box
+        self.spectre_box = mapdata.center_bounds(
+            "spectre/spectre_moving_1.png", 4
+        )
+        self.checkpoint_box = mapdata.center_bounds(
+            "misc/checkpoint.png", TILE_SCALING
+        )
+
+        self.seeds = np.zeros(num_worlds, dtype=np.int64)
+        self.map_orders: list[list[str]] = [[] for _ in range(num_worlds)]
+        self.grid = np.zeros((num_worlds, 1, 1), dtype=np.int16)
+        self.walls = Walls(self.grid, self.shapes)
+        self.done = np.ones(num_worlds, dtype=bool)
+
+    def template(self, name: str) -> WorldTemplate:
+        if name not in self._templates:
+            self._templates[name] = WorldTemplate(name, self.shapes)
+        return self._templates[name]
+
+    # --- Setup ---
+
+    def reset(self, seeds: Iterable[int]) -> dict[str, np.ndarray]:
+        """Start a new run in every world, one seed per world."""
+        seeds = list(seeds)
+        if len(seeds) != self.num_worlds:
+            raise ValueError(
+                f"Expected {self.num_worlds} seeds, got {len(seeds)}"
+            )
+        n = self.num_worlds
+        self.seeds = np.array(seeds, dtype=np.int64)
+        worlds = [self._build_world(seed) for seed in seeds]
+        self.map_orders = [world[0] for world in worlds]
+
+        rows = max(world[1].shape[0] for world in worlds)
+        columns = max(world[1].shape[1] for world in worlds)
+        self.grid = np.zeros((n, rows, columns), dtype=np.int16)
+        for i, (_, walls, *_) in enumerate(worlds):
+            self.grid[i, :walls.shape[0], :walls.shape[1]] = walls
+        self.walls = Walls(self.grid, self.shapes)
+
+        num_obstacles = max(1, max(len(world[2]) for world in worlds))
+        self.obstacles = np.zeros((n, num_obstacles, 4))
+        self.obstacle_falls = np.zeros((n, num_obstacles), dtype=bool)
+        self.obstacle_alive = np.zeros((n, num_obstacles), dtype=bool)
+        self.obstacle_vy = np.zeros((n, num_obstacles))
+        num_checkpoints = max(1, max(len(world[3]) for world in worlds))
+        self.checkpoints = np.zeros((n, num_checkpoints, 2))
+        self.checkpoint_valid = np.zeros((n, num_checkpoints), dtype=bool)
+        self.checkpoint_active = np.zeros((n, num_checkpoints), dtype=bool)
+        for i, (_, _, obstacles, checkpoints) in enumerate(worlds):
+            if len(obstacles):
+                self.obstacles[i, :len(obstacles)] = obstacles[:, :4]
+                self.obstacle_falls[i, :len(obstacles)] = obstacles[:, 4] > 0
+                self.obstacle_alive[i, :len(obstacles)] = True
+            if checkpoints:
+                self.checkpoints[i, :len(checkpoints)] = checkpoints
+                self.checkpoint_valid[i, :len(checkpoints)] = True
+
+        init = self.template("init_map")
+        spawn_x, spawn_y = init.spawns["spawn"]
+        spectre_x, spectre_y = init.spawns["spectre_spawn"]
+        self.x = np.full(n, spawn_x)
+        self.y = np.full(n, spawn_y - 16)
+        self.vx = np.zeros(n)
+        self.vy = np.zeros(n)
+        self.spectre_x = np.full(n, spectre_x)
+        self.spectre_y = np.full(n, spectre_y)
+        self.spectre_vx = np.zeros(n)
+        self.moving = np.zeros(n, dtype=bool)
+        self.spectre_moving = np.zeros(n, dtype=bool)
+        self.hearts = np.full(n, 3)
+        self.jump_pending = np.zeros(n)
+        self.held = np.zeros(n, dtype=bool)
+        self.time = np.zeros(n)
+        self.steps = 0
+        self.done = np.zeros(n, dtype=bool)
+        self.won = np.zeros(n, dtype=bool)
+        return self.observe()
+
+    def _build_world(
+        self, seed: int
+    ) -> tuple[list[str], np.ndarray, np.ndarray, list[tuple[float, float]]]:
+        """Assemble the level of `seed` like `GameView.setup_map`."""
+        rng = random.Random(seed)
+        order = mapdata.roll_map_order(rng)
+        templates = [self.template(name) for name in order]
+        rows = max(template.walls.shape[0] for template in templates)
+        columns = (len(order) - 1) * MAP_WIDTH + templates[-1].width
+        walls = np.zeros((rows, columns), dtype=np.int16)
+        obstacles = []
+        for i, template in enumerate(templates):
+            height, width = template.walls.shape
+            walls[:height, i * MAP_WIDTH:i * MAP_WIDTH + width] = (
+                template.walls
+            )
+            if len(template.obstacles):
+                shifted = template.obstacles.copy()
+                shifted[:, [0, 2]] += i * MAP_PX
+                obstacles.append(shifted)
+
+        checkpoints = []
+        for i, template in enumerate(templates[1:], start=1):  # Not on init
+            for x, y in template.checkable:
+                if rng.random() >= 0.02:
+                    continue
+                cell = (int(x // TILE_PX), int(y // TILE_PX) + 1)
+                if cell in template.obstacle_cells:
+                    continue
+                checkpoints.append((x + i * MAP_PX, y + TILE_PX))
+        # Also the preplaced one on the init map
+        init = mapdata.load_map("init_map")
+        for column, row, gid in init.tiles("checkpoints"):
+            checkpoints.insert(0, init.sprite_position(column, row, gid))
+
+        return (
+            order,
+            walls,
+            np.concatenate(obstacles) if obstacles else np.zeros((0, 5)),
+            checkpoints,
+        )
+
+    # --- Collision helpers ---
+
+    def _player_box(
+        self, x: Optional[np.ndarray] = None, y: Optional[np.ndarray] = None
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        x = self.x if x is None else x
+        y = self.y if y is None else y
+        left, bottom, right, top = self.player_box
+        return x + left, y + bottom, x + right, y + top
+
+    def can_jump(self) -> np.ndarray:
+        """Like `PhysicsEnginePlatformer.can_jump()`, ground within 5px."""
+        return self.walls.can_jump(
+            np.arange(self.num_worlds), self.x, self.y
+        )
+
+    # --- Stepping ---
+
+    def step(
+        self, actions: np.ndarray
+    ) -> tuple[dict[str, np.ndarray], np.ndarray, np.ndarray, dict]:
+        """
+        Advance all worlds that aren't done by one update.
+
+        :param actions: Whether jump is held, per world
+        :type actions: np.ndarray
+        :return: Observations, rewards, done mask and info dict with the
+        `died`, `respawned`, `won` masks and the death `cause`
+        :rtype: tuple
+        """
+        dt = DELTA_TIME
+        active = ~self.done
+        actions = np.asarray(actions, dtype=bool) & active
+        pressed = actions & ~self.held
+        released = ~actions & self.held & active
+        self.held = actions
+        start_x = self.x.copy()
+        t = self.time
+
+        # Start sequence of `GameView.start()`
+        self.vy = np.where(active & (t < 0.8) & (t + dt >= 0.8),
+                           JUMP_VELOCITY, self.vy)
+        starting = active & (t < 1.4) & (t + dt >= 1.4)
+        self.spectre_vx[starting] = INITIAL_SPEED_SPECTRE
+        self.spectre_moving |= starting
+        starting = active & (t < 2.0) & (t + dt >= 2.0)
+        self.vx[starting] = INITIAL_SPEED
+        self.moving |= starting
+
+        # Input, like `on_key_press` / `on_key_release`
+        can_jump = self.can_jump()
+        jump = pressed & can_jump
+        self.jump_pending[pressed & ~can_jump] = JUMP_PENDING_TIMEOUT
+        stop_jump_value = -0.8 * self.vy + JUMP_VELOCITY
+        cut = released & (self.vy > stop_jump_value)
+        self.vy = np.where(cut, stop_jump_value, self.vy)
+        self.vy = np.where(jump, JUMP_VELOCITY, self.vy)
+        # Jump buffering
+        buffered = active & (self.jump_pending > 0) & can_jump & ~jump
+        self.vy = np.where(buffered, JUMP_VELOCITY, self.vy)
+        self.jump_pending = np.maximum(self.jump_pending - dt, 0)
+
+        # Speed
+        gaining = active & ~(self.vy > 0) & self.moving
+        penalized = active & ~gaining & (self.x > MAP_PX)
+        self.vx += np.where(gaining, SPEED_GAIN_PER_SECOND * dt, 0)
+        self.vx += np.where(penalized, SPEED_PENALTY_VERTICAL_PLUS, 0)
+        self.spectre_vx += np.where(
+            active, SPEED_GAIN_PER_SECOND_SPECTRE * dt, 0
+        )
+        self.spectre_vx = np.where(
+            active,
+            np.maximum.reduce([
+                self.spectre_vx, self.vx - 10, self.vx - SPECTRE_SPEED_CAP
+            ]),
+            self.spectre_vx,
+        )
+
+        self._move_player(active)
+
+        # Spectre, obstacles
+        self.spectre_x += np.where(active, self.spectre_vx * dt, 0)
+        self.spectre_y = np.where(
+            active & self.spectre_moving, self.y, self.spectre_y
+        )
+        left, bottom, right, top = self._player_box()
+        falling = self.obstacle_vy < 0
+        self.obstacles[:, :, [1, 3]] += (
+            (self.obstacle_vy * dt)[:, :, None] * active[:, None, None]
+        )
+        start_falling = (
+            active[:, None] & self.obstacle_alive & self.obstacle_falls
+            & ~falling & (right[:, None] + 140 > self.obstacles[:, :, 0])
+        )
+        self.obstacle_vy[start_falling] = FALL_SPEED
+        self.obstacle_alive &= ~(self.obstacles[:, :, 3] < -500)
+
+        # Checkpoints
+        cp_left, cp_bottom, cp_right, _ = self.checkpoint_box
+        cp_x = self.checkpoints[:, :, 0]
+        cp_y = self.checkpoints[:, :, 1]
+        self.checkpoint_active |= (
+            active[:, None] & self.checkpoint_valid
+            & (cp_y + cp_bottom < top[:, None])
+            & (cp_x + cp_left <= self.x[:, None])
+            & (self.x[:, None] <= cp_x + cp_right)
+        )
+
+        # Victory and deaths
+        won = active & (self.x >= DARK_X + 800)
+        self.won |= won
+        cause = np.full(self.num_worlds, ALIVE)
+        spectre_right = self.spectre_x + self.spectre_box[2]
+        hit = (
+            self.obstacle_alive
+            & (self.obstacles[:, :, 0] < right[:, None])
+            & (self.obstacles[:, :, 2] > left[:, None])
+            & (self.obstacles[:, :, 1] < top[:, None])
+            & (self.obstacles[:, :, 3] > bottom[:, None])
+        ).any(axis=1)
+        cause[active & ~won & hit] = OBSTACLE
+        cause[active & ~won & (spectre_right - 30 > left)] = CAUGHT
+        cause[active & ~won & (self.y <= -200)] = FELL
+        died = cause != ALIVE
+        respawned = self._respawn(died)
+
+        self.time += np.where(active, dt, 0)
+        self.steps += 1
+        self.done |= won | (died & ~respawned)
+        reward = (self.x - start_x) / TILE_PX - 10 * died
+        info = {
+            "died": died,
+            "respawned": respawned,
+            "won": won,
+            "cause": cause,
+        }
+        return self.observe(), reward, self.done.copy(), info
+
+    def _move_player(self, active: np.ndarray) -> None:
+        worlds = np.flatnonzero(active)
+        self.x[worlds], self.y[worlds], self.vy[worlds] = self.walls.move(
+            worlds, self.x[worlds], self.y[worlds], self.vx[worlds],
+            self.vy[worlds],
+        )
+
+    def _respawn(self, died: np.ndarray) -> np.ndarray:
+        """Like `GameView.try_res()`, without waiting for the fades."""
+        has_checkpoint = self.checkpoint_active.any(axis=1)
+        respawn = died & has_checkpoint & (self.hearts > 0)
+        if not respawn.any():
+            return respawn
+        self.hearts -= respawn
+        cp_x = np.where(
+            self.checkpoint_active, self.checkpoints[:, :, 0], -np.inf
+        )
+        index = cp_x.argmax(axis=1)
+        worlds = np.arange(self.num_worlds)
+        x = self.checkpoints[worlds, index, 0]
+        bottom = self.checkpoints[worlds, index, 1] + self.checkpoint_box[1]
+        self.x = np.where(respawn, x, self.x)
+        self.y = np.where(respawn, bottom - self.player_box[1], self.y)
+        self.vy = np.where(respawn, 0.0, self.vy)
+        self.spectre_x = np.where(respawn, self.x - 320, self.spectre_x)
+        self.spectre_y = np.where(respawn, self.y, self.spectre_y)
+        self.spectre_vx = np.where(respawn, self.vx + 2, self.spectre_vx)
+        self.obstacle_alive &= ~(respawn[:, None] & (self.obstacle_vy < 0))
+        self.jump_pending[respawn] = 0
+        return respawn
+
+    # --- Observations ---
+
+    def observe(self) -> dict[str, np.ndarray]:
+        n, rows, columns = self.grid.shape
+        column = np.floor(self.x / TILE_PX).astype(np.int64)
+        row = np.floor(self.y / TILE_PX).astype(np.int64)
+        cell_columns = column[:, None] + self.view_columns
+        cell_rows = row[:, None] + self.view_rows
+        inside = (
+            ((cell_rows >= 0) & (cell_rows < rows))[:, :, None]
+            & ((cell_columns >= 0) & (cell_columns < columns))[:, None, :]
+        )
+        tiles = (self.grid[
+            np.arange(n)[:, None, None],
+            np.clip(cell_rows, 0, rows - 1)[:, :, None],
+            np.clip(cell_columns, 0, columns - 1)[:, None, :],
+        ] != 0) & inside
+        tiles = tiles.astype(np.uint8)
+
+        # Obstacles by the cell of their center
+        alive = self.obstacle_alive
+        obstacle_column = np.floor(
+            (self.obstacles[:, :, 0] + self.obstacles[:, :, 2]) / 2 / TILE_PX
+        ).astype(np.int64) - cell_columns[:, :1]
+        obstacle_row = np.floor(
+            (self.obstacles[:, :, 1] + self.obstacles[:, :, 3]) / 2 / TILE_PX
+        ).astype(np.int64) - cell_rows[:, :1]
+        visible = (
+            alive
+            & (obstacle_column >= 0) & (obstacle_column < tiles.shape[2])
+            & (obstacle_row >= 0) & (obstacle_row < tiles.shape[1])
+        )
+        worlds, indices = np.nonzero(visible)
+        tiles[
+            worlds, obstacle_row[worlds, indices],
+            obstacle_column[worlds, indices],
+        ] = 2
+
+        state = np.stack([
+            self.vx / INITIAL_SPEED,
+            self.vy / JUMP_VELOCITY,
+            (self.x - self.spectre_x) / TILE_PX,
+            self.x % TILE_PX / TILE_PX,
+        ], axis=1).astype(np.float32)
+        return {"tiles": tiles, "state": state}
@@ -0,0 +1,289 @@
+"""
+Check the headless environment against the game.
+
+Sets up a run of the game in a hidden window, or headless with `--headless`
+like `bench`, and the same seed in `env.BatchedEnv`. The player is put at the
+same place on a map in both, running at the same speed with the spectre far
+behind, and both are stepped at 60 updates per second with the same jump
+inputs. Reports the positions side by side and fails if they part by more
+than `--tolerance` pixels.
+
+The hit box of the player changes with its animation in the game, the env
+uses the hull of them all. The check holds the game's animation on one
+frame and gives the env that frame's hit box, so the two only differ where
+the env's rules do.
+
+    python -m hbtl.envcheck --headless --seed 0 --map grass_7 --x 905 --y 112
+    python -m hbtl.envcheck --headless --jumps 20:12 70:30
+
+With `--autopilot` the jumps are the ones `analyze.Autopilot` makes in the
+env from the same start, the check also fails if the player dies in either.
+
+    python -m hbtl.envcheck --headless --autopilot --map grass_2 --frames 600
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+try:
+    from . import analyze
+    from . import env as hbtl_env
+    from .constants import INITIAL_SPEED
+except ImportError:
+    # Nuitka does not allow invoking via -m
+    import analyze
+    import env as hbtl_env
+    from constants import INITIAL_SPEED
+
+# How far the spectre starts behind the player
+SPECTRE_DISTANCE = 3000
+
+
+def _load_game() -> Any:
+    # Late, arcade reads ARCADE_HEADLESS when it is imported
+    from . import __main__ as game
+    return game
+
+
+def parse_jumps(jumps: list[str]) -> list[tuple[int, int]]:
+    """`FRAME:LENGTH` pairs, when jump is pressed and for how many frames."""
+    parsed = []
+    for jump in jumps:
+        frame, _, length = jump.partition(":")
+        parsed.append((int(frame), int(length or 1)))
+    return parsed
+
+
+def held(jumps: list[tuple[int, int]], frames: int) -> np.ndarray:
+    """Whether jump is held, per frame."""
+    inputs = np.zeros(frames, dtype=bool)
+    for frame, length in jumps:
+        inputs[frame:frame + length] = True
+    return inputs
+
+
+def jumps_of(inputs: np.ndarray) -> list[tuple[int, int]]:
+    """The `FRAME:LENGTH` pairs `inputs` are held for, see `held()`."""
+    edges = np.diff(np.concatenate(([0], inputs.astype(np.int8), [0])))
+    presses, releases = np.flatnonzero(edges > 0), np.flatnonzero(edges < 0)
+    return [
+        (int(press), int(release - press))
+        for press, release in zip(presses, releases)
+    ]
+
+
+def start_env(
+    seed: int,
+    name: str,
+    x: float,
+    y: float,
+    speed: float,
+    textures: Sequence[str] = hbtl_env.PLAYER_TEXTURES,
+) -> hbtl_env.BatchedEnv:
+    """
+    An env of one world with the player at `x`, `y` on map `name`, see
+    `main()`. The player's hit box is the hull of `textures`.
+    """
+    env = hbtl_env.BatchedEnv(1, player_textures=textures)
+    env.reset([seed])
+    x += env.map_orders[0].index(name) * hbtl_env.MAP_PX
+    env.x[:] = x
+    env.y[:] = y
+    env.vx[:] = speed
+    env.moving[:] = True
+    env.spectre_x[:] = x - SPECTRE_DISTANCE
+    env.spectre_vx[:] = speed
+    env.spectre_moving[:] = True
+    # After the start sequence
+    env.time[:] = 10.0
+    return env
+
+
+def autopilot_inputs(
+    seed: int, name: str, x: float, y: float, speed: float, frames: int
+) -> tuple[np.ndarray, bool]:
+    """
+    The jump inputs `analyze.Autopilot` plays from the start in the env,
+    per frame, and whether the player died there.
+    """
+    env = start_env(seed, name, x, y, speed)
+    pilot = analyze.Autopilot(env)
+    inputs = np.zeros(frames, dtype=bool)
+    died = False
+    for frame in range(frames):
+        action = pilot.act()
+        inputs[frame] = action[0]
+        _, _, _, info = env.step(action)
+        died |= bool(info["died"][0])
+    return inputs, died
+
+
+def run_env(
+    seed: int,
+    name: str,
+    x: float,
+    y: float,
+    speed: float,
+    inputs: np.ndarray,
+    texture: str,
+) -> tuple[np.ndarray, list[str]]:
+    """
+    Positions of the player in the env per frame, and the map order. The
+    player's hit box is the one of `texture`.
+    """
+    env = start_env(seed, name, x, y, speed, [texture])
+    positions = []
+    for action in inputs:
+        env.step(np.array([action]))
+        positions.append((env.x[0], env.y[0]))
+    return np.array(positions), env.map_orders[0]
+
+
+def run_game(
+    seed: int, name: str, x: float, y: float, speed: float, inputs: np.ndarray
+) -> tuple[np.ndarray, list[str], str, int]:
+    """
+    Positions of the player in the game per frame, the map order, the
+    texture (relative to `TEXTURES_DIR`) the player's animation is held on
+    and how often the player died.
+    """
+    game = _load_game()
+    import arcade
+
+    window = game.Window(1280, 800, visible=False)
+    view = game.GameView()
+    view.setup(seed=seed)
+    window.show_view(view)
+    view.active_player.volume = 0
+    view.started = True  # No title screen, no start sequence
+    view.update_fade(1000)
+    order = list(view.telemetry.maps)
+    x += order.index(name) * hbtl_env.MAP_PX
+    view.player.state = "moving"
+    # Switches to the next frame with the state, then holds it
+    view.player.update_animation()
+    view.player.animation_speed = float("inf")
+    texture = Path(view.player.texture.file_path).relative_to(
+        hbtl_env.mapdata.TEXTURES_DIR
+    ).as_posix()
+    view.player.position = (x, y)
+    view.player.change_x = speed
+    view.player.change_y = 0
+    view.spectre.state = "moving"
+    view.spectre.center_x = x - SPECTRE_DISTANCE
+    view.spectre.change_x = speed
+    view.camera.position = (x, y)
+    view.update_walls()
+
+    positions = []
+    was_held = False
+    for action in inputs:
+        if action and not was_held:
+            view.on_key_press(arcade.key.SPACE, 0)
+        elif was_held and not action:
+            view.on_key_release(arcade.key.SPACE, 0)
+        was_held = action
+        view.simulate(hbtl_env.DELTA_TIME)
+        positions.append(view.player.position)
+    window.close()
+    return np.array(positions), order, texture, len(view.telemetry.deaths)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m hbtl.envcheck",
+        description="Replay jump inputs in the game and the env, compare.",
+    )
+    parser.add_argument(
+        "--headless", action="store_true",
+        help="Run the game through EGL instead of a hidden window",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--map", default="grass_7", help="Map of the run to start on"
+    )
+    parser.add_argument(
+        "--x", type=float, default=905.0,
+        help="Center x of the player on the map",
+    )
+    parser.add_argument(
+        "--y", type=float, default=112.0, help="Center y of the player"
+    )
+    parser.add_argument(
+        "--speed", type=float, default=INITIAL_SPEED,
+        help="Running speed in pixels per second",
+    )
+    parser.add_argument("--frames", type=int, default=140)
+    parser.add_argument(
+        "--jumps", nargs="*", default=[], metavar="FRAME:LENGTH",
+        help="Press jump at FRAME and hold it for LENGTH frames",
+    )
+    parser.add_argument(
+        "--autopilot", action="store_true",
+        help="Jump like the autopilot of `analyze` does in the env, instead "
+        "of `--jumps`, and fail if the player dies in the game",
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=1.0,
+        help="Largest difference in pixels that passes",
+    )
+    parser.add_argument(
+        "--every", type=int, default=10, help="Print every n-th frame"
+    )
+    args = parser.parse_args(argv)
+    if args.headless:
+        os.environ["ARCADE_HEADLESS"] = "1"
+
+    position = (args.seed, args.map, args.x, args.y, args.speed)
+    if args.autopilot:
+        inputs, env_died = autopilot_inputs(*position, args.frames)
+        print("Autopilot jumps: " + " ".join(
+            f"{frame}:{length}" for frame, length in jumps_of(inputs)
+        ))
+        if env_died:
+            sys.exit("The autopilot died in the env")
+    else:
+        inputs = held(parse_jumps(args.jumps), args.frames)
+    start = (*position, inputs)
+    game_positions, game_order, texture, game_deaths = run_game(*start)
+    env_positions, env_order = run_env(*start, texture)
+    if env_order != game_order:
+        sys.exit(
+            f"Map orders differ:\n  env  {env_order}\n  game {game_order}"
+        )
+
+    difference = np.abs(env_positions - game_positions).max(axis=1)
+    print(f"{'frame':>5} {'jump':>4} {'game x':>9} {'game y':>8} "
+          f"{'env x':>9} {'env y':>8} {'diff':>6}")
+    for frame in range(args.frames):
+        if (
+            frame % args.every and frame != args.frames - 1
+            and difference[frame] <= args.tolerance
+        ):
+            continue
+        (game_x, game_y), (env_x, env_y) = (
+            game_positions[frame], env_positions[frame]
+        )
+        print(
+            f"{frame:>5} {'x' if inputs[frame] else '':>4} {game_x:>9.2f} "
+            f"{game_y:>8.2f} {env_x:>9.2f} {env_y:>8.2f} "
+            f"{difference[frame]:>6.2f}"
+        )
+    worst = int(difference.argmax())
+    print(f"Largest difference {difference[worst]:.2f}px at frame {worst}")
+    if difference[worst] > args.tolerance:
+        sys.exit(f"Over the tolerance of {args.tolerance:g}px")
+    if args.autopilot:
+        distance = game_positions[-1, 0] - game_positions[0, 0]
+        print(f"The game's player ran {distance:.0f}px")
+        if game_deaths:
+            sys.exit(f"The autopilot died {game_deaths} times in the game")
+
+
+if __name__ == "__main__":
+    main()
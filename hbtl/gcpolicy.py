@@ -0,0 +1,119 @@
+"""
+Garbage collector policy.
+
+A run allocates thousands of long lived objects when the level is set up and
+keeps allocating small short lived ones while playing. Left alone, the
+collector repeatedly scans the level objects and full collections can land
+mid-jump. Instead, level objects are frozen once set up, collections are made
+rare while playing and done explicitly at points where nobody notices, like
+while the screen is faded out.
+"""
+
+import gc
+import time
+from typing import Any, Optional
+
+# Thresholds while a run is being played. The youngest generation is kept
+# small enough to free per frame garbage, older ones are left to safe points.
+GAMEPLAY_THRESHOLDS = (20_000, 50, 1_000_000)
+
+
+class GCPolicy:
+    def __init__(
+        self, gameplay_thresholds: tuple[int, int, int] = GAMEPLAY_THRESHOLDS
+    ) -> None:
+        self.gameplay_thresholds = gameplay_thresholds
+        self.default_thresholds = gc.get_threshold()
+        self.in_gameplay = False
+        self._installed = False
+        self._start: Optional[float] = None
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        # Per generation: number of collections, total and longest pause
+        self.collections = [0, 0, 0]
+        self.total_pause = [0.0, 0.0, 0.0]
+        self.max_pause = [0.0, 0.0, 0.0]
+        # Collections that happened while playing, by generation
+        self.gameplay_collections = [0, 0, 0]
+        self.gameplay_max_pause = 0.0
+
+    def install(self) -> None:
+        """Start measuring collector pauses."""
+        if not self._installed:
+            gc.callbacks.append(self._on_gc)
+            self._installed = True
+
+    def uninstall(self) -> None:
+        if self._installed:
+            gc.callbacks.remove(self._on_gc)
+            self._installed = False
+        gc.set_threshold(*self.default_thresholds)
+
+    def _on_gc(self, phase: str, info: dict[str, Any]) -> None:
+        if phase == "start":
+            self._start = time.perf_counter()
+            return
+        if self._start is None:
+            return
+        pause = time.perf_counter() - self._start
+        self._start = None
+        generation = info["generation"]
+        self.collections[generation] += 1
+        self.total_pause[generation] += pause
+        self.max_pause[generation] = max(self.max_pause[generation], pause)
+        if self.in_gameplay:
+            self.gameplay_collections[generation] += 1
+            self.gameplay_max_pause = max(self.gameplay_max_pause, pause)
+
+    def level_loaded(self) -> None:
+        """
+        Call once a level is set up. Collects everything left over from
+        before and moves all surviving objects to the permanent generation,
+        so later collections don't have to scan them again.
+        """
+        gc.unfreeze()
+        gc.collect()
+        gc.freeze()
+
+    def enter_gameplay(self) -> None:
+        self.in_gameplay = True
+        gc.set_threshold(*self.gameplay_thresholds)
+
+    def leave_gameplay(self) -> None:
+        self.in_gameplay = False
+        gc.set_threshold(*self.default_thresholds)
+
+    def collect(self) -> None:
+        """
+        Collect everything now. Call at points where a pause is invisible,
+        e.g. while the screen is faded out.
+        """
+        in_gameplay = self.in_gameplay
+        self.in_gameplay = False  # Not accounted as a gameplay pause
+        gc.collect()
+        self.in_gameplay = in_gameplay
+
+    def summary(self) -> str:
+        lines = []
+        for generation in range(3):
+            count = self.collections[generation]
+            if not count:
+                continue
+            lines.append(
+                f"gen {generation}: {count} collections, "
+                f"avg {self.total_pause[generation] / count * 1000:.2f} ms, "
+                f"max {self.max_pause[generation] * 1000:.2f} ms"
+            )
+        lines.append(
+            "during gameplay: "
+            + ", ".join(
+                f"gen {generation}: {count}"
+                for generation, count in enumerate(self.gameplay_collections)
+            )
+            + f", max {self.gameplay_max_pause * 1000:.2f} ms"
+        )
+        return "\n".join(lines)
+
+
+policy = GCPolicy()
@@ -0,0 +1,186 @@
+"""
+Counters for the GPU work of a frame.
+
+Counts the calls into arcade's OpenGL wrapper that cost the driver work:
+draw calls, shader program and texture binds, buffer and texture uploads
+(SpriteLists re-upload their buffers when sprites changed) and framebuffer
+switches. Counts are kept per named stage, e.g. `"lights"` or `"ui"`, so a
+regression shows where it happened.
+
+Counting wraps methods of the `arcade.gl` classes and is only installed
+on request (`HBTL_GPU_STATS=1` or the render benchmark). Otherwise a stage
+costs an attribute assignment.
+
+    with gpustats.stats.stage("world"):
+        scene.draw()
+"""
+
+import os
+from collections import Counter
+from typing import Any, Callable, Iterator, Optional
+
+import arcade.gl
+
+ENABLED = os.environ.get("HBTL_GPU_STATS", "") not in ("", "0")
+KINDS = (
+    "draws", "programs", "textures", "uploads", "upload_bytes",
+    "framebuffers",
+)
+# Stage of everything drawn outside of a named stage
+OTHER = "other"
+
+
+def _subclasses(cls: type) -> Iterator[type]:
+    yield cls
+    for subclass in cls.__subclasses__():
+        yield from _subclasses(subclass)
+
+
+def _size(data: Any) -> int:
+    try:
+        return memoryview(data).nbytes
+    except TypeError:
+        return 0
+
+
+class _Stage:
+    def __init__(self, stats: "GPUStats", name: str) -> None:
+        self.stats = stats
+        self.name = name
+        self._previous = OTHER
+
+    def __enter__(self) -> None:
+        self._previous = self.stats.current
+        self.stats.current = self.name
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stats.current = self._previous
+
+
+class GPUStats:
+    def __init__(self) -> None:
+        self.current = OTHER
+        self._stages: dict[str, _Stage] = {}
+        self._originals: list[tuple[type, str, Callable[..., Any]]] = []
+        self.reset()
+
+    @property
+    def installed(self) -> bool:
+        return bool(self._originals)
+
+    def reset(self) -> None:
+        self.frames = 0
+        # Counts of the current frame and of all finished frames, by stage
+        self.frame: dict[str, Counter[str]] = {}
+        self.totals: dict[str, Counter[str]] = {}
+        self.last_frame: dict[str, Counter[str]] = {}
+
+    def stage(self, name: str) -> _Stage:
+        """Context manager counting everything inside towards `name`."""
+        stage = self._stages.get(name)
+        if stage is None:
+            stage = self._stages[name] = _Stage(self, name)
+        return stage
+
+    def count(self, kind: str, amount: int = 1) -> None:
+        counts = self.frame.get(self.current)
+        if counts is None:
+            counts = self.frame[self.current] = Counter()
+        counts[kind] += amount
+
+    def end_frame(self) -> dict[str, Counter[str]]:
+        """Finish the current frame. Returns its counts by stage."""
+        for name, counts in self.frame.items():
+            self.totals.setdefault(name, Counter()).update(counts)
+        self.last_frame = self.frame
+        self.frame = {}
+        self.frames += 1
+        return self.last_frame
+
+    def per_frame(self) -> dict[str, dict[str, float]]:
+        """Average counts per finished frame, by stage."""
+        frames = max(self.frames, 1)
+        return {
+            name: {kind: counts[kind] / frames for kind in KINDS}
+            for name, counts in self.totals.items()
+        }
+
+    def install(self) -> None:
+        if self.installed:
+            return
+        count = self.count
+
+        def draw(original: Callable[..., Any]) -> Callable[..., Any]:
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                count("draws")
+                return original(*args, **kwargs)
+            return wrapper
+
+        def program(original: Callable[..., Any]) -> Callable[..., Any]:
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                count("programs")
+                return original(*args, **kwargs)
+            return wrapper
+
+        def texture(original: Callable[..., Any]) -> Callable[..., Any]:
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                count("textures")
+                return original(*args, **kwargs)
+            return wrapper
+
+        def upload(original: Callable[..., Any]) -> Callable[..., Any]:
+            def wrapper(
+                self: Any, data: Any, *args: Any, **kwargs: Any
+            ) -> Any:
+                count("uploads")
+                count("upload_bytes", _size(data))
+                return original(self, data, *args, **kwargs)
+            return wrapper
+
+        def framebuffer(original: Callable[..., Any]) -> Callable[..., Any]:
+            def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+                # Binding the bound framebuffer again is skipped by arcade
+                if self.ctx.active_framebuffer is not self:
+                    count("framebuffers")
+                return original(self, *args, **kwargs)
+            return wrapper
+
+        gl: Any = arcade.gl
+        for base, methods in (
+            (gl.Geometry, {"render": draw, "render_indirect": draw}),
+            (gl.Program, {"use": program}),
+            (gl.Texture2D, {"use": texture, "write": upload}),
+            (gl.Buffer, {"write": upload}),
+            (gl.Framebuffer, {"use": framebuffer}),
+        ):
+            for cls in _subclasses(base):
+                for name, wrap in methods.items():
+                    original = cls.__dict__.get(name)
+                    if original is None:
+                        continue
+                    self._originals.append((cls, name, original))
+                    setattr(cls, name, wrap(original))
+
+    def uninstall(self) -> None:
+        for cls, name, original in reversed(self._originals):
+            setattr(cls, name, original)
+        self._originals.clear()
+
+    def summary(self, stages: Optional[dict[str, Any]] = None) -> str:
+        stages = self.per_frame() if stages is None else stages
+        if not stages:
+            return "no frames counted"
+        lines = [
+            f"{'stage':<10}"
+            + "".join(f"{kind:>14}" for kind in KINDS)
+            + "   (per frame)"
+        ]
+        for name, counts in stages.items():
+            lines.append(
+                f"{name:<10}"
+                + "".join(f"{counts[kind]:>14.1f}" for kind in KINDS)
+            )
+        return "\n".join(lines)
+
+
+stats = GPUStats()
@@ -0,0 +1,98 @@
+"""
+Hit boxes of textures, kept on disk between launches.
+
+Arcade computes the hit box of every texture it creates by scanning its
+pixels. The points only depend on the pixels and the hit box algorithm, so
+they are stored by image hash and algorithm and handed to new textures
+directly. Flipped textures transform the points of the original and need no
+entry of their own.
+"""
+
+from pathlib import Path
+from typing import Optional, Union
+
+import arcade
+import PIL.Image
+from arcade.hitbox import HitBoxAlgorithm
+from arcade.texture import ImageData, Texture
+
+try:
+    from . import cache, preload
+except ImportError:
+    # Nuitka does not allow invoking via -m
+    import cache
+    import preload
+
+# A different arcade version might compute different points
+KEY = f"arcade {arcade.VERSION}"
+
+_points: Optional[dict[str, list[list[float]]]] = None
+_changed = False
+
+
+def _store() -> dict[str, list[list[float]]]:
+    global _points
+    if _points is None:
+        try:
+            _points = cache.load_json(_path(), KEY) or {}
+        except OSError:
+            _points = {}  # No cache directory, compute everything
+    return _points
+
+
+def _path() -> Path:
+    return cache.cache_dir() / "hitboxes.json"
+
+
+def texture(
+    image: PIL.Image.Image,
+    hit_box_algorithm: Optional[HitBoxAlgorithm] = None,
+) -> Texture:
+    """
+    A texture of an RGBA image, with its hit box from the cache. It is
+    uploaded with the next `preload.upload()`.
+    """
+    global _changed
+    algorithm = hit_box_algorithm or arcade.hitbox.algo_default
+    data = ImageData(image)
+    key = f"{data.hash}|{algorithm.cache_name}"
+    store = _store()
+    if key in store:
+        new = Texture(
+            data,
+            hit_box_algorithm=algorithm,
+            hit_box_points=tuple(tuple(point) for point in store[key]),
+        )
+    else:
+        new = Texture(data, hit_box_algorithm=algorithm)
+        store[key] = [list(point) for point in new.hit_box_points]
+        _changed = True
+    preload.created(new)
+    return new
+
+
+def load_texture(
+    file_path: Union[str, Path],
+    hit_box_algorithm: Optional[HitBoxAlgorithm] = None,
+) -> Texture:
+    """
+    Like `arcade.load_texture()`, with the hit box from the cache and the
+    image from `preload` if it was decoded in the background.
+    """
+    if isinstance(file_path, str):
+        file_path = arcade.resources.resolve(file_path)
+    loaded = texture(preload.open_image(file_path), hit_box_algorithm)
+    loaded.file_path = file_path
+    return loaded
+
+
+def save() -> None:
+    """Write hit boxes computed since the last save to disk."""
+    global _changed
+    if not _changed:
+        return
+    try:
+        cache.save_json(_path(), KEY, _store())
+    except OSError:
+        return  # Computed again next time
+    _changed = False
@@ -0,0 +1,95 @@
+"""
+Timestamped input, consumed by the game logic.
+
+Window events arrive between frames, and with the simulation thread (see
+`simthread`) between steps. Handlers only push jump presses and releases
+with a `perf_counter()` timestamp. The game logic takes them at the start
+of its next step, right before the physics update, which also handles jump
+buffering: a press is kept until the player can jump or it gets too old.
+Once an input takes effect, the time since it arrived is recorded, which
+is the latency the player feels.
+"""
+
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Iterator, NamedTuple
+
+JUMP = "jump"
+RELEASE = "release"
+
+
+class InputEvent(NamedTuple):
+    action: str
+    time: float
+
+
+class LatencyHistogram:
+    """Latencies in fixed bins, so recording never allocates."""
+    # Upper edges in milliseconds, the last bin takes everything above
+    EDGES_MS = (1, 2, 4, 8, 12, 16, 20, 25, 33, 50, 67, 100)
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(self.EDGES_MS) + 1)
+        self.samples = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        milliseconds = seconds * 1000
+        self.counts[bisect_left(self.EDGES_MS, milliseconds)] += 1
+        self.samples += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, fraction: float) -> float:
+        """Upper edge of the bin containing the percentile, in seconds."""
+        target = fraction * self.samples
+        seen = 0
+        for edge, count in zip(self.EDGES_MS, self.counts):
+            seen += count
+            if seen >= target:
+                return edge / 1000
+        return self.max
+
+    def summary(self) -> str:
+        if not self.samples:
+            return "no inputs"
+        lines = [
+            f"{self.samples} inputs, "
+            f"avg {self.total / self.samples * 1000:.1f} ms, "
+            f"p50 <= {self.percentile(0.5) * 1000:.0f} ms, "
+            f"p95 <= {self.percentile(0.95) * 1000:.0f} ms, "
+            f"max {self.max * 1000:.1f} ms"
+        ]
+        lower = 0
+        for edge, count in zip(self.EDGES_MS + (None,), self.counts):
+            label = f"{lower}-{edge} ms" if edge else f"{lower}+ ms"
+            if count:
+                lines.append(f"  {label:>10} {count:>6}")
+            lower = edge or lower
+        return "\n".join(lines)
+
+
+class InputQueue:
+    def __init__(self) -> None:
+        # Appending and popping from both ends of a deque is thread safe
+        self._events: deque[InputEvent] = deque()
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def push(self, action: str) -> None:
+        self._events.append(InputEvent(action, time.perf_counter()))
+
+    def take(self) -> Iterator[InputEvent]:
+        """All queued events, oldest first. Events pushed meanwhile too."""
+        while self._events:
+            yield self._events.popleft()
+
+    def clear(self) -> None:
+        self._events.clear()
+
+
+# Jump latency of all runs
+latency = LatencyHistogram()
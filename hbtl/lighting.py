@@ -0,0 +1,111 @@
+"""
+The light layer, with the lights rendered at a lower resolution.
+
+Imported once the intro is shown, see `load_game_assets()` in `__main__`.
+"""
+
+from array import array
+from typing import Any
+
+from arcade.experimental.lights import Light, LightLayer
+
+__all__ = ["Light", "ScaledLightLayer"]
+
+# The arcade `_Internals` was written against, as pinned in pyproject.toml
+PINNED_ARCADE = "9afc46a"
+
+
+class _Internals:
+    """
+    All access to private parts of arcade's `LightLayer` and `Light`, which
+    have no public API for a smaller light buffer or for uploading the
+    lights ahead of `draw()`. Checks they are still there when created, so
+    a different arcade fails right away instead of drawing wrong.
+    """
+    LAYER = ("_lights", "_buffer", "_light_buffer", "_rebuild")
+    LIGHT = ("_attenuation", "_color")
+
+    def __init__(self, layer: LightLayer) -> None:
+        light = Light(0, 0)
+        missing = [
+            name for name in self.LAYER if not hasattr(layer, name)
+        ] + [name for name in self.LIGHT if not hasattr(light, name)]
+        if missing:
+            raise RuntimeError(
+                f"ScaledLightLayer needs arcade {PINNED_ARCADE}, this "
+                f"LightLayer has no {', '.join(missing)}"
+            )
+        self.layer = layer
+
+    def upload(self) -> None:
+        """Upload the lights as they are now, like `draw()` would."""
+        data = array("f")
+        for light in self.layer:
+            data.extend(light.position)
+            data.append(light.radius)
+            data.append(light._attenuation)
+            data.extend(light._color)
+        if data:
+            buffer = self.layer._buffer
+            while buffer.size < len(data) * data.itemsize:
+                buffer.orphan(double=True)
+            buffer.write(data=data)
+        self.uploaded()
+
+    def uploaded(self) -> None:
+        """Keep `draw()` from uploading the lights again."""
+        self.layer._rebuild = False
+
+    def set_light_buffer_size(self, width: int, height: int) -> None:
+        self.layer._light_buffer = self.layer.ctx.framebuffer(
+            color_attachments=self.layer.ctx.texture(
+                (width, height), components=3
+            )
+        )
+
+
+class ScaledLightLayer(LightLayer):
+    """
+    A `LightLayer` whose light buffer is `scale` times the size of the
+    layer. The scene itself is still rendered at full resolution, only the
+    soft light circles are scaled up when combined with it.
+    """
+    def __init__(self, width: int, height: int, scale: float = 1.0) -> None:
+        super().__init__(width, height)
+        self._internals = _Internals(self)
+        self.scale = scale
+        self._layer_size = (width, height)
+        if scale != 1:
+            self._resize_lights()
+
+    def resize(self, width: int, height: int) -> None:
+        super().resize(width, height)
+        self._layer_size = (width, height)
+        if self.scale != 1:
+            self._resize_lights()
+
+    def sync(self) -> None:
+        """
+        Upload the lights as they are now. Call while holding the world
+        lock (see `simthread`), `draw()` then only uses what was uploaded
+        and doesn't need it. Rebuilt every frame, the spectre light moves
+        with almost every step anyway.
+        """
+        self._internals.upload()
+
+    def draw(self, *args: Any, **kwargs: Any) -> None:
+        # Lights moved since `sync()` show in the next frame
+        self._internals.uploaded()
+        super().draw(*args, **kwargs)
+
+    def set_scale(self, scale: float) -> None:
+        if scale != self.scale:
+            self.scale = scale
+            self._resize_lights()
+
+    def _resize_lights(self) -> None:
+        width, height = self._layer_size
+        self._internals.set_light_buffer_size(
+            max(1, round(width * self.scale)),
+            max(1, round(height * self.scale)),
+        )
@@ -0,0 +1,413 @@
+"""
+Map data read straight from the Tiled files, without creating any sprites.
+
+The game builds its tiles from this, tools simulating the game headlessly
+use it directly. Both pick the maps of a run through `roll_map_order()`, so
+a seed gives the same level everywhere.
+"""
+
+import functools
+import json
+import random
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+import numpy as np
+
+try:
+    from . import assetpack
+    from .constants import MAPS_PER_BIOME, TILE_SCALING, TILE_SIZE
+except ImportError:
+    # Nuitka does not allow invoking via -m
+    import assetpack
+    from constants import MAPS_PER_BIOME, TILE_SCALING, TILE_SIZE
+
+ASSETS_DIR = Path(__file__).parent / "assets"
+MAPS_DIR = ASSETS_DIR / "maps"
+TEXTURES_DIR = ASSETS_DIR / "textures"
+
+# Size of a tile in the world, in pixels
+TILE_PX = TILE_SIZE * TILE_SCALING
+# Maps per biome, named like `ice_1`, in the order of a run
+BIOME_MAPS = {"grass": 10, "ice": 8, "obsidian": 8}
+
+# Tiled stores flipping in the upper bits of a gid
+GID_MASK = 0x1FFFFFFF
+FLIPPED_HORIZONTALLY = 0b100
+FLIPPED_VERTICALLY = 0b010
+FLIPPED_DIAGONALLY = 0b001
+
+
+def roll_biome(rng: random.Random, biome: str) -> list[str]:
+    """Pick the maps of one biome, from left to right."""
+    count = BIOME_MAPS[biome]
+    maps = list(range(1, count + 1))
+    # Ice and obsidian only have 8 maps, so we need 2 twice
+    while len(maps) < MAPS_PER_BIOME:
+        maps.append(rng.randint(1, count))
+    rng.shuffle(maps)
+    return [f"{biome}_{maps.pop()}" for _ in range(MAPS_PER_BIOME)]
+
+
+def roll_map_order(rng: random.Random) -> list[str]:
+    """Pick the maps of a run, from left to right."""
+    order = ["init_map"]
+    for biome in BIOME_MAPS:
+        order += roll_biome(rng, biome)
+    order.append("darkness")
+    return order
+
+
+def endless_map_order(rng: random.Random) -> Iterator[tuple[str, str]]:
+    """
+    The maps of an endless run as `(biome, map)`, from left to right: the
+    biomes over and over instead of ending in the darkness.
+    """
+    yield "grass", "init_map"
+    while True:
+        for biome in BIOME_MAPS:
+            for name in roll_biome(rng, biome):
+                yield biome, name
+
+
+@functools.lru_cache(maxsize=None)
+def map_files() -> dict[str, Path]:
+    """All maps by name (file stem)."""
+    return {path.stem: path for path in assetpack.rglob(MAPS_DIR, "*.tmj")}
+
+
+def _property_value(prop: ET.Element) -> Any:
+    value = prop.get("value", "")
+    kind = prop.get("type", "string")
+    if kind == "bool":
+        return value == "true"
+    if kind == "int":
+        return int(value)
+    if kind == "float":
+        return float(value)
+    return value
+
+
+class Tileset:
+    """The parts of a `.tsx` tileset the tools care about."""
+    def __init__(self, path: Path) -> None:
+        with assetpack.open_asset(path) as file:
+            root = ET.parse(file).getroot()
+        self.path = path
+        self.name = root.get("name", path.stem)
+        self.tile_width = int(root.get("tilewidth", TILE_SIZE))
+        self.tile_height = int(root.get("tileheight", TILE_SIZE))
+        self.columns = int(root.get("columns", 0))
+        image = root.find("image")
+        self.image: Optional[Path] = (
+            (path.parent / image.get("source", "")).resolve()
+            if image is not None else None
+        )
+        self.properties: dict[int, dict[str, Any]] = {}
+        # Tiles of image collection tilesets: local id -> (image, w, h)
+        self.images: dict[int, tuple[Path, int, int]] = {}
+        for tile in root.findall("tile"):
+            tile_id = int(tile.get("id", 0))
+            properties = {
+                prop.get("name", ""): _property_value(prop)
+                for prop in tile.iter("property")
+            }
+            if properties:
+                self.properties[tile_id] = properties
+            tile_image = tile.find("image")
+            if tile_image is not None:
+                self.images[tile_id] = (
+                    (path.parent / tile_image.get("source", "")).resolve(),
+                    int(tile_image.get("width", self.tile_width)),
+                    int(tile_image.get("height", self.tile_height)),
+                )
+
+    def tile_size(self, tile_id: int) -> tuple[int, int]:
+        """Unscaled size of a tile's image."""
+        if tile_id in self.images:
+            _, width, height = self.images[tile_id]
+            return width, height
+        return self.tile_width, self.tile_height
+
+    def tile_bounds(self, tile_id: int) -> tuple[float, float, float, float]:
+        """
+        Bounds of the opaque part of a tile as `(left, bottom, right, top)`
+        in world pixels, relative to the bottom left corner of its sprite.
+        """
+        return _tile_bounds(self.path, tile_id)
+
+    def tile_hit_box(self, tile_id: int) -> tuple[tuple[float, float], ...]:
+        """
+        Points of a tile's hit box in world pixels, relative to the bottom
+        left corner of its sprite.
+        """
+        return _tile_hit_box(self.path, tile_id)
+
+
+@functools.lru_cache(maxsize=None)
+def load_tileset(path: Path) -> Tileset:
+    return Tileset(path)
+
+
+def tileset_images() -> list[Path]:
+    """All images the tilesets of the maps use."""
+    images: list[Path] = []
+    for path in sorted(assetpack.glob(MAPS_DIR, "*.tsx")):
+        tileset = load_tileset(path.resolve())
+        if tileset.image is not None:
+            images.append(tileset.image)
+        images.extend(image for image, _, _ in tileset.images.values())
+    return images
+
+
+def _tile_image(
+    tileset_path: Path, tile_id: int
+) -> tuple[Path, Optional[tuple[int, int, int, int]]]:
+    """Image of a tile and its region in there, if it's a tileset image."""
+    tileset = load_tileset(tileset_path)
+    if tile_id in tileset.images:
+        image_path, width, height = tileset.images[tile_id]
+        return image_path, None
+    assert tileset.image is not None
+    column = tile_id % tileset.columns
+    row = tile_id // tileset.columns
+    return tileset.image, (
+        column * tileset.tile_width,
+        row * tileset.tile_height,
+        (column + 1) * tileset.tile_width,
+        (row + 1) * tileset.tile_height,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _tile_bounds(
+    tileset_path: Path, tile_id: int
+) -> tuple[float, float, float, float]:
+    image_path, region = _tile_image(tileset_path, tile_id)
+    return opaque_bounds(image_path, TILE_SCALING, region)
+
+
+@functools.lru_cache(maxsize=None)
+def _tile_hit_box(
+    tileset_path: Path, tile_id: int
+) -> tuple[tuple[float, float], ...]:
+    image_path, region = _tile_image(tileset_path, tile_id)
+    return hit_box_points(image_path, TILE_SCALING, region)
+
+
+@functools.lru_cache(maxsize=None)
+def opaque_bounds(
+    image_path: Path,
+    scale: float,
+    region: Optional[tuple[int, int, int, int]] = None,
+) -> tuple[float, float, float, float]:
+    """
+    Bounds of the opaque pixels of an image (or a region of it) as
+    `(left, bottom, right, top)`, scaled and relative to its bottom left
+    corner. Matches the box of arcade's simple hit box algorithm.
+    """
+    from PIL import Image
+
+    with assetpack.open_asset(image_path) as file, Image.open(file) as image:
+        if region is not None:
+            image = image.crop(region)
+        width, height = image.size
+        bbox = image.convert("RGBA").getchannel("A").getbbox()
+    if bbox is None:
+        return (0.0, 0.0, 0.0, 0.0)
+    left, upper, right, lower = bbox
+    return (
+        left * scale,
+        (height - lower) * scale,
+        right * scale,
+        (height - upper) * scale,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def hit_box_points(
+    image_path: Path,
+    scale: float,
+    region: Optional[tuple[int, int, int, int]] = None,
+) -> tuple[tuple[float, float], ...]:
+    """
+    Points of the hit box of an image (or a region of it) counterclockwise,
+    scaled and relative to its bottom left corner. Matches arcade's simple
+    hit box algorithm: the bounds of the opaque pixels, with each corner cut
+    off diagonally as far as it is transparent.
+    """
+    from PIL import Image
+
+    with assetpack.open_asset(image_path) as file, Image.open(file) as image:
+        if region is not None:
+            image = image.crop(region)
+        alpha = np.asarray(image.convert("RGBA").getchannel("A"))
+    height, width = alpha.shape
+    rows, columns = np.nonzero(alpha)
+    if not len(rows):
+        return tuple(
+            (x * scale, y * scale)
+            for x, y in ((0, 0), (width, 0), (width, height), (0, height))
+        )
+    left, right = int(columns.min()), int(columns.max())
+    top, bottom = int(rows.min()), int(rows.max())
+
+    def corner(column: int, row: int, step_x: int, step_y: int) -> int:
+        """Transparent diagonals off a corner, rows going down."""
+        offset = 0
+        while True:
+            for i in range(offset + 1):
+                x = column + i * step_x
+                y = row + (offset - i) * step_y
+                if not (0 <= x < width and 0 <= y < height) or alpha[y, x]:
+                    return offset
+            offset += 1
+
+    top_left = corner(left, top, 1, 1)
+    top_right = corner(right, top, -1, 1)
+    bottom_left = corner(left, bottom, 1, -1)
+    bottom_right = corner(right, bottom, -1, -1)
+    # In image pixels, rows going down, in the order arcade lists them
+    points = [(left, bottom + 1 - bottom_left)]
+    if bottom_left:
+        points.append((left + bottom_left, bottom + 1))
+    points.append((right + 1 - bottom_right, bottom + 1))
+    if bottom_right:
+        points.append((right + 1, bottom + 1 - bottom_right))
+    points.append((right + 1, top + top_right))
+    if top_right:
+        points.append((right + 1 - top_right, top))
+    points.append((left + top_left, top))
+    if top_left:
+        points.append((left, top + top_left))
+    return tuple(dict.fromkeys(
+        (x * scale, (height - y) * scale) for x, y in points
+    ))
+
+
+@functools.lru_cache(maxsize=None)
+def center_bounds(
+    texture: str, scale: float
+) -> tuple[float, float, float, float]:
+    """
+    Bounds of the opaque pixels of a texture (relative to `TEXTURES_DIR`) as
+    `(left, bottom, right, top)`, relative to the center of its sprite.
+    """
+    from PIL import Image
+
+    path = TEXTURES_DIR / texture
+    with assetpack.open_asset(path) as file, Image.open(file) as image:
+        width, height = image.size
+    left, bottom, right, top = opaque_bounds(path, scale)
+    half_w = width * scale / 2
+    half_h = height * scale / 2
+    return (left - half_w, bottom - half_h, right - half_w, top - half_h)
+
+
+@functools.lru_cache(maxsize=None)
+def center_hit_box(
+    texture: str, scale: float
+) -> tuple[tuple[float, float], ...]:
+    """
+    Points of the hit box of a texture (relative to `TEXTURES_DIR`),
+    relative to the center of its sprite.
+    """
+    from PIL import Image
+
+    path = TEXTURES_DIR / texture
+    with assetpack.open_asset(path) as file, Image.open(file) as image:
+        width, height = image.size
+    half_w = width * scale / 2
+    half_h = height * scale / 2
+    return tuple(
+        (x - half_w, y - half_h) for x, y in hit_box_points(path, scale)
+    )
+
+
+class MapData:
+    """A map's tile layers as arrays of gids, without any sprites."""
+    def __init__(self, name: str) -> None:
+        path = map_files()[name]
+        data = json.loads(assetpack.read_text(path))
+        self.name = name
+        self.path = path
+        self.width: int = data["width"]
+        self.height: int = data["height"]
+        self.tilesets: list[tuple[int, Tileset]] = sorted(
+            (
+                tileset["firstgid"],
+                load_tileset((path.parent / tileset["source"]).resolve()),
+            )
+            for tileset in data["tilesets"]
+        )
+        # Row 0 is the top row, like in Tiled
+        self.layers: dict[str, np.ndarray] = {}
+        # Flipping of each tile, the upper 3 bits of its gid
+        self.flips: dict[str, np.ndarray] = {}
+        for layer in data["layers"]:
+            if layer["type"] != "tilelayer":
+                continue
+            gids = np.array(layer["data"], dtype=np.uint32).reshape(
+                layer["height"], layer["width"]
+            )
+            self.layers[layer["name"]] = (gids & GID_MASK).astype(np.int32)
+            self.flips[layer["name"]] = (gids >> 29).astype(np.uint8)
+
+    def tile(self, gid: int) -> tuple[Tileset, int]:
+        """Tileset and local id of a gid."""
+        found = None
+        for firstgid, tileset in self.tilesets:
+            if firstgid > gid:
+                break
+            found = (tileset, gid - firstgid)
+        if found is None:
+            raise ValueError(f"No tileset for gid {gid} in map `{self.name}`")
+        return found
+
+    def tile_properties(self, gid: int) -> dict[str, Any]:
+        tileset, tile_id = self.tile(gid)
+        return tileset.properties.get(tile_id, {})
+
+    def layer(self, name: str) -> np.ndarray:
+        """A layer's gids, or zeros if the map doesn't have it."""
+        try:
+            return self.layers[name]
+        except KeyError:
+            return np.zeros((self.height, self.width), dtype=np.int32)
+
+    def flip(self, name: str, column: int, row: int) -> int:
+        """Flipping of a tile as `FLIPPED_*` bits, `row` from the bottom."""
+        if name not in self.flips:
+            return 0
+        return int(self.flips[name][self.height - 1 - row, column])
+
+    def tiles(self, name: str) -> list[tuple[int, int, int]]:
+        """
+        All `(column, row, gid)` of a layer, in the order arcade creates the
+        sprites (top row first). `row` counts from the bottom.
+        """
+        layer = self.layer(name)
+        return [
+            (int(column), self.height - 1 - int(row), int(layer[row, column]))
+            for row, column in zip(*np.nonzero(layer))
+        ]
+
+    def sprite_position(
+        self, column: int, row: int, gid: int
+    ) -> tuple[float, float]:
+        """
+        Center of the sprite arcade creates for a tile, relative to the map.
+        `row` counts from the bottom.
+        """
+        tileset, tile_id = self.tile(gid)
+        width, height = tileset.tile_size(tile_id)
+        return (
+            column * TILE_PX + width * TILE_SCALING / 2,
+            row * TILE_PX + height * TILE_SCALING / 2,
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def load_map(name: str) -> MapData:
+    return MapData(name)
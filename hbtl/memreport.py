@@ -0,0 +1,192 @@
+"""
+Where the memory goes, per subsystem and per biome.
+
+With `--memory-report` the game traces Python allocations with tracemalloc
+and takes a snapshot at fixed points: after `setup_map()`, after
+`setup_ui()` and at each biome transition. Each allocation is attributed to
+the innermost `hbtl` line on its stack, so memory allocated inside arcade,
+pyglet or PIL counts towards the game code that asked for it. Snapshots
+also record the sprite counts of the view and estimates of memory outside
+of Python: the texture atlas, the light layer framebuffers and the decoded
+music.
+
+Budgets in MB per category (`python`, `atlas`, `light_layer`, `music`) are
+checked at every snapshot. Start with `python -X tracemalloc=25 -m hbtl` to
+also trace what is allocated while importing, like the music.
+"""
+
+import argparse
+import json
+import os
+import tracemalloc
+from pathlib import Path
+from typing import Any, Optional
+
+import arcade
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "")
+MODULE = os.path.basename(__file__)
+# Frames kept per allocation, enough to get from arcade back to the game
+FRAMES = 25
+MB = 1024 * 1024
+CATEGORIES = ("python", "atlas", "light_layer", "music")
+
+
+def texture_bytes(texture: Any) -> int:
+    """Size of an OpenGL texture, as allocated unless the driver pads it."""
+    itemsize = int(texture.dtype[1:])
+    return texture.width * texture.height * texture.components * itemsize
+
+
+def sound_bytes(sound: arcade.Sound) -> int:
+    """Size of a sound decoded into memory (loaded without streaming)."""
+    audio_format = sound.source.audio_format
+    if audio_format is None or not sound.source.duration:
+        return 0
+    return int(
+        sound.source.duration * audio_format.sample_rate
+        * audio_format.channels * audio_format.sample_size / 8
+    )
+
+
+def _site(traceback: tracemalloc.Traceback) -> Optional[tuple[str, int]]:
+    # Frames are ordered from the oldest to the most recent
+    for frame in reversed(traceback):
+        if frame.filename.startswith(PACKAGE_DIR):
+            return frame.filename[len(PACKAGE_DIR):], frame.lineno
+    return None
+
+
+class MemoryReport:
+    def __init__(
+        self, budgets: Optional[dict[str, float]] = None, top: int = 15
+    ) -> None:
+        self.budgets = budgets or {}
+        self.top = top
+        self.checkpoints: list[dict[str, Any]] = []
+        self.violations: list[str] = []
+        self._sites: dict[str, int] = {}
+
+    def checkpoint(self, label: str, view: Any) -> None:
+        """Take a snapshot of the memory of `view`, a `GameView`."""
+        snapshot = tracemalloc.take_snapshot()
+        sites: dict[str, int] = {}
+        modules: dict[str, int] = {}
+        python = 0
+        for stat in snapshot.statistics("traceback"):
+            site = _site(stat.traceback)
+            if site and site[0] == MODULE:
+                continue  # The report itself
+            python += stat.size
+            module = site[0] if site else "(outside hbtl)"
+            modules[module] = modules.get(module, 0) + stat.size
+            if site:
+                name = f"{site[0]}:{site[1]}"
+                sites[name] = sites.get(name, 0) + stat.size
+        del snapshot
+
+        estimates = {
+            "python": python,
+            "atlas": texture_bytes(view.window.ctx.default_atlas.texture),
+            "light_layer": (
+                texture_bytes(view.light_layer.diffuse_texture)
+                + texture_bytes(view.light_layer.light_texture)
+            ) if hasattr(view, "light_layer") else 0,
+            "music": sum(
+                sound_bytes(sound)
+                for sound in (
+                    view.sound_sewer, view.sound_overworld,
+                    view.sound_horizon,
+                )
+            ) if hasattr(view, "sound_sewer") else 0,
+        }
+        top_sites = sorted(sites.items(), key=lambda item: -item[1])
+        self.checkpoints.append({
+            "label": label,
+            "biome": getattr(view, "biome", None),
+            "bytes": estimates,
+            "modules": dict(
+                sorted(modules.items(), key=lambda item: -item[1])
+            ),
+            "sites": [
+                {
+                    "site": name,
+                    "bytes": size,
+                    "change": size - self._sites.get(name, 0),
+                }
+                for name, size in top_sites[:self.top]
+            ],
+            "sprites": view.sprite_counts() if hasattr(view, "scene") else {},
+        })
+        self._sites = sites
+
+        for category, budget in self.budgets.items():
+            if estimates.get(category, 0) > budget * MB:
+                self.violations.append(
+                    f"{label}: {category} uses "
+                    f"{estimates[category] / MB:.1f} MB, "
+                    f"budget {budget:.1f} MB"
+                )
+
+    def summary(self) -> str:
+        lines = []
+        for checkpoint in self.checkpoints:
+            lines.append(
+                f"== {checkpoint['label']} ({checkpoint['biome']}) =="
+            )
+            lines.append(", ".join(
+                f"{category} {size / MB:.1f} MB"
+                for category, size in checkpoint["bytes"].items()
+            ))
+            lines.append("by module:")
+            for module, size in list(checkpoint["modules"].items())[:8]:
+                lines.append(f"  {size / MB:>8.2f} MB  {module}")
+            lines.append("top call sites (change since last snapshot):")
+            for site in checkpoint["sites"]:
+                lines.append(
+                    f"  {site['bytes'] / MB:>8.2f} MB "
+                    f"{site['change'] / MB:>+8.2f} MB  {site['site']}"
+                )
+            lines.append("sprites: " + ", ".join(
+                f"{name} {count}"
+                for name, count in checkpoint["sprites"].items()
+            ))
+        if self.violations:
+            lines.append("OVER BUDGET:")
+            lines += [f"  {violation}" for violation in self.violations]
+        return "\n".join(lines)
+
+    def save(self, path: Path) -> None:
+        path.write_text(json.dumps({
+            "budgets_mb": self.budgets,
+            "checkpoints": self.checkpoints,
+            "violations": self.violations,
+        }, indent=2))
+
+
+report: Optional[MemoryReport] = None
+
+
+def start(budgets: Optional[dict[str, float]] = None) -> MemoryReport:
+    """Start tracing allocations and collect snapshots from now on."""
+    global report
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(FRAMES)
+    report = MemoryReport(budgets)
+    return report
+
+
+def checkpoint(label: str, view: Any) -> None:
+    """Take a snapshot if a report was started."""
+    if report is not None:
+        report.checkpoint(label, view)
+
+
+def parse_budget(text: str) -> tuple[str, float]:
+    """`"python=200"` to `("python", 200.0)`, for argparse."""
+    category, _, megabytes = text.partition("=")
+    if category not in CATEGORIES or not megabytes:
+        raise argparse.ArgumentTypeError(
+            f"Expected CATEGORY=MB with one of {', '.join(CATEGORIES)}"
+        )
+    return category, float(megabytes)
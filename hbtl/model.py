@@ -3,11 +3,22 @@
 import time
 from enum import IntEnum
 from pathlib import Path
-from typing import Any, Iterable, Optional, Union
+from typing import (
+    Any, Callable, ContextManager, Iterable, Optional, Union,
+)
 
 import arcade
 from arcade.hitbox import HitBoxAlgorithm, SimpleHitBoxAlgorithm
-from arcade.texture import Texture, load_texture
+from arcade.texture import Texture
+
+try:
+    from . import assetpack, collision
+    from .hitboxes import load_texture
+except ImportError:
+    # Nuitka does not allow invoking via -m
+    import assetpack
+    import collision
+    from hitboxes import load_texture
 
 
 class CustomPhysicsEnginePlatformer(arcade.PhysicsEnginePlatformer):
@@ -21,13 +32,50 @@ class CustomPhysicsEnginePlatformer(arcade.PhysicsEnginePlatformer):
         :return: List of all collisions
         :rtype: arcade.SpriteList[arcade.Sprite]
         """
+        speed = self.player_sprite.change_x
         self.player_sprite.change_x = self.player_sprite.change_x * delta_time
         # self.player_sprite.change_y = self.player_sprite.change_y * delta_time  # noqa
+        limited = self.limit_motion()
         out = self.update()
-        self.player_sprite.change_x = self.player_sprite.change_x / delta_time
+        if limited:
+            self.player_sprite.change_x = speed
+        else:
+            self.player_sprite.change_x = (
+                self.player_sprite.change_x / delta_time
+            )
         # self.player_sprite.change_y = self.player_sprite.change_y / delta_time  # noqa
         return out
 
+    def limit_motion(self) -> bool:
+        """
+        Shorten the next move of the player so it can't pass through a wall
+        within one update, see `collision.limit_motion()`. Limits the move
+        along y first, then along x, in the order `update()` moves. Returns
+        whether the move along x was limited.
+        """
+        player = self.player_sprite
+        gravity = 0.0 if self.is_on_ladder() else self.gravity_constant
+        dy = player.change_y - gravity
+        dx = player.change_x
+        start = collision.box(player)
+        width, height = start[2] - start[0], start[3] - start[1]
+        # Passing through anything takes a move longer than the player
+        if abs(dy) <= height and abs(dx) <= width:
+            return False
+        walls = [
+            collision.box(wall)
+            for wall_list in self.walls for wall in wall_list
+        ]
+        if abs(dy) > height:
+            dy *= collision.limit_motion(start, 0, dy, walls)
+            player.change_y = dy + gravity  # `update()` subtracts it again
+        if abs(dx) <= width:
+            return False
+        start = (start[0], start[1] + dy, start[2], start[3] + dy)
+        limit = collision.limit_motion(start, dx, 0, walls)
+        player.change_x = dx * limit
+        return limit < 1
+
 
 class AssetsPath(type(Path())):  # type: ignore
     """
@@ -56,12 +104,13 @@ class AssetsPath(type(Path())):  # type: ignore
 
         `assets` parameter may use glob syntax.
         `preferences` should be a tuple containing preferred extensions.
+        Searches the asset pack instead of the directory if there is one.
         Defaults to `.png` and `.svg`. If None, the first match will be picked.
         """
         if preferences is None:
             preferences = [".png", ".svg"]
 
-        for item in self.rglob(asset):
+        for item in assetpack.rglob(self, asset):
             if not preferences or item.suffix in preferences:
                 return Path(item)
         else:
@@ -96,6 +145,7 @@ def load_texture_series(
     hit_box_algorithm: HitBoxAlgorithm = SimpleHitBoxAlgorithm(),  # type: ignore[no-untyped-call]  # noqa
 ) -> list[Texture]:
     """Load a series of textures following a name schema from a directory.
+    Hit boxes come from the on-disk cache of the `hitboxes` module.
 
     Args:
         dir (Union[Path, str]): The directory containing the textures
@@ -515,7 +565,8 @@ def load_texture_pair(
     """
     All `**kwargs` are passed to the `load_texture()` function and
     therefore applied to both textures. Don't use any `flipped_*` kwargs
-    as they are internally used to flip the second sprite.
+    as they are internally used to flip the second sprite. The flipped
+    texture reuses the (cached) hit box of the first one.
     """
 
     return (
@@ -524,6 +575,70 @@ def load_texture_pair(
     )
 
 
+class ViewScheduler:
+    """
+    Schedules callbacks on the arcade clock while keeping track of them, so
+    everything a view scheduled can be cancelled at once when it is left.
+    Otherwise forgotten callbacks keep running and keep their view alive.
+    Callbacks run while holding `lock`, if set.
+    """
+    def __init__(self, lock: Optional[ContextManager[Any]] = None) -> None:
+        self.lock = lock
+        # Maps the scheduled function to the callables handed to the clock
+        self._entries: dict[
+            Callable[[float], Any], list[Callable[[float], Any]]
+        ] = {}
+
+    def _locked(
+        self, func: Callable[[float], Any]
+    ) -> Callable[[float], Any]:
+        if self.lock is None:
+            return func
+
+        def locked(delta_time: float) -> None:
+            assert self.lock is not None
+            with self.lock:
+                func(delta_time)
+
+        return locked
+
+    def __len__(self) -> int:
+        """Number of live entries on the clock."""
+        return sum(len(entries) for entries in self._entries.values())
+
+    def schedule(self, func: Callable[[float], Any], interval: float) -> None:
+        """Call `func` every `interval` seconds until unscheduled."""
+        entry = self._locked(func)
+        arcade.schedule(entry, interval)
+        self._entries.setdefault(func, []).append(entry)
+
+    def schedule_once(
+        self, func: Callable[[float], Any], delay: float
+    ) -> None:
+        """Call `func` once after `delay` seconds."""
+        def once(delta_time: float) -> None:
+            entries = self._entries.get(func, [])
+            if entry in entries:
+                entries.remove(entry)
+            if not entries:
+                self._entries.pop(func, None)
+            func(delta_time)
+
+        entry = self._locked(once)
+        arcade.schedule_once(entry, delay)
+        self._entries.setdefault(func, []).append(entry)
+
+    def unschedule(self, func: Callable[[float], Any]) -> None:
+        """Cancel all entries of `func`, repeating or not."""
+        for entry in self._entries.pop(func, []):
+            arcade.unschedule(entry)
+
+    def clear(self) -> None:
+        """Cancel everything scheduled through this scheduler."""
+        for func in list(self._entries):
+            self.unschedule(func)
+
+
 class FadingView(arcade.View):
     """Implements logic to fade a view in and/or out."""
     def __init__(
@@ -541,6 +656,12 @@ class FadingView(arcade.View):
         self.next_view = next_view
         self._fade_out: Optional[float] = None
         self._fade_in: Optional[float] = None
+        # Use this instead of arcade.schedule*() so callbacks die with the view
+        self.scheduler = ViewScheduler()
+
+    def on_hide_view(self) -> None:
+        """Cancel everything the view scheduled."""
+        self.scheduler.clear()
 
     def start_fade_in(self) -> None:
         """
@@ -579,9 +700,7 @@ class FadingView(arcade.View):
             self._fade_out += step
             if self._fade_out > 255:
                 if self.next_view:
-                    next_view = self.next_view()
-                    next_view.setup()
-                    self.window.show_view(next_view)
+                    self.show_next_view()
                 else:
                     self._fade_out = 255
 
@@ -590,26 +709,32 @@ class FadingView(arcade.View):
             if self._fade_in <= 0:
                 self._fade_in = None
 
+    def show_next_view(self) -> None:
+        """
+        Called once the view faded out completely. Sets up and shows a new
+        instance of `next_view` by default, override to reuse the view instead.
+        """
+        next_view = self.next_view()
+        next_view.setup()
+        self.window.show_view(next_view)
+
     def draw_fading(self) -> None:
+        if self._fade_out is None and self._fade_in is None:
+            return
+
+        rect = arcade.types.LBWH(
+            left=0,
+            bottom=0,
+            width=self.window.width,
+            height=self.window.height,
+        )
         if self._fade_out is not None:
-            rect = arcade.types.LBWH(
-                left=0,
-                bottom=0,
-                width=self.window.width,
-                height=self.window.height,
-            )
             arcade.draw_rect_filled(
                 rect,
                 color=(0, 0, 0, int(self._fade_out)),
             )
 
         if self._fade_in is not None:
-            rect = arcade.types.LBWH(
-                left=0,
-                bottom=0,
-                width=self.window.width,
-                height=self.window.height,
-            )
             arcade.draw_rect_filled(
                 rect,
                 color=(0, 0, 0, int(self._fade_in)),
@@ -0,0 +1,110 @@
+"""
+Image and music decoding on worker threads.
+
+Pillow releases the GIL while decoding, so the images a view needs are
+decoded on a thread pool, started as early as possible (usually while an
+earlier view is still shown). Loading a texture then only takes the decoded
+image. Music is decoded into memory the same way. GL work has to stay on
+the main thread: `upload()` puts all textures created since the last upload
+into the texture atlas in one go, before the first frame needs them,
+instead of one by one during the first draws.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Optional
+
+import arcade
+import PIL.Image
+from arcade.texture import Texture
+
+try:
+    from . import assetpack
+except ImportError:
+    # Nuitka does not allow invoking via -m
+    import assetpack
+
+_executor: Optional[ThreadPoolExecutor] = None
+_images: dict[Path, Future[PIL.Image.Image]] = {}
+_sounds: dict[Path, Future[arcade.Sound]] = {}
+_created: list[Texture] = []
+
+
+def _decode(path: Path) -> PIL.Image.Image:
+    with assetpack.open_asset(path) as file:
+        image = PIL.Image.open(file)
+        if image.mode != "RGBA":
+            return image.convert("RGBA")
+        image.load()
+        return image
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(thread_name_prefix="hbtl-decode")
+    return _executor
+
+
+def decode(paths: Iterable[Path]) -> list[Future[PIL.Image.Image]]:
+    """
+    Start decoding `paths` in the background. Returns right away, with the
+    futures of the images.
+    """
+    started = []
+    for path in paths:
+        path = Path(path).resolve()
+        if path not in _images:
+            _images[path] = _get_executor().submit(_decode, path)
+            started.append(_images[path])
+    return started
+
+
+def open_image(path: Path) -> PIL.Image.Image:
+    """
+    An image file as RGBA. Takes the result of `decode()` if it was started
+    for the file (waiting for it if needed), otherwise decodes right here.
+    """
+    future = _images.pop(Path(path).resolve(), None)
+    if future is None:
+        return _decode(Path(path))
+    return future.result()
+
+
+def load_sounds(paths: Iterable[Path]) -> list[Future[arcade.Sound]]:
+    """Like `decode()`, for sounds loaded with `arcade.load_sound()`."""
+    started = []
+    for path in paths:
+        path = Path(path).resolve()
+        if path not in _sounds:
+            _sounds[path] = _get_executor().submit(arcade.load_sound, path)
+            started.append(_sounds[path])
+    return started
+
+
+def sound(path: Path) -> arcade.Sound:
+    """
+    A sound started with `load_sounds()` (which is done now if it wasn't).
+    Sounds are kept, asking again returns the same one.
+    """
+    path = Path(path).resolve()
+    if path not in _sounds:
+        load_sounds([path])
+    return _sounds[path].result()
+
+
+def created(texture: Texture) -> None:
+    """Remember a new texture for the next `upload()`."""
+    _created.append(texture)
+
+
+def upload(atlas: Optional[arcade.DefaultTextureAtlas] = None) -> None:
+    """
+    Add all textures created since the last call to `atlas` (the window's
+    default atlas if omitted).
+    """
+    if atlas is None:
+        atlas = arcade.get_window().ctx.default_atlas
+    for texture in _created:
+        atlas.add(texture)
+    _created.clear()
@@ -0,0 +1,141 @@
+"""
+Quality tiers, picked by measured frame times.
+
+The game starts at the highest tier. `QualityGovernor` keeps the intervals
+between the last drawn frames and steps down a tier when too many of them
+miss the target frame time (`HBTL_TARGET_FPS`, 60 by default). After a
+while of hitting the target it tries the next tier up again. If that tier
+misses the target right away, it steps back down and waits twice as long
+before the next try, so the quality settles instead of flipping back and
+forth.
+
+A tier is fixed with `HBTL_QUALITY=low|medium|high`, `auto` (the default)
+lets the governor decide.
+"""
+
+import os
+from collections import deque
+from typing import NamedTuple, Optional
+
+
+class Tier(NamedTuple):
+    name: str
+    # Resolution of the light buffer, relative to the window. Lights are
+    # soft, scaled up they look nearly the same.
+    light_scale: float
+    # Share of the cloud and butterfly spawns that happen
+    ambient_spawns: float
+    ice_stars: int
+    obsidian_stars: int
+    # Seconds between animation updates of the ambient layer, 0 for every
+    # update
+    ambient_animation_interval: float
+
+
+TIERS = (
+    Tier("low", 0.25, 0.25, 30, 8, 1 / 10),
+    Tier("medium", 0.5, 0.5, 60, 14, 1 / 30),
+    Tier("high", 1.0, 1.0, 100, 20, 0.0),
+)
+TARGET_FPS = 60
+
+
+class QualityGovernor:
+    def __init__(
+        self,
+        target: float = 1 / TARGET_FPS,
+        fixed: Optional[str] = None,
+        samples: int = 120,
+        tolerance: float = 1.2,
+        miss_share: float = 0.1,
+        upgrade_after: float = 10.0,
+    ) -> None:
+        """
+        `target` is the frame time in seconds. A frame missed it if it took
+        longer than `tolerance` times that. More than `miss_share` missed
+        frames among the last `samples` step down a tier. `upgrade_after`
+        seconds without that step up again. A tier that fails within
+        `upgrade_after` seconds is tried again only twice as late.
+        """
+        self.target = target
+        self.tolerance = tolerance
+        self.miss_share = miss_share
+        self.upgrade_after = upgrade_after
+        self.fixed = fixed is not None
+        names = [tier.name for tier in TIERS]
+        if fixed is not None and fixed not in names:
+            raise ValueError(
+                f"Unknown quality {fixed!r}, expected one of "
+                f"{', '.join(names)} or auto"
+            )
+        self.index = names.index(fixed) if fixed else len(TIERS) - 1
+        self.changes = 0
+        # Seconds on target before trying each tier, doubled when it failed
+        self.upgrade_delays = [upgrade_after] * len(TIERS)
+        self._intervals: deque[float] = deque(maxlen=samples)
+        self._last_frame: Optional[float] = None
+        self._good_since: Optional[float] = None
+        self._upgraded_at: Optional[float] = None
+
+    @property
+    def tier(self) -> Tier:
+        return TIERS[self.index]
+
+    def frame(self, now: float) -> bool:
+        """
+        Call when a frame starts, with `time.perf_counter()`. Returns
+        whether the tier changed.
+        """
+        last, self._last_frame = self._last_frame, now
+        if self.fixed or last is None:
+            return False
+        interval = now - last
+        if interval > 1:
+            return False  # Not a slow frame, the game was hidden or halted
+        intervals = self._intervals
+        intervals.append(interval)
+        if len(intervals) < intervals.maxlen:  # type: ignore[operator]
+            return False
+
+        limit = self.target * self.tolerance
+        missed = sum(1 for interval in intervals if interval > limit)
+        if missed > self.miss_share * len(intervals):
+            if self.index == 0:
+                return False
+            if (
+                self._upgraded_at is not None
+                and now - self._upgraded_at < self.upgrade_after
+            ):
+                # Stepped up into this tier only recently, wait longer
+                # before the next try
+                self.upgrade_delays[self.index] *= 2
+            self._set(self.index - 1)
+            self._upgraded_at = None
+            return True
+
+        if self._good_since is None:
+            self._good_since = now
+        if (
+            self.index < len(TIERS) - 1
+            and now - self._good_since >= self.upgrade_delays[self.index + 1]
+        ):
+            self._set(self.index + 1)
+            self._upgraded_at = now
+            return True
+        return False
+
+    def _set(self, index: int) -> None:
+        self.index = index
+        self.changes += 1
+        # Judge the new tier by its own frames only
+        self._intervals.clear()
+        self._good_since = None
+
+    @classmethod
+    def from_env(cls) -> "QualityGovernor":
+        fps = float(os.environ.get("HBTL_TARGET_FPS") or TARGET_FPS)
+        fixed = os.environ.get("HBTL_QUALITY") or "auto"
+        return cls(1 / fps, None if fixed == "auto" else fixed)
+
+
+governor = QualityGovernor.from_env()
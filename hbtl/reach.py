@@ -0,0 +1,510 @@
+"""
+Reachability of the maps at different running speeds.
+
+Runs the player from every place it can stand on a map, for all of them at
+once, with the wall physics of the batched environment (`env.Walls`): the
+polygons of the wall tiles, ramping up slopes and bumping its head on
+ceilings like in the game. From each place it walks, jumps holding jump and
+jumps releasing it after a few frames, which cuts the jump short like
+`on_key_release` does, and from where walking gets it stuck at a wall it
+jumps again. It starts at each of a range of speeds, which change like in
+the game while it runs. From the landings a map is found clearable or not,
+and platform ends where the player gets stuck or only has a small window to
+jump are reported. Where each jump from each place ends is kept as lookup
+tables over the speeds, see `JumpTable`, which the autopilot of `analyze`
+uses to skip jumps that can't work. Results are cached per map file.
+
+The player's hit box is the hull of the ones of its animation, like in the
+env. Obstacles are not taken into account.
+
+    python -m hbtl.reach grass_1 ice_3 --speeds 300 350 400
+"""
+
+import argparse
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+try:
+    from . import cache, mapdata
+    from . import env as hbtl_env
+    from .constants import (
+        GRAVITY, INITIAL_SPEED, JUMP_VELOCITY, SPEED_GAIN_PER_SECOND,
+        SPEED_PENALTY_VERTICAL_PLUS,
+    )
+except ImportError:
+    # Nuitka does not allow invoking via -m
+    import cache
+    import env as hbtl_env
+    import mapdata
+    from constants import (
+        GRAVITY, INITIAL_SPEED, JUMP_VELOCITY, SPEED_GAIN_PER_SECOND,
+        SPEED_PENALTY_VERTICAL_PLUS,
+    )
+
+TILE_PX = mapdata.TILE_PX
+DELTA_TIME = hbtl_env.DELTA_TIME
+# Bump when the analysis changes, so cached results are recomputed
+VERSION = 4
+
+DEFAULT_SPEEDS = tuple(range(INITIAL_SPEED, 451, 25))
+# Pixels between the places to start from
+START_STEP = 8
+# Places to start from within a tile, in pixels
+START_OFFSETS = tuple(range(0, TILE_PX, START_STEP))
+# Jump windows up to this many pixels count as tight
+TIGHT_WINDOW = 16
+# Frames after pressing jump it's released at, besides holding it
+RELEASE_FRAMES = (1, 3, 5, 7)
+# Walking, instead of a frame to release jump at
+WALK = -2
+# Holding jump until landing
+HOLD = -1
+# Ways to jump, in the order of `JumpTable`
+RELEASES = (HOLD, *RELEASE_FRAMES)
+# Frames to settle the starts onto the ground
+SETTLE_FRAMES = 30
+
+# Outcomes of a run
+LANDED = 0
+BLOCKED = 1
+EXITED = 2
+FELL = 3
+# Standing without moving, at a wall or where it started
+STOPPED = 4
+# Not a place to start from, in a `JumpTable`
+UNKNOWN = -1
+
+
+class MapReach:
+    """Reachability of one map at one speed."""
+    def __init__(self, name: str, speed: float, data: dict[str, Any]) -> None:
+        self.name = name
+        self.speed = speed
+        self.clearable: bool = data["clearable"]
+        # (column, row) of platform ends nothing useful can be reached from
+        self.dead_ends: list[tuple[int, int]] = [
+            tuple(end) for end in data["dead_ends"]  # type: ignore
+        ]
+        # (column, row, window in pixels) of platform ends with tight jumps
+        self.tight: list[tuple[int, int, int]] = [
+            tuple(spot) for spot in data["tight"]  # type: ignore
+        ]
+        self.reachable: int = data["reachable"]
+
+    def __repr__(self) -> str:
+        return (
+            f"<MapReach {self.name} at {self.speed}px/s: "
+            f"{'clearable' if self.clearable else 'NOT clearable'}, "
+            f"{len(self.dead_ends)} dead ends, {len(self.tight)} tight>"
+        )
+
+
+class JumpTable:
+    """
+    Where jumps from the places the player can stand on a map end, per
+    speed it starts running at and way to jump (see `RELEASES`). Lookup
+    tables of the outcome and the x the jump ends at, indexed (speed,
+    release, row of the cell it stands in, x // `START_STEP`). Places the
+    player can't start from are `UNKNOWN`.
+    """
+    def __init__(
+        self, name: str, speeds: list[float], data: dict[str, Any]
+    ) -> None:
+        self.name = name
+        self.speeds = np.asarray(speeds, dtype=np.float64)
+        shape = (
+            len(speeds), len(RELEASES), data["rows"],
+            data["columns"] * TILE_PX // START_STEP,
+        )
+        self.outcome = np.full(shape, UNKNOWN, dtype=np.int8)
+        self.end_x = np.full(shape, np.nan, dtype=np.float32)
+        if data["starts"]:
+            rows, steps = np.array(data["starts"]).T
+            self.outcome[:, :, rows, steps] = data["outcome"]
+            self.end_x[:, :, rows, steps] = data["end_x"]
+
+    def __repr__(self) -> str:
+        starts = int((self.outcome[0, 0] != UNKNOWN).sum())
+        return f"<JumpTable {self.name}: {starts} starts>"
+
+
+def analyze_map(
+    name: str, speeds: Iterable[float] = DEFAULT_SPEEDS
+) -> dict[float, MapReach]:
+    """Reachability of a map at each speed, cached per map file."""
+    speeds = list(speeds)
+    return {
+        speed: MapReach(name, speed, result)
+        for speed, result in zip(speeds, _load(name, speeds)["reach"])
+    }
+
+
+def jump_table(
+    name: str, speeds: Iterable[float] = DEFAULT_SPEEDS
+) -> JumpTable:
+    """The jumps of a map at each speed, cached with `analyze_map()`."""
+    speeds = list(speeds)
+    return JumpTable(name, speeds, _load(name, speeds)["jumps"])
+
+
+def _load(name: str, speeds: list[float]) -> dict[str, Any]:
+    path = mapdata.map_files()[name]
+    key = cache.digest(path, extra=[VERSION, speeds])
+    cache_path = cache.cache_dir("reach") / f"{name}.json"
+    results = cache.load_json(cache_path, key)
+    if results is None:
+        results = _analyze(mapdata.load_map(name), speeds)
+        cache.save_json(cache_path, key, results)
+    return results
+
+
+def _analyze(data: mapdata.MapData, speeds: list[float]) -> dict[str, Any]:
+    shapes = hbtl_env.player_shapes()
+    kinds = hbtl_env.wall_kinds(data, shapes)
+    walls = hbtl_env.Walls(kinds[None], shapes)
+    rows, columns = kinds.shape
+    solid = kinds != 0
+    # Going up only slows down past the first map
+    penalty = data.name != "init_map"
+
+    # Cells the player can stand in: air above a wall
+    standing = np.zeros_like(solid)
+    standing[1:] = solid[:-1] & ~solid[1:]
+    entry = _entry(data, standing)
+    cell_rows, cell_columns = np.nonzero(standing)
+
+    # Let the player drop onto the ground from just above each cell's
+    # floor, slopes are lower. Places it doesn't fit or that aren't on the
+    # ground of that cell are left out.
+    x = (cell_columns[:, None] * TILE_PX + np.array(START_OFFSETS)).ravel()
+    start_rows = np.repeat(cell_rows, len(START_OFFSETS))
+    start_columns = np.repeat(cell_columns, len(START_OFFSETS))
+    y = start_rows * float(TILE_PX) - shapes.player_box[1] + 1
+    fits = ~walls.collides(np.zeros(len(x), dtype=np.int64), x, y)[0]
+    x, y = x[fits], y[fits]
+    start_rows, start_columns = start_rows[fits], start_columns[fits]
+    # Where each start is in a `JumpTable`
+    start_steps = (x // START_STEP).astype(np.int64)
+    outcome, land_column, land_row, x, y = _run(
+        walls, standing, x, y, np.zeros(len(x)), start_columns, start_rows,
+        np.full(len(x), WALK), SETTLE_FRAMES, penalty,
+    )
+    settled = (
+        (outcome == STOPPED)
+        & (land_column == start_columns) & (land_row == start_rows)
+    )
+    x, y = x[settled], y[settled]
+    start_rows, start_columns = start_rows[settled], start_columns[settled]
+    start_steps = start_steps[settled]
+
+    # Enough frames to jump, fall from the top of the map to the death
+    # height and walk two tiles
+    frames = int(np.sqrt(2 * (rows * TILE_PX + 200) / GRAVITY)) + 2
+    frames += int(JUMP_VELOCITY / GRAVITY) * 2
+    frames += int(2 * TILE_PX / (min(speeds) * DELTA_TIME)) + 1
+
+    # Walk from every start at every speed
+    starts = len(x)
+    speed = np.repeat(np.asarray(speeds, dtype=np.float64), starts)
+    walked = _run(
+        walls, standing, np.tile(x, len(speeds)), np.tile(y, len(speeds)),
+        speed, np.tile(start_columns, len(speeds)),
+        np.tile(start_rows, len(speeds)), np.full(len(speed), WALK), frames,
+        penalty,
+    )
+
+    # Where walking got stuck at a wall is another place to jump from
+    stuck = walked[0] == STOPPED
+    wall_starts = np.unique(np.stack((
+        speed[stuck], walked[3][stuck], walked[4][stuck],
+        np.tile(start_columns, len(speeds))[stuck],
+        np.tile(start_rows, len(speeds))[stuck],
+    ), axis=1), axis=0)
+    wall_speed, wall_x, wall_y, wall_columns, wall_rows = wall_starts.T
+
+    # Jump from every start and place at a wall, with every release
+    jump_speed = np.concatenate((speed, wall_speed))
+    jump_x = np.concatenate((np.tile(x, len(speeds)), wall_x))
+    jump_y = np.concatenate((np.tile(y, len(speeds)), wall_y))
+    jump_columns = np.concatenate(
+        (np.tile(start_columns, len(speeds)), wall_columns)
+    ).astype(np.int64)
+    jump_rows = np.concatenate(
+        (np.tile(start_rows, len(speeds)), wall_rows)
+    ).astype(np.int64)
+    # Starts by index, places at walls count as starts of their own
+    jump_starts = np.concatenate((
+        np.tile(np.arange(starts), len(speeds)),
+        starts + np.arange(len(wall_x)),
+    ))
+    jumped = _run(
+        walls, standing, np.tile(jump_x, len(RELEASES)),
+        np.tile(jump_y, len(RELEASES)), np.tile(jump_speed, len(RELEASES)),
+        np.tile(jump_columns, len(RELEASES)),
+        np.tile(jump_rows, len(RELEASES)),
+        np.repeat(RELEASES, len(jump_x)), frames, penalty,
+    )
+
+    # The jumps from the starts, (release, speed, start), as the tables
+    # of `JumpTable` without the places at walls
+    table = (
+        np.arange(len(RELEASES))[:, None] * len(jump_x)
+        + np.arange(len(speed))
+    ).reshape(len(RELEASES), len(speeds), starts).transpose(1, 0, 2)
+    jumps = {
+        "rows": rows,
+        "columns": columns,
+        "starts": np.stack((start_rows, start_steps), axis=1).tolist(),
+        "outcome": jumped[0][table].tolist(),
+        "end_x": np.round(jumped[3][table], 1).tolist(),
+    }
+
+    run_speed = np.concatenate((speed, np.tile(jump_speed, len(RELEASES))))
+    run_starts = np.concatenate((
+        np.tile(np.arange(starts), len(speeds)),
+        np.tile(jump_starts, len(RELEASES)),
+    ))
+    run_columns = np.concatenate((
+        np.tile(start_columns, len(speeds)),
+        np.tile(jump_columns, len(RELEASES)),
+    ))
+    run_rows = np.concatenate((
+        np.tile(start_rows, len(speeds)), np.tile(jump_rows, len(RELEASES))
+    ))
+    outcome, land_column, land_row = (
+        np.concatenate((walk, jump))
+        for walk, jump in zip(walked[:3], jumped[:3])
+    )
+    results = []
+    for speed_value in speeds:
+        runs = run_speed == speed_value
+        results.append(_graph(
+            standing, entry, run_starts[runs], run_columns[runs],
+            run_rows[runs], outcome[runs], land_column[runs], land_row[runs],
+        ))
+    return {"reach": results, "jumps": jumps}
+
+
+def _run(
+    walls: hbtl_env.Walls,
+    standing: np.ndarray,
+    x: np.ndarray,
+    y: np.ndarray,
+    vx: np.ndarray,
+    start_columns: np.ndarray,
+    start_rows: np.ndarray,
+    release: np.ndarray,
+    frames: int,
+    penalty: bool,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Run players from standing on the ground at `x`, `y` in the cells
+    (`start_columns`, `start_rows`) until they land on the ground of
+    another cell, stop, leave the map, fall to their death or `frames` run
+    out. Players jump unless `release` is `WALK`, releasing jump that many
+    frames after pressing it or holding it with `HOLD`. They speed up on
+    the ground and, with `penalty`, slow down going up like in the game.
+
+    :return: The outcome per player, the cell its ground is in (-1 where
+    it isn't a standing cell) and where it ended up
+    :rtype: tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray,
+    np.ndarray]
+    """
+    n = len(x)
+    rows, columns = standing.shape
+    box_left, box_bottom = walls.shapes.player_box[:2]
+    outcome = np.full(n, BLOCKED)
+    land_column = np.full(n, -1)
+    land_row = np.full(n, -1)
+    end_x = np.asarray(x, dtype=np.float64).copy()
+    end_y = np.asarray(y, dtype=np.float64).copy()
+    vy = np.where(release == WALK, 0.0, float(JUMP_VELOCITY))
+    # Only the players still running, compressed every frame
+    live = np.arange(n)
+    x, y, vx = end_x.copy(), end_y.copy(), np.asarray(vx, dtype=np.float64)
+    for frame in range(frames):
+        if not len(live):
+            break
+        stop_jump_value = -0.8 * vy + JUMP_VELOCITY
+        vy = np.where(
+            (release == frame) & (vy > stop_jump_value), stop_jump_value, vy
+        )
+        vx = vx + np.where(
+            vy > 0, SPEED_PENALTY_VERTICAL_PLUS * penalty,
+            np.where(vx > 0, SPEED_GAIN_PER_SECOND * DELTA_TIME, 0),
+        )
+        worlds = np.zeros(len(live), dtype=np.int64)
+        previous_x = x
+        x, y, vy = walls.move(worlds, x, y, vx, vy)
+        grounded = (vy <= 0) & walls.can_jump(worlds, x, y)
+
+        # The cell of the ground below the player's center. Standing on a
+        # slope it can be in the wall tile below the cell.
+        column = np.floor(x / TILE_PX).astype(np.int64)
+        row = np.floor((y + box_bottom + 0.01) / TILE_PX).astype(np.int64)
+        inside = (column >= 0) & (column < columns) & (row >= 0)
+        inside &= row < rows
+        column_index = np.clip(column, 0, columns - 1)
+        row_index = np.clip(row, 0, rows - 1)
+        above = np.minimum(row_index + 1, rows - 1)
+        row = np.where(
+            inside & ~standing[row_index, column_index]
+            & standing[above, column_index] & (row + 1 < rows),
+            row + 1, row,
+        )
+        on_cell = inside & standing[np.clip(row, 0, rows - 1), column_index]
+        column = np.where(on_cell, column, -1)
+        row = np.where(on_cell, row, -1)
+        moved_cell = on_cell & (
+            (column != start_columns) | (row != start_rows)
+        )
+
+        result = np.full(len(live), -1)
+        jumping = release != WALK
+        result[grounded & (x == previous_x)] = STOPPED
+        # Jumps that come down where they started got nowhere
+        result[grounded & jumping & on_cell & ~moved_cell] = BLOCKED
+        result[grounded & moved_cell] = LANDED
+        # Dies at a center y of -200, like in the game
+        result[y <= -200] = FELL
+        result[x + box_left >= columns * TILE_PX] = EXITED
+        done = result >= 0
+        if done.any():
+            ended = live[done]
+            outcome[ended] = result[done]
+            land_column[ended] = column[done]
+            land_row[ended] = row[done]
+            end_x[ended] = x[done]
+            end_y[ended] = y[done]
+        keep = ~done
+        live = live[keep]
+        x, y, vx, vy = x[keep], y[keep], vx[keep], vy[keep]
+        release = release[keep]
+        start_columns, start_rows = start_columns[keep], start_rows[keep]
+    end_x[live] = x
+    end_y[live] = y
+    return outcome, land_column, land_row, end_x, end_y
+
+
+def _entry(
+    data: mapdata.MapData, standing: np.ndarray
+) -> list[tuple[int, int]]:
+    """Where the player comes into a map."""
+    spawn = data.tiles("spawn")
+    if spawn:
+        column, row, _ = spawn[0]
+        return [(column, row)]
+    columns = np.nonzero(standing.any(axis=0))[0]
+    if not len(columns):
+        return []
+    rows = np.nonzero(standing[:, columns[0]])[0]
+    return [(int(columns[0]), int(row)) for row in rows]
+
+
+def _graph(
+    standing: np.ndarray,
+    entry: list[tuple[int, int]],
+    starts: np.ndarray,
+    start_columns: np.ndarray,
+    start_rows: np.ndarray,
+    outcome: np.ndarray,
+    land_column: np.ndarray,
+    land_row: np.ndarray,
+) -> dict[str, Any]:
+    """Walk the landings of the runs from the entry and summarize."""
+    rows, columns = standing.shape
+    # Start cell -> set of landing cells (or "exit"), and the starts (by
+    # index) with the farthest column they get to
+    edges: dict[tuple[int, int], set] = {}
+    farthest: dict[tuple[int, int], dict[int, int]] = {}
+    for i in range(len(outcome)):
+        start = (int(start_columns[i]), int(start_rows[i]))
+        target: Optional[Any] = None
+        if outcome[i] == EXITED:
+            target = "exit"
+        elif outcome[i] == LANDED:
+            target = (int(land_column[i]), int(land_row[i]))
+        if target is None or target == start:
+            continue
+        edges.setdefault(start, set()).add(target)
+        column = columns if target == "exit" else target[0]
+        index = int(starts[i])
+        reached = farthest.setdefault(start, {})
+        reached[index] = max(reached.get(index, column), column)
+
+    # Walking right on the same row
+    for row, column in zip(*np.nonzero(standing)):
+        if column + 1 < columns and standing[row, column + 1]:
+            edges.setdefault((int(column), int(row)), set()).add(
+                (int(column) + 1, int(row))
+            )
+        elif column + 1 == columns:
+            edges.setdefault((int(column), int(row)), set()).add("exit")
+
+    reachable = set(entry)
+    todo = list(entry)
+    clearable = False
+    while todo:
+        cell = todo.pop()
+        for target in edges.get(cell, ()):
+            if target == "exit":
+                clearable = True
+            elif target not in reachable:
+                reachable.add(target)
+                todo.append(target)
+
+    dead_ends = []
+    tight = []
+    for column, row in sorted(reachable):
+        if column + 1 < columns and standing[row, column + 1]:
+            continue  # Not a platform end
+        # Getting past the end works from anywhere on the platform
+        window = 0
+        platform_column = column
+        while platform_column >= 0 and standing[row, platform_column]:
+            starts = farthest.get((platform_column, row), {})
+            window += sum(1 for reached in starts.values() if reached > column)
+            platform_column -= 1
+        if not window:
+            dead_ends.append((column, row))
+        elif window * START_STEP <= TIGHT_WINDOW:
+            tight.append((column, row, window * START_STEP))
+    return {
+        "clearable": clearable,
+        "dead_ends": dead_ends,
+        "tight": tight,
+        "reachable": len(reachable),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m hbtl.reach",
+        description="Check whether maps can be cleared at running speeds.",
+    )
+    parser.add_argument(
+        "maps", nargs="*", help="Map names, all maps if none are given"
+    )
+    parser.add_argument(
+        "--speeds", nargs="+", type=float, default=DEFAULT_SPEEDS,
+        help="Running speeds in pixels per second",
+    )
+    args = parser.parse_args(argv)
+
+    names = args.maps or sorted(mapdata.map_files())
+    for name in names:
+        for speed, result in analyze_map(name, args.speeds).items():
+            status = "ok" if result.clearable else "NOT CLEARABLE"
+            print(f"{name:<12} {speed:>5.0f}px/s  {status}")
+            for column, row in result.dead_ends:
+                print(f"    stuck at column {column}, row {row}")
+            for column, row, window in result.tight:
+                print(
+                    f"    tight at column {column}, row {row}: "
+                    f"{window}px to jump"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Game logic on its own thread.
+
+Normally arcade calls `on_update()` and `on_draw()` one after the other, so a
+slow frame (or the buffer swap waiting for vsync and the GPU) also delays
+the game logic, and the logic runs with whatever delta time the frame had.
+With `HBTL_SIM_THREAD=1` a `SimulationThread` steps the logic instead, at a
+fixed rate with a fixed delta time, while the main thread only draws and
+handles window events.
+
+Arcade's sprite lists can't be double buffered without copying the whole
+scene every step, so both sides share them and `lock` makes a step atomic
+instead. The simulation holds it while stepping, the main thread while
+handling events and while drawing the world: the sprite lists into the
+light layer, plus a copy of the light positions. The frame therefore always
+shows a complete step. The light pass, the UI on top and the buffer swap
+use only that copy and overlap with the simulation, so a slow light pass
+doesn't hold up physics and input.
+Drawing the world and stepping never run at the same time: there are no
+published snapshots the renderer could read instead.
+If the simulation falls behind, it catches up with several steps in a row,
+up to `max_catch_up`, and then drops the missing time.
+
+OpenGL (texture uploads into the atlas) and the audio player only work from
+the main thread. The simulation hands such work to `MainThreadCalls`, which
+the main thread runs before drawing.
+"""
+
+import collections
+import functools
+import os
+import threading
+import time
+from typing import Any, Callable, Optional, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+RATE = 60
+ENABLED = os.environ.get("HBTL_SIM_THREAD", "") not in ("", "0")
+
+
+class SimulationThread:
+    def __init__(
+        self,
+        step: Callable[[float], Any],
+        lock: threading.RLock,
+        rate: float = RATE,
+        max_catch_up: int = 5,
+    ) -> None:
+        self.step = step
+        self.lock = lock
+        self.interval = 1 / rate
+        self.max_catch_up = max_catch_up
+        # Stats: steps done, steps dropped and the longest step
+        self.steps = 0
+        self.dropped = 0
+        self.max_step_time = 0.0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="hbtl-simulation", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop stepping. Returns right away, without waiting for the thread,
+        so it can be called while holding `lock`.
+        """
+        self._stopped.set()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """Wait for the thread after `stop()`. Don't hold `lock` for this."""
+        self._thread.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive() and not self._stopped.is_set()
+
+    def _run(self) -> None:
+        next_step = time.perf_counter()
+        while not self._stopped.is_set():
+            behind = int((time.perf_counter() - next_step) / self.interval)
+            if behind > self.max_catch_up:
+                self.dropped += behind - self.max_catch_up
+                next_step += (behind - self.max_catch_up) * self.interval
+            with self.lock:
+                if self._stopped.is_set():
+                    break
+                start = time.perf_counter()
+                self.step(self.interval)
+                self.max_step_time = max(
+                    self.max_step_time, time.perf_counter() - start
+                )
+            self.steps += 1
+            next_step += self.interval
+            delay = next_step - time.perf_counter()
+            if delay > 0:
+                self._stopped.wait(delay)
+
+
+class MainThreadCalls:
+    """
+    Calls that must be made on the main thread, in order. Made right away
+    when called from it, otherwise queued until the main thread `run()`s
+    them.
+    """
+    def __init__(self) -> None:
+        self._calls: collections.deque[
+            tuple[Callable[..., Any], tuple[Any, ...]]
+        ] = collections.deque()
+
+    def __call__(self, function: Callable[..., Any], *args: Any) -> None:
+        if threading.current_thread() is threading.main_thread():
+            function(*args)
+        else:
+            self._calls.append((function, args))
+
+    def run(self) -> None:
+        """Make the queued calls. Only call this from the main thread."""
+        while self._calls:
+            function, args = self._calls.popleft()
+            function(*args)
+
+
+def locked(method: F) -> F:
+    """Run a view method while holding the view's `world_lock`."""
+    @functools.wraps(method)
+    def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+        with self.world_lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
@@ -0,0 +1,171 @@
+"""
+Profiles of slow frames, captured automatically.
+
+Hitches like the restart, biome switches or many dripstones falling at once
+are rare and hard to reproduce under a profiler by hand. With
+`HBTL_SPIKE_MS=<budget>` every frame of the game is profiled with cProfile.
+Frames where `on_update()` and `on_draw()` together took longer than the
+budget are saved to the `spikes` cache directory: the profile as `.prof`
+(open with `python -m pstats` or snakeviz) and the game state of that frame
+as `.json`. Other frames are thrown away. When the files grow over
+`max_bytes`, the oldest captures are deleted.
+
+cProfile makes Python code about twice as slow, so set the budget above the
+profiled frame time. Only the main thread is profiled, with the simulation
+thread (see `simthread`) a frame is the drawing only.
+"""
+
+import cProfile
+import functools
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional, TypeVar
+
+try:
+    from . import cache
+except ImportError:
+    # Nuitka does not allow invoking via -m
+    import cache
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+MAX_BYTES = 50 * 1024 * 1024
+# At most one capture per interval, a budget set too low would otherwise
+# write every frame
+MIN_INTERVAL = 1.0
+
+
+class SpikeWatchdog:
+    def __init__(
+        self,
+        budget: float,
+        directory: Path,
+        max_bytes: int = MAX_BYTES,
+        min_interval: float = MIN_INTERVAL,
+    ) -> None:
+        self.budget = budget
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.min_interval = min_interval
+        self.captures = 0
+        self._profiler: Optional[cProfile.Profile] = cProfile.Profile()
+        self._busy = 0.0
+        self._parts: dict[str, float] = {}
+        self._last_capture = -min_interval
+
+    def measure(self, part: str, call: Callable[[], Any]) -> Any:
+        """Run `call` as `part` of the current frame."""
+        profiler = self._profiler
+        start = time.perf_counter()
+        if profiler is not None:
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is active, keep measuring times only
+                self._profiler = profiler = None
+        try:
+            return call()
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            elapsed = time.perf_counter() - start
+            self._busy += elapsed
+            self._parts[part] = self._parts.get(part, 0.0) + elapsed
+
+    def end_frame(self, state: Callable[[], dict[str, Any]]) -> None:
+        """
+        Finish the current frame. Saves it with `state()` if it was over
+        budget.
+        """
+        busy, parts = self._busy, self._parts
+        profiler = self._profiler
+        self._busy = 0.0
+        self._parts = {}
+        if profiler is not None:
+            self._profiler = cProfile.Profile()
+        now = time.perf_counter()
+        if busy <= self.budget or now - self._last_capture < self.min_interval:
+            return
+        self._last_capture = now
+        info = {
+            "frame_ms": round(busy * 1000, 3),
+            "budget_ms": round(self.budget * 1000, 3),
+            "parts_ms": {
+                part: round(seconds * 1000, 3)
+                for part, seconds in parts.items()
+            },
+            "state": state(),
+        }
+        try:
+            self.save(info, profiler)
+        except OSError as e:
+            print(f"Could not save spike: {e}", file=sys.stderr)
+
+    def save(
+        self, info: dict[str, Any], profiler: Optional[cProfile.Profile]
+    ) -> Path:
+        self.captures += 1
+        stem = time.strftime("%Y%m%d-%H%M%S") + f"-{self.captures:04}"
+        path = self.directory / f"{stem}.json"
+        if profiler is not None:
+            profiler.dump_stats(self.directory / f"{stem}.prof")
+        path.write_text(json.dumps(info, indent=2))
+        print(
+            f"Frame took {info['frame_ms']:.1f} ms, saved to {path}",
+            file=sys.stderr,
+        )
+        self.rotate()
+        return path
+
+    def rotate(self) -> None:
+        """Delete the oldest captures until all fit into `max_bytes`."""
+        captures: dict[str, list[Path]] = {}
+        for pattern in ("*.json", "*.prof"):
+            for path in self.directory.glob(pattern):
+                captures.setdefault(path.stem, []).append(path)
+        sizes = {
+            stem: sum(path.stat().st_size for path in paths)
+            for stem, paths in captures.items()
+        }
+        total = sum(sizes.values())
+        # Stems start with the time of the capture
+        for stem in sorted(captures):
+            if total <= self.max_bytes:
+                break
+            for path in captures[stem]:
+                path.unlink()
+            total -= sizes[stem]
+
+
+def watchdog() -> Optional[SpikeWatchdog]:
+    """A watchdog configured by `HBTL_SPIKE_MS`, if set."""
+    budget = os.environ.get("HBTL_SPIKE_MS")
+    if not budget:
+        return None
+    return SpikeWatchdog(float(budget) / 1000, cache.cache_dir("spikes"))
+
+
+def watched(part: str, end_frame: bool = False) -> Callable[[F], F]:
+    """
+    Measure a view method as `part` of the frame of `self.watchdog`. The
+    method drawing the frame ends it, with `self.spike_state()` as state.
+    """
+    def decorator(method: F) -> F:
+        @functools.wraps(method)
+        def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+            watchdog = self.watchdog
+            if watchdog is None:
+                return method(self, *args, **kwargs)
+            result = watchdog.measure(
+                part, lambda: method(self, *args, **kwargs)
+            )
+            if end_frame:
+                watchdog.end_frame(self.spike_state)
+            return result
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
@@ -0,0 +1,81 @@
+"""
+Time spent starting up, per phase.
+
+Imported before anything else in `__main__`, so the first phase covers the
+imports of arcade, pyglet and the game modules (the interpreter start before
+that isn't included, `python -X importtime` breaks imports down further).
+Later phases are marked as the game gets through them: window, intro, first
+frame and so on. Work moved to the background while the intro is shown is
+recorded separately, with its duration and when it finished.
+
+Phases are always recorded, it's a few `perf_counter()` calls. With
+`--profile-startup` they are printed once the game view is set up.
+"""
+
+import sys
+import time
+from concurrent.futures import Future
+from typing import Any, Iterable
+
+START = time.perf_counter()
+
+enabled = False
+# (name, seconds) in order
+phases: list[tuple[str, float]] = []
+# name: (seconds, finished after seconds since start)
+background: dict[str, tuple[float, float]] = {}
+_last = START
+_reported = False
+
+
+def mark(name: str) -> None:
+    """End the current phase, naming it `name`."""
+    global _last
+    if _reported:
+        return  # Only the first start
+    now = time.perf_counter()
+    phases.append((name, now - _last))
+    _last = now
+
+
+def record(name: str, seconds: float) -> None:
+    """Record work done out of order, like while the intro is shown."""
+    background[name] = (seconds, time.perf_counter() - START)
+
+
+def track(name: str, futures: Iterable[Future[Any]]) -> None:
+    """Record the time until all `futures` are done as `name`."""
+    futures = list(futures)
+    started = time.perf_counter()
+
+    def done(_: Future[Any]) -> None:
+        # Called on the worker threads, the last one records
+        if all(future.done() for future in futures):
+            now = time.perf_counter()
+            background.setdefault(name, (now - started, now - START))
+
+    for future in futures:
+        future.add_done_callback(done)
+
+
+def report() -> str:
+    lines = [f"{'phase':<24} {'ms':>9} {'at ms':>9}"]
+    at = 0.0
+    for name, seconds in phases:
+        at += seconds
+        lines.append(f"{name:<24} {seconds * 1000:>9.1f} {at * 1000:>9.1f}")
+    if background:
+        lines.append("in the background:")
+        for name, (seconds, finished) in background.items():
+            lines.append(
+                f"{name:<24} {seconds * 1000:>9.1f} {finished * 1000:>9.1f}"
+            )
+    return "\n".join(lines)
+
+
+def finish() -> None:
+    """Print the report, once, if enabled."""
+    global _reported
+    if enabled and not _reported:
+        _reported = True
+        print(report(), file=sys.stderr)
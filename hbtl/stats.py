@@ -0,0 +1,212 @@
+"""
+Summaries of the runs in the telemetry log.
+
+Reads the log written by `telemetry` record by record and only keeps
+counters, so memory stays the same for any number of runs. Reports where
+runs die per map, by cause and position on the map, how the speed grows and
+how smooth the game ran, per quality tier and per map.
+
+    python -m hbtl.stats
+    python -m hbtl.stats runs.bin other-machine.bin
+"""
+
+import argparse
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+try:
+    from . import telemetry
+except ImportError:
+    # Nuitka does not allow invoking via -m
+    import telemetry
+
+# Deaths are counted per quarter of a map
+SEGMENTS = 4
+# Speed samples averaged at most, an hour of play
+MAX_SPEEDS = 3600 // int(telemetry.SPEED_INTERVAL)
+# Upper edges of the 95th percentile frame time histogram, in ms
+P95_BINS = (8.4, 16.7, 20.0, 33.4, 50.0, float("inf"))
+
+
+class Summary:
+    """Counters updated record by record, so memory stays bounded."""
+    def __init__(self) -> None:
+        self.runs = 0
+        self.endless = 0
+        self.outcomes: Counter[str] = Counter()
+        self.duration = 0.0
+        self.distance = 0.0
+        self.checkpoints = 0
+        self.respawns = 0
+        self.reached: Counter[str] = Counter()
+        self.deaths: Counter[str] = Counter()
+        self.causes: dict[str, Counter[str]] = {}
+        self.segments: dict[str, list[int]] = {}
+        self.speed_sums = [0.0] * MAX_SPEEDS
+        self.speed_counts = [0] * MAX_SPEEDS
+        self.frames = 0
+        self.frame_time = 0.0
+        self.p95 = [0] * len(P95_BINS)
+        self.tier_runs: Counter[str] = Counter()
+        self.tier_frames: Counter[str] = Counter()
+        self.tier_frame_time: Counter[str] = Counter()
+        self.map_frames: Counter[str] = Counter()
+        self.map_frame_time: Counter[str] = Counter()
+        self.map_frame_max: dict[str, float] = {}
+
+    def add(self, record: telemetry.RunRecord) -> None:
+        self.runs += 1
+        self.endless += record.endless
+        self.outcomes[record.outcome] += 1
+        self.duration += record.duration
+        self.distance += record.distance
+        self.checkpoints += record.checkpoints
+
+        reached = int(record.distance // telemetry.MAP_PX)
+        for stats in record.maps[:reached + 1]:
+            self.reached[stats.name] += 1
+        for death in record.deaths:
+            self.respawns += death.respawned
+            if death.map >= len(record.maps):
+                continue
+            name = record.maps[death.map].name
+            self.deaths[name] += 1
+            self.causes.setdefault(name, Counter())[death.cause] += 1
+            segment = int(death.x / telemetry.MAP_PX * SEGMENTS)
+            segments = self.segments.setdefault(name, [0] * SEGMENTS)
+            segments[min(max(segment, 0), SEGMENTS - 1)] += 1
+
+        for i, speed in enumerate(record.speeds[:MAX_SPEEDS]):
+            self.speed_sums[i] += speed
+            self.speed_counts[i] += 1
+
+        if record.frames:
+            self.frames += record.frames
+            self.frame_time += record.frame_mean * record.frames
+            index = next(
+                i for i, edge in enumerate(P95_BINS)
+                if record.frame_p95 <= edge
+            )
+            self.p95[index] += 1
+            self.tier_runs[record.tier] += 1
+            self.tier_frames[record.tier] += record.frames
+            self.tier_frame_time[record.tier] += (
+                record.frame_mean * record.frames
+            )
+        for stats in record.maps:
+            if stats.frames:
+                self.map_frames[stats.name] += stats.frames
+                self.map_frame_time[stats.name] += (
+                    stats.frame_mean * stats.frames
+                )
+                self.map_frame_max[stats.name] = max(
+                    self.map_frame_max.get(stats.name, 0.0), stats.frame_max
+                )
+
+    def format(self) -> str:
+        runs = self.runs or 1
+        lines = [
+            f"{self.runs} runs ({self.endless} endless): "
+            + ", ".join(
+                f"{count} {outcome}"
+                for outcome, count in self.outcomes.most_common()
+            ),
+            f"  {self.duration / runs:.1f}s and "
+            f"{self.distance / runs / telemetry.MAP_PX:.1f} maps per run, "
+            f"{self.checkpoints / runs:.2f} checkpoints activated, "
+            f"{self.respawns / runs:.2f} respawns",
+        ]
+
+        lines.append(
+            "\nDeaths per run that reached the map (most deadly first), "
+            f"by cause and by {SEGMENTS} parts of the map:"
+        )
+        rates = {
+            name: self.deaths[name] / reached
+            for name, reached in self.reached.items()
+        }
+        for name, rate in sorted(rates.items(), key=lambda item: -item[1]):
+            causes = ", ".join(
+                f"{cause} {count}"
+                for cause, count in self.causes.get(name, Counter()).items()
+            )
+            segments = " ".join(
+                f"{count:>5}"
+                for count in self.segments.get(name, [0] * SEGMENTS)
+            )
+            lines.append(
+                f"  {name:<12} {rate:6.3f} of {self.reached[name]:>7}  "
+                f"{segments}  {causes}"
+            )
+
+        lines.append("\nAverage speed (px/s) after:")
+        step = max(1, round(30 / telemetry.SPEED_INTERVAL))
+        for i in range(step - 1, MAX_SPEEDS, step):
+            count = self.speed_counts[i]
+            if not count:
+                break
+            seconds = round((i + 1) * telemetry.SPEED_INTERVAL)
+            lines.append(
+                f"  {seconds:>5}s {self.speed_sums[i] / count:>8.0f}"
+                f"  ({count} runs)"
+            )
+
+        mean = self.frame_time / self.frames if self.frames else 0.0
+        lines.append(
+            f"\nFrame times: {self.frames} frames, {mean:.2f} ms on average"
+        )
+        lines.append("  Runs by 95th percentile frame time:")
+        low = 0.0
+        for edge, count in zip(P95_BINS, self.p95):
+            label = f"{low:g}-{edge:g} ms" if edge != float("inf") else (
+                f"over {low:g} ms"
+            )
+            lines.append(f"    {label:<14} {count:>7}")
+            low = edge
+        lines.append("  By the quality tier at the end of the run:")
+        for tier in telemetry.TIERS:
+            frames = self.tier_frames[tier]
+            if frames:
+                lines.append(
+                    f"    {tier:<8} {self.tier_runs[tier]:>7} runs "
+                    f"{self.tier_frame_time[tier] / frames:>7.2f} ms"
+                )
+        lines.append("  By map (slowest first), average and longest frame:")
+        means = {
+            name: self.map_frame_time[name] / frames
+            for name, frames in self.map_frames.items()
+        }
+        for name, map_mean in sorted(means.items(), key=lambda item: -item[1]):
+            lines.append(
+                f"    {name:<12} {map_mean:>7.2f} ms "
+                f"{self.map_frame_max[name]:>8.1f} ms"
+            )
+        return "\n".join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m hbtl.stats",
+        description="Summarize the runs in telemetry logs.",
+    )
+    parser.add_argument(
+        "paths", type=Path, nargs="*", metavar="PATH",
+        help="Logs to read, the log of this machine by default",
+    )
+    args = parser.parse_args(argv)
+
+    summary = Summary()
+    for path in args.paths or [telemetry.log_path()]:
+        try:
+            with path.open("rb") as file:
+                for record in telemetry.read(file):
+                    summary.add(record)
+        except FileNotFoundError:
+            print(f"No log at {path}", file=sys.stderr)
+    print(summary.format())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+Compact records of played runs, appended to a log file.
+
+Every run that was started is written once it ends: the seed, the maps in
+order, each death with its cause and position, how many checkpoints were
+activated, the speed every few seconds and frame time statistics, for the
+whole run and per map. A record is a few hundred bytes of packed binary
+data, behind a marker, its length and a CRC. The log is only ever appended
+to, with one write per record. A crash can still cut off a record, and the
+next run appends after it. The reader then finds that the CRC doesn't
+match and scans forward to the next marker, so a torn record costs only
+itself. `python -m hbtl.stats` summarizes the log.
+
+Runs are logged to `runs.bin` in the `telemetry` cache directory (see
+`cache.cache_dir()`). Set `HBTL_TELEMETRY=0` to not log anything.
+"""
+
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Iterator, NamedTuple, Optional
+
+try:
+    from . import cache
+    from .constants import MAP_WIDTH, TILE_SCALING, TILE_SIZE
+except ImportError:
+    # Nuitka does not allow invoking via -m
+    import cache
+    from constants import MAP_WIDTH, TILE_SCALING, TILE_SIZE
+
+ENABLED = os.environ.get("HBTL_TELEMETRY", "1") not in ("", "0")
+MAP_PX = MAP_WIDTH * TILE_SIZE * TILE_SCALING
+# Bump when the layout of a record changes, older records are skipped
+VERSION = 1
+CAUSES = ("fell", "caught", "obstacle")
+OUTCOMES = ("dead", "victory", "quit")
+TIERS = ("low", "medium", "high")
+# Seconds between speed samples
+SPEED_INTERVAL = 5.0
+# Frame times are counted in 1 ms bins up to this, for the percentiles
+FRAME_BINS = 250
+# Longer intervals are pauses or a hidden window, not slow frames
+MAX_FRAME = 1.0
+
+# Starts every record, the reader scans for it after a torn record
+_MARKER = b"HBTR"
+# marker, payload length, CRC-32 of the payload
+_HEADER = struct.Struct("<4sII")
+# Longer than any record, a longer length is garbage
+MAX_LENGTH = 4 * 1024 * 1024
+# Bytes read from the log at a time
+CHUNK = 64 * 1024
+# version, endless, seed, outcome, tier, duration, distance, checkpoints,
+# frames, frame mean, p50, p95, p99 and max in ms
+_RUN = struct.Struct("<BBIBBffHIfffff")
+# frames, mean and max frame time in ms
+_MAP = struct.Struct("<Iff")
+# map index, x on the map, cause, respawned
+_DEATH = struct.Struct("<HfBB")
+_COUNT = struct.Struct("<H")
+
+
+class Death(NamedTuple):
+    map: int
+    x: float
+    cause: str
+    respawned: bool
+
+
+class MapStats(NamedTuple):
+    name: str
+    frames: int
+    frame_mean: float
+    frame_max: float
+
+
+class RunRecord(NamedTuple):
+    seed: int
+    endless: bool
+    outcome: str
+    # Quality tier when the run ended
+    tier: str
+    duration: float
+    # Furthest the player got, in px from the start
+    distance: float
+    checkpoints: int
+    maps: tuple[MapStats, ...]
+    deaths: tuple[Death, ...]
+    # Speed of the player in px/s, every `SPEED_INTERVAL` seconds
+    speeds: tuple[int, ...]
+    frames: int
+    # Frame times in ms
+    frame_mean: float
+    frame_p50: float
+    frame_p95: float
+    frame_p99: float
+    frame_max: float
+
+
+def encode(record: RunRecord) -> bytes:
+    """`record` as a payload, without the length prefix."""
+    parts = [_RUN.pack(
+        VERSION, record.endless, record.seed,
+        OUTCOMES.index(record.outcome), TIERS.index(record.tier),
+        record.duration, record.distance, min(record.checkpoints, 0xFFFF),
+        record.frames, record.frame_mean, record.frame_p50,
+        record.frame_p95, record.frame_p99, record.frame_max,
+    )]
+    maps = record.maps[:0xFFFF]
+    parts.append(_COUNT.pack(len(maps)))
+    for stats in maps:
+        name = stats.name.encode()
+        parts += [
+            bytes((len(name),)), name,
+            _MAP.pack(stats.frames, stats.frame_mean, stats.frame_max),
+        ]
+    deaths = record.deaths[:0xFFFF]
+    parts.append(_COUNT.pack(len(deaths)))
+    for death in deaths:
+        parts.append(_DEATH.pack(
+            min(death.map, 0xFFFF), death.x, CAUSES.index(death.cause),
+            death.respawned,
+        ))
+    speeds = record.speeds[:0xFFFF]
+    parts.append(_COUNT.pack(len(speeds)))
+    parts.append(struct.pack(
+        f"<{len(speeds)}H", *(min(max(speed, 0), 0xFFFF) for speed in speeds)
+    ))
+    return b"".join(parts)
+
+
+def decode(payload: bytes) -> RunRecord:
+    (
+        _, endless, seed, outcome, tier, duration, distance, checkpoints,
+        frames, frame_mean, frame_p50, frame_p95, frame_p99, frame_max,
+    ) = _RUN.unpack_from(payload)
+    offset = _RUN.size
+
+    (count,) = _COUNT.unpack_from(payload, offset)
+    offset += _COUNT.size
+    maps = []
+    for _ in range(count):
+        length = payload[offset]
+        name = payload[offset + 1:offset + 1 + length].decode()
+        offset += 1 + length
+        maps.append(MapStats(name, *_MAP.unpack_from(payload, offset)))
+        offset += _MAP.size
+
+    (count,) = _COUNT.unpack_from(payload, offset)
+    offset += _COUNT.size
+    deaths = []
+    for map_index, x, cause, respawned in _DEATH.iter_unpack(
+        payload[offset:offset + count * _DEATH.size]
+    ):
+        deaths.append(Death(map_index, x, CAUSES[cause], bool(respawned)))
+    offset += count * _DEATH.size
+
+    (count,) = _COUNT.unpack_from(payload, offset)
+    offset += _COUNT.size
+    speeds = struct.unpack_from(f"<{count}H", payload, offset)
+    return RunRecord(
+        seed, bool(endless), OUTCOMES[outcome], TIERS[tier], duration,
+        distance, checkpoints, tuple(maps), tuple(deaths), speeds, frames,
+        frame_mean, frame_p50, frame_p95, frame_p99, frame_max,
+    )
+
+
+def log_path() -> Path:
+    return cache.cache_dir("telemetry") / "runs.bin"
+
+
+def append(record: RunRecord, path: Optional[Path] = None) -> None:
+    payload = encode(record)
+    with open(path or log_path(), "ab") as file:
+        # In one write, so records of several games never interleave
+        file.write(
+            _HEADER.pack(_MARKER, len(payload), zlib.crc32(payload))
+            + payload
+        )
+
+
+def read(file: BinaryIO) -> Iterator[RunRecord]:
+    """
+    The records in `file`, one at a time. Records of other versions are
+    skipped. So are torn or corrupted records: the reader continues at the
+    next marker after them.
+    """
+    buffer = b""
+    pos = 0
+    eof = False
+    while True:
+        start = buffer.find(_MARKER, pos)
+        if start >= 0:
+            pos = start
+            if len(buffer) - pos >= _HEADER.size:
+                _, length, crc = _HEADER.unpack_from(buffer, pos)
+                end = pos + _HEADER.size + length
+                if length > MAX_LENGTH:
+                    pos += len(_MARKER)
+                    continue
+                if len(buffer) >= end:
+                    payload = buffer[pos + _HEADER.size:end]
+                    if zlib.crc32(payload) != crc:
+                        pos += len(_MARKER)
+                        continue
+                    pos = end
+                    if payload and payload[0] == VERSION:
+                        try:
+                            record = decode(payload)
+                        except (
+                            struct.error, IndexError, UnicodeDecodeError
+                        ):
+                            continue
+                        yield record
+                    continue
+            if eof:
+                # Cut off at the end, a record could start within
+                pos += len(_MARKER)
+                continue
+        elif eof:
+            return
+        else:
+            # The end could be the start of a marker
+            pos = max(pos, len(buffer) - len(_MARKER) + 1)
+        chunk = file.read(CHUNK)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def _percentile(bins: list[int], total: int, share: float) -> float:
+    """Upper edge of the bin containing the `share` of `total` frames."""
+    limit = share * total
+    seen = 0
+    for ms, count in enumerate(bins):
+        seen += count
+        if seen >= limit:
+            return float(ms + 1)
+    return float(len(bins))
+
+
+class RunRecorder:
+    """Collects the record of the run being played."""
+    def __init__(self, seed: int, endless: bool = False) -> None:
+        self.seed = seed
+        self.endless = endless
+        # Placed from left to right, each `MAP_PX` wide
+        self.maps: list[str] = []
+        self.deaths: list[Death] = []
+        self.checkpoints = 0
+        self.speeds: list[int] = []
+        self.duration = 0.0
+        self.distance = 0.0
+        self.finished = False
+        self._next_speed = SPEED_INTERVAL
+        self._map = 0
+        self._last_frame: Optional[float] = None
+        self._bins = [0] * (FRAME_BINS + 1)
+        self._frames = 0
+        self._frame_sum = 0.0
+        self._frame_max = 0.0
+        # map index: [frames, sum and max of frame times in seconds]
+        self._map_frames: dict[int, list[float]] = {}
+
+    def update(self, delta_time: float, x: float, speed: float) -> None:
+        """A step of play, with the player at `x` from the start."""
+        self.duration += delta_time
+        self.distance = max(self.distance, x)
+        self._map = max(int(x // MAP_PX), 0)
+        if self.duration >= self._next_speed:
+            self.speeds.append(round(speed))
+            self._next_speed += SPEED_INTERVAL
+
+    def frame(self, now: float) -> None:
+        """Call when a frame of play starts, with `time.perf_counter()`."""
+        last, self._last_frame = self._last_frame, now
+        if last is None or now - last > MAX_FRAME:
+            return
+        interval = now - last
+        self._bins[min(int(interval * 1000), FRAME_BINS)] += 1
+        self._frames += 1
+        self._frame_sum += interval
+        self._frame_max = max(self._frame_max, interval)
+        stats = self._map_frames.setdefault(self._map, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += interval
+        stats[2] = max(stats[2], interval)
+
+    def death(self, x: float, cause: str, respawned: bool) -> None:
+        map_index = max(int(x // MAP_PX), 0)
+        self.deaths.append(
+            Death(map_index, x - map_index * MAP_PX, cause, respawned)
+        )
+
+    def finish(self, outcome: str, tier: str) -> RunRecord:
+        self.finished = True
+        maps = []
+        for i, name in enumerate(self.maps):
+            frames, total, longest = self._map_frames.get(i, (0, 0.0, 0.0))
+            maps.append(MapStats(
+                name, int(frames), total / frames * 1000 if frames else 0.0,
+                longest * 1000,
+            ))
+        frames = self._frames
+        return RunRecord(
+            self.seed, self.endless, outcome, tier, self.duration,
+            self.distance, self.checkpoints, tuple(maps),
+            tuple(self.deaths), tuple(self.speeds), frames,
+            self._frame_sum / frames * 1000 if frames else 0.0,
+            _percentile(self._bins, frames, 0.5),
+            _percentile(self._bins, frames, 0.95),
+            _percentile(self._bins, frames, 0.99),
+            self._frame_max * 1000,
+        )
@@ -0,0 +1,187 @@
+"""
+Map tiles without one sprite per tile.
+
+Loading a map through arcade creates a full sprite for every tile, each with
+its own hit box, properties and texture reference, although walls never move
+or change. `MapTiles` keeps a layer of a map as arrays instead, with one
+texture (and with it one hit box) and one properties dict per kind of tile.
+`StaticTiles` lays out the maps of a run and only creates sprites for the
+tiles around the camera and the player, reusing them while scrolling.
+"""
+
+from pathlib import Path
+from typing import Any
+
+import arcade
+import numpy as np
+import PIL.Image
+
+try:
+    from . import hitboxes, mapdata, preload
+    from .constants import TILE_SCALING
+except ImportError:
+    # Nuitka does not allow invoking via -m
+    import hitboxes
+    import mapdata
+    import preload
+    from constants import TILE_SCALING
+
+
+class TileTextures:
+    """
+    Textures of all kinds of tiles (tileset, tile id and flipping), loaded
+    once and shared by all maps. Hit boxes come from the `hitboxes` cache.
+    """
+    def __init__(self) -> None:
+        self.images: dict[Path, PIL.Image.Image] = {}
+        self.textures: list[arcade.Texture] = []
+        self.properties: list[dict[str, Any]] = []
+        self._indices: dict[tuple[Any, int, int], int] = {}
+
+    def index(self, data: mapdata.MapData, gid: int, flip: int = 0) -> int:
+        """Index of a tile's texture and properties, loaded if needed."""
+        tileset, tile_id = data.tile(gid)
+        key = (tileset.path, tile_id, flip)
+        if key in self._indices:
+            return self._indices[key]
+
+        if tile_id in tileset.images:
+            image, _, _ = tileset.images[tile_id]
+            texture = hitboxes.texture(self.image(image))
+        else:
+            assert tileset.image is not None
+            x = tile_id % tileset.columns * tileset.tile_width
+            y = tile_id // tileset.columns * tileset.tile_height
+            texture = hitboxes.texture(self.image(tileset.image).crop((
+                x, y, x + tileset.tile_width, y + tileset.tile_height
+            )))
+        # Same order as arcade's tilemap loader
+        if flip & mapdata.FLIPPED_DIAGONALLY:
+            texture = texture.flip_diagonally()
+        if flip & mapdata.FLIPPED_HORIZONTALLY:
+            texture = texture.flip_horizontally()
+        if flip & mapdata.FLIPPED_VERTICALLY:
+            texture = texture.flip_vertically()
+
+        properties = dict(tileset.properties.get(tile_id, {}))
+        properties["tile_id"] = tile_id
+        self.textures.append(texture)
+        self.properties.append(properties)
+        self._indices[key] = len(self.textures) - 1
+        return self._indices[key]
+
+    def image(self, path: Path) -> PIL.Image.Image:
+        """An image file as RGBA, opened once."""
+        if path not in self.images:
+            self.images[path] = preload.open_image(path)
+        return self.images[path]
+
+    def sprite(
+        self, index: int, sprite_class: type = arcade.Sprite
+    ) -> arcade.Sprite:
+        """A new sprite of a kind of tile."""
+        sprite = sprite_class(
+            path_or_texture=self.textures[index], scale=TILE_SCALING
+        )
+        sprite.properties.update(self.properties[index])
+        return sprite
+
+
+class MapTiles:
+    """
+    A layer of a map as arrays of sprite centers (relative to the left edge
+    of the map) and texture indices, in the order arcade creates sprites.
+    """
+    def __init__(
+        self, data: mapdata.MapData, layer: str, textures: TileTextures
+    ) -> None:
+        tiles = data.tiles(layer)
+        self.x = np.empty(len(tiles))
+        self.y = np.empty(len(tiles))
+        self.texture = np.empty(len(tiles), dtype=np.int32)
+        for i, (column, row, gid) in enumerate(tiles):
+            self.x[i], self.y[i] = data.sprite_position(column, row, gid)
+            self.texture[i] = textures.index(
+                data, gid, data.flip(layer, column, row)
+            )
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+
+class StaticTiles:
+    """
+    The tiles of all maps of a run, sorted by x. Only tiles within the range
+    of the last `update()` have sprites in `sprite_list`. Sprites of tiles
+    leaving the range are kept and reused for tiles of the same kind.
+    """
+    def __init__(
+        self,
+        sprite_list: arcade.SpriteList,
+        textures: TileTextures,
+        margin: float = 2 * mapdata.TILE_PX,
+    ) -> None:
+        self.sprite_list = sprite_list
+        self.textures = textures
+        self.margin = margin
+        self.x = np.empty(0)
+        self.y = np.empty(0)
+        self.texture = np.empty(0, dtype=np.int32)
+        self._sprites: dict[int, arcade.Sprite] = {}
+        self._free: dict[int, list[arcade.Sprite]] = {}
+        self._range = (0, 0)
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def layout(self, maps: list[tuple[MapTiles, float]]) -> None:
+        """Replace all tiles by the tiles of `(map, offset_x)` pairs."""
+        self._release_range(*self._range)
+        self._range = (0, 0)
+        x = np.concatenate(
+            [np.empty(0)] + [tiles.x + offset_x for tiles, offset_x in maps]
+        )
+        order = np.argsort(x, kind="stable")
+        self.x = x[order]
+        self.y = np.concatenate(
+            [np.empty(0)] + [tiles.y for tiles, _ in maps]
+        )[order]
+        self.texture = np.concatenate(
+            [np.empty(0, dtype=np.int32)]
+            + [tiles.texture for tiles, _ in maps]
+        )[order]
+
+    def update(self, left: float, right: float) -> None:
+        """
+        Make sure exactly the tiles between `left` and `right` (plus the
+        margin) have sprites.
+        """
+        start = int(np.searchsorted(self.x, left - self.margin, "left"))
+        stop = int(np.searchsorted(self.x, right + self.margin, "right"))
+        old_start, old_stop = self._range
+        if (start, stop) == (old_start, old_stop):
+            return
+        if start >= old_stop or stop <= old_start:
+            self._release_range(old_start, old_stop)
+            self._create_range(start, stop)
+        else:
+            self._release_range(old_start, start)
+            self._release_range(stop, old_stop)
+            self._create_range(start, old_start)
+            self._create_range(old_stop, stop)
+        self._range = (start, stop)
+
+    def _create_range(self, start: int, stop: int) -> None:
+        for i in range(start, stop):
+            texture = int(self.texture[i])
+            free = self._free.get(texture)
+            sprite = free.pop() if free else self.textures.sprite(texture)
+            sprite.position = (self.x[i], self.y[i])
+            self.sprite_list.append(sprite)
+            self._sprites[i] = sprite
+
+    def _release_range(self, start: int, stop: int) -> None:
+        for i in range(start, stop):
+            sprite = self._sprites.pop(i)
+            self.sprite_list.remove(sprite)
+            self._free.setdefault(int(self.texture[i]), []).append(sprite)
@@ -0,0 +1,260 @@
+"""
+Timed actions and tweens that are advanced by game time.
+
+Unlike the arcade clock, a `Timeline` only moves forward when `update()` is
+called, so everything on it pauses with the game and runs deterministically
+when driven with fixed time steps.
+"""
+
+from typing import Any, Callable, Optional
+
+
+def linear(t: float) -> float:
+    return t
+
+
+def ease_in_out(t: float) -> float:
+    return t * t * (3 - 2 * t)
+
+
+def lerp(start: Any, end: Any, t: float) -> Any:
+    """Interpolate between two numbers or two tuples of numbers."""
+    if isinstance(start, tuple):
+        return tuple(a + (b - a) * t for a, b in zip(start, end))
+    return start + (end - start) * t
+
+
+class Action:
+    """Something on a timeline that takes `duration` seconds of game time."""
+    duration = 0.0
+
+    def __init__(self) -> None:
+        self.elapsed = 0.0
+        self.finished = False
+
+    def update(self, delta_time: float) -> float:
+        """
+        Advance the action by `delta_time`.
+
+        :param delta_time: Game time since last update
+        :type delta_time: float
+        :return: Time left over after the action finished, 0 otherwise
+        :rtype: float
+        """
+        self.elapsed += delta_time
+        self.step(min(self.elapsed, self.duration))
+        if self.elapsed >= self.duration:
+            self.finished = True
+            return self.elapsed - self.duration
+        return 0.0
+
+    def step(self, elapsed: float) -> None:
+        """Apply the state at `elapsed` seconds into the action."""
+        pass
+
+    def snapshot(self) -> tuple[Any, ...]:
+        """The state that changes while running, for `restore()`."""
+        return self.elapsed, self.finished
+
+    def restore(self, state: tuple[Any, ...]) -> None:
+        self.elapsed, self.finished = state
+
+
+class Wait(Action):
+    def __init__(self, duration: float) -> None:
+        super().__init__()
+        self.duration = duration
+
+
+class Call(Action):
+    """Call `func` without arguments."""
+    def __init__(self, func: Callable[[], Any]) -> None:
+        super().__init__()
+        self.func = func
+
+    def step(self, elapsed: float) -> None:
+        self.func()
+
+
+class Repeat(Action):
+    """
+    Call `func` without arguments `times` times, once every `interval` seconds
+    of game time. With an `interval` of 0 it is called once per update.
+    """
+    def __init__(
+        self, func: Callable[[], Any], times: int, interval: float = 0.0
+    ) -> None:
+        super().__init__()
+        self.func = func
+        self.times = times
+        self.interval = interval
+        self.duration = times * interval
+        self.calls = 0
+
+    def update(self, delta_time: float) -> float:
+        self.elapsed += delta_time
+        if not self.interval:
+            if self.calls < self.times:
+                self.func()
+                self.calls += 1
+        else:
+            while (
+                self.calls < self.times
+                and self.calls * self.interval <= self.elapsed
+            ):
+                self.func()
+                self.calls += 1
+        if self.calls >= self.times:
+            self.finished = True
+            return max(0.0, self.elapsed - self.duration)
+        return 0.0
+
+    def snapshot(self) -> tuple[Any, ...]:
+        return self.elapsed, self.finished, self.calls
+
+    def restore(self, state: tuple[Any, ...]) -> None:
+        self.elapsed, self.finished, self.calls = state
+
+
+class Tween(Action):
+    """
+    Interpolate between keyframes and pass the value to `setter`. Keyframes
+    are `(time, value)` tuples with increasing times, values can be numbers
+    (e.g. a light radius) or tuples (e.g. colors or positions).
+    """
+    def __init__(
+        self,
+        setter: Callable[[Any], Any],
+        *keyframes: tuple[float, Any],
+        easing: Callable[[float], float] = linear,
+    ) -> None:
+        super().__init__()
+        if not keyframes:
+            raise ValueError("A tween needs at least one keyframe")
+        self.setter = setter
+        self.keyframes = keyframes
+        self.easing = easing
+        self.duration = keyframes[-1][0]
+
+    def step(self, elapsed: float) -> None:
+        prev_time, prev_value = self.keyframes[0]
+        if elapsed <= prev_time:
+            self.setter(prev_value)
+            return
+        for time, value in self.keyframes[1:]:
+            if elapsed <= time:
+                t = (elapsed - prev_time) / (time - prev_time)
+                self.setter(lerp(prev_value, value, self.easing(t)))
+                return
+            prev_time, prev_value = time, value
+        self.setter(prev_value)
+
+
+class Sequence(Action):
+    """Run actions one after another."""
+    def __init__(self, *actions: Action) -> None:
+        super().__init__()
+        self.actions = list(actions)
+        self.duration = sum(action.duration for action in actions)
+
+    def update(self, delta_time: float) -> float:
+        self.elapsed += delta_time
+        while self.actions and not self.finished:
+            delta_time = self.actions[0].update(delta_time)
+            if not self.actions[0].finished:
+                return 0.0
+            self.actions.pop(0)
+        self.finished = True
+        return delta_time
+
+    def snapshot(self) -> tuple[Any, ...]:
+        return self.elapsed, self.finished, tuple(
+            (action, action.snapshot()) for action in self.actions
+        )
+
+    def restore(self, state: tuple[Any, ...]) -> None:
+        self.elapsed, self.finished, actions = state
+        self.actions = [action for action, _ in actions]
+        for action, action_state in actions:
+            action.restore(action_state)
+
+
+class Timeline:
+    """Holds running actions and advances all of them once per frame."""
+    def __init__(self) -> None:
+        self._actions: list[Action] = []
+        # Counts `restore()` calls, to notice one made by a running action
+        self._restores = 0
+
+    def __len__(self) -> int:
+        return len(self._actions)
+
+    def add(self, action: Action) -> Action:
+        self._actions.append(action)
+        return action
+
+    def sequence(self, *actions: Action) -> Sequence:
+        sequence = Sequence(*actions)
+        self.add(sequence)
+        return sequence
+
+    def after(self, delay: float, func: Callable[[], Any]) -> Sequence:
+        """Call `func` after `delay` seconds of game time."""
+        return self.sequence(Wait(delay), Call(func))
+
+    def tween(
+        self,
+        setter: Callable[[Any], Any],
+        *keyframes: tuple[float, Any],
+        easing: Callable[[float], float] = linear,
+    ) -> Tween:
+        tween = Tween(setter, *keyframes, easing=easing)
+        self.add(tween)
+        return tween
+
+    def cancel(self, action: Optional[Action]) -> None:
+        if action is None:
+            return
+        action.finished = True
+        if action in self._actions:
+            self._actions.remove(action)
+
+    def clear(self) -> None:
+        for action in self._actions:
+            action.finished = True
+        self._actions.clear()
+
+    def snapshot(self) -> tuple[tuple[Action, tuple[Any, ...]], ...]:
+        """
+        The running actions and their progress. Callbacks aren't copied,
+        restoring continues the same actions from where they were.
+        """
+        return tuple((action, action.snapshot()) for action in self._actions)
+
+    def restore(
+        self, state: tuple[tuple[Action, tuple[Any, ...]], ...]
+    ) -> None:
+        """
+        Go back to a `snapshot()`, dropping actions added since. Called by
+        a running action, the rest of that `update()` is skipped, the
+        restored actions continue with the next one.
+        """
+        self._restores += 1
+        for action in self._actions:
+            action.finished = True
+        self._actions = [action for action, _ in state]
+        for action, action_state in state:
+            action.restore(action_state)
+
+    def update(self, delta_time: float) -> None:
+        restores = self._restores
+        # Copy, as actions may add or cancel actions while running
+        for action in list(self._actions):
+            if not action.finished:
+                action.update(delta_time)
+            if self._restores != restores:
+                # The rest of the copy ran before the snapshot was taken
+                break
+        self._actions = [
+            action for action in self._actions if not action.finished
+        ]
@@ -0,0 +1,88 @@
+"""
+Callbacks that fire once an entity passes a horizontal position.
+
+Thresholds are kept sorted, so checking a queue each frame is a single
+comparison against the next threshold, no matter how many triggers a level
+defines.
+"""
+
+import math
+from bisect import bisect_right
+from typing import Any, Callable, Iterable
+
+
+class TriggerQueue:
+    """
+    A sorted queue of x thresholds with callbacks, advanced by a cursor.
+    Triggers sharing a threshold fire in the order they were added.
+    """
+    def __init__(
+        self,
+        triggers: Iterable[tuple[float, Callable[[], Any]]] = (),
+    ) -> None:
+        self._xs: list[float] = []
+        self._funcs: list[Callable[[], Any]] = []
+        self._cursor = 0
+        # Where the queue was advanced or rewound to last
+        self._x = -math.inf
+        self.next_x = float("inf")
+        for x, func in triggers:
+            self.add(x, func)
+
+    def __len__(self) -> int:
+        """Number of triggers that haven't fired yet."""
+        return len(self._xs) - self._cursor
+
+    def _update_next_x(self) -> None:
+        if self._cursor < len(self._xs):
+            self.next_x = self._xs[self._cursor]
+        else:
+            self.next_x = float("inf")
+
+    def add(self, x: float, func: Callable[[], Any]) -> None:
+        """
+        Add a trigger. Triggers at or behind the position the queue was
+        last advanced to count as fired, they won't fire until the queue is
+        rewound before them.
+        """
+        index = bisect_right(self._xs, x)
+        if index < self._cursor or x <= self._x:
+            self._cursor += 1
+        self._xs.insert(index, x)
+        self._funcs.insert(index, func)
+        self._update_next_x()
+
+    def advance(self, x: float) -> None:
+        """Fire all triggers up to and including `x`."""
+        self._x = x
+        if x < self.next_x:
+            return
+        while self._cursor < len(self._xs) and self._xs[self._cursor] <= x:
+            func = self._funcs[self._cursor]
+            self._cursor += 1
+            self._update_next_x()
+            func()
+
+    def rewind(self, x: float = -math.inf) -> None:
+        """Arm all triggers after `x` again."""
+        self._cursor = bisect_right(self._xs, x)
+        self._x = x
+        self._update_next_x()
+
+    @property
+    def fired_x(self) -> float:
+        """Position of the last trigger that fired, for `rewind()`."""
+        return self._xs[self._cursor - 1] if self._cursor else -math.inf
+
+    def forget(self, x: float) -> None:
+        """Drop the triggers up to `x` that fired, they can't be rewound."""
+        count = min(self._cursor, bisect_right(self._xs, x))
+        del self._xs[:count]
+        del self._funcs[:count]
+        self._cursor -= count
+
+    def shift(self, dx: float) -> None:
+        """Move all triggers by `dx`."""
+        self._xs = [x + dx for x in self._xs]
+        self._x += dx
+        self._update_next_x()